@@ -0,0 +1,357 @@
+"""
+Account summary service for Citadel Markets Pro
+Keeps AccountSummary rows in step with transaction, portfolio and position writes
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    AccountSummary,
+    CustomUser,
+    Portfolio,
+    Stock,
+    Transaction,
+    UserStockPosition,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_FIELDS = [
+    'total_deposits',
+    'total_withdrawals',
+    'deposits_count',
+    'withdrawals_count',
+    'active_portfolios_count',
+    'active_portfolios_invested',
+    'open_positions_count',
+    'open_positions_invested',
+    'open_positions_value',
+]
+
+REBUILD_CHUNK_SIZE = 2000
+
+# Fields snapshotted when an instance is loaded, so a save can be turned into a delta
+_TRACKED_FIELDS = {
+    Transaction: ('user_id', 'transaction_type', 'status', 'amount'),
+    Portfolio: ('user_id', 'is_active', 'invested'),
+    UserStockPosition: ('user_id', 'is_active', 'shares', 'total_invested', 'summary_value'),
+}
+
+
+# ---------------------------------------------------------------------------
+# Contributions: what one row adds to its owner's summary
+# ---------------------------------------------------------------------------
+
+def _transaction_contribution(state):
+    if state['status'] != 'completed':
+        return {}
+    if state['transaction_type'] == 'deposit':
+        return {'total_deposits': state['amount'], 'deposits_count': 1}
+    return {'total_withdrawals': state['amount'], 'withdrawals_count': 1}
+
+
+def _portfolio_contribution(state):
+    if not state['is_active']:
+        return {}
+    return {'active_portfolios_count': 1, 'active_portfolios_invested': state['invested']}
+
+
+def _position_contribution(state):
+    # The value is what the position last added (summary_value), not shares x
+    # today's price: the price may have moved since, and removing the old
+    # contribution must take back exactly what was added
+    if not state['is_active']:
+        return {}
+    return {
+        'open_positions_count': 1,
+        'open_positions_invested': state['total_invested'],
+        'open_positions_value': state['summary_value'],
+    }
+
+
+def _snapshot(instance):
+    """Current tracked values, or None if any of them is deferred"""
+    fields = _TRACKED_FIELDS[type(instance)]
+    values = instance.__dict__
+    if any(name not in values for name in fields):
+        return None
+    return {name: values[name] for name in fields}
+
+
+def _stock_price(instance):
+    stock = instance._state.fields_cache.get('stock')
+    if stock is not None:
+        return stock.price
+    return Stock.objects.filter(pk=instance.stock_id).values_list('price', flat=True).first() or Decimal('0')
+
+
+def _summary_value(instance, state):
+    """Value an open position adds to its owner's summary: shares x current price"""
+    if not state['is_active']:
+        return Decimal('0.00')
+    return (state['shares'] * _stock_price(instance)).quantize(Decimal('0.01'))
+
+
+def _contribution(instance, state):
+    if state is None:
+        return {}
+    if isinstance(instance, Transaction):
+        return _transaction_contribution(state)
+    if isinstance(instance, Portfolio):
+        return _portfolio_contribution(state)
+    return _position_contribution(state)
+
+
+# ---------------------------------------------------------------------------
+# Applying deltas
+# ---------------------------------------------------------------------------
+
+def apply_deltas(deltas):
+    """
+    Add per-user deltas to the stored summaries with one UPDATE per user.
+    Users without a summary row are skipped; get_summary() builds the row
+    from the source tables on first read.
+
+    Args:
+        deltas: dict of user_id -> {field: amount}
+    """
+    now = timezone.now()
+    for user_id, delta in deltas.items():
+        changes = {name: F(name) + value for name, value in delta.items() if value}
+        if not changes:
+            continue
+        AccountSummary.objects.filter(user_id=user_id).update(updated_at=now, **changes)
+
+
+def _add(deltas, user_id, contribution, sign=1):
+    for name, value in contribution.items():
+        deltas[user_id][name] = deltas[user_id].get(name, 0) + sign * value
+
+
+def record_transactions(entries):
+    """Account for Transaction rows written with bulk_create (no signals fire)"""
+    deltas = defaultdict(dict)
+    for entry in entries:
+        _add(deltas, entry.user_id, _transaction_contribution(_snapshot(entry)))
+    apply_deltas(deltas)
+
+
+@receiver(post_init, sender=Transaction)
+@receiver(post_init, sender=Portfolio)
+@receiver(post_init, sender=UserStockPosition)
+def remember_summary_state(sender, instance, **kwargs):
+    # post_init runs before from_db() marks the instance as loaded, so the
+    # snapshot is always taken and post_save decides whether it is used
+    instance._summary_state = _snapshot(instance)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_save, sender=UserStockPosition)
+def update_summary_on_save(sender, instance, created, **kwargs):
+    old_state = None if created else getattr(instance, '_summary_state', None)
+    new_state = _snapshot(instance)
+
+    if new_state is None or (old_state is None and not created):
+        # Partial instance: the delta cannot be trusted, rebuild this user
+        transaction.on_commit(lambda: rebuild(user_ids=[instance.user_id]))
+        return
+
+    if sender is UserStockPosition:
+        # Revalue at today's price and remember what was added, so the next
+        # change takes back the same amount
+        value = _summary_value(instance, new_state)
+        if value != new_state['summary_value']:
+            UserStockPosition.objects.filter(pk=instance.pk).update(summary_value=value)
+            instance.summary_value = new_state['summary_value'] = value
+
+    deltas = defaultdict(dict)
+    if old_state is not None:
+        _add(deltas, old_state['user_id'], _contribution(instance, old_state), sign=-1)
+    _add(deltas, new_state['user_id'], _contribution(instance, new_state))
+    apply_deltas(deltas)
+
+    instance._summary_state = new_state
+
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Portfolio)
+@receiver(post_delete, sender=UserStockPosition)
+def update_summary_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_summary_state', None)
+    if state is None:
+        return
+    deltas = defaultdict(dict)
+    _add(deltas, state['user_id'], _contribution(instance, state), sign=-1)
+    apply_deltas(deltas)
+
+
+# ---------------------------------------------------------------------------
+# Rebuild / verify / read
+# ---------------------------------------------------------------------------
+
+def compute(user_ids):
+    """Compute summaries from the source tables for the given users"""
+    summaries = {user_id: dict.fromkeys(SUMMARY_FIELDS, 0) for user_id in user_ids}
+
+    transactions = (
+        Transaction.objects.filter(user_id__in=user_ids, status='completed')
+        .values('user_id', 'transaction_type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    for row in transactions:
+        summary = summaries[row['user_id']]
+        if row['transaction_type'] == 'deposit':
+            summary['total_deposits'] = row['total']
+            summary['deposits_count'] = row['count']
+        else:
+            summary['total_withdrawals'] = row['total']
+            summary['withdrawals_count'] = row['count']
+
+    portfolios = (
+        Portfolio.objects.filter(user_id__in=user_ids, is_active=True)
+        .values('user_id')
+        .annotate(count=Count('id'), invested=Sum('invested'))
+    )
+    for row in portfolios:
+        summary = summaries[row['user_id']]
+        summary['active_portfolios_count'] = row['count']
+        summary['active_portfolios_invested'] = row['invested']
+
+    positions = (
+        UserStockPosition.objects.filter(user_id__in=user_ids, is_active=True)
+        .values('user_id')
+        .annotate(count=Count('id'), invested=Sum('total_invested'), value=Sum('summary_value'))
+    )
+    for row in positions:
+        summary = summaries[row['user_id']]
+        summary['open_positions_count'] = row['count']
+        summary['open_positions_invested'] = row['invested']
+        summary['open_positions_value'] = row['value']
+
+    return summaries
+
+
+def _quantize(summary):
+    return {
+        name: Decimal(value).quantize(Decimal('0.01')) if not name.endswith('_count') else int(value)
+        for name, value in summary.items()
+    }
+
+
+def _user_id_chunks(user_ids=None):
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        for i in range(0, len(user_ids), REBUILD_CHUNK_SIZE):
+            yield user_ids[i:i + REBUILD_CHUNK_SIZE]
+        return
+
+    last_id = 0
+    while True:
+        chunk = list(
+            CustomUser.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:REBUILD_CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def rebuild(user_ids=None):
+    """Recompute and upsert summaries (all users when user_ids is None). Returns the row count."""
+    written = 0
+    for chunk in _user_id_chunks(user_ids):
+        now = timezone.now()
+        rows = [
+            AccountSummary(user_id=user_id, updated_at=now, **_quantize(summary))
+            for user_id, summary in compute(chunk).items()
+        ]
+        AccountSummary.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=SUMMARY_FIELDS + ['updated_at'],
+        )
+        written += len(rows)
+    return written
+
+
+def verify(user_ids=None):
+    """
+    Compare stored summaries with freshly computed ones.
+    Returns a list of (user_id, field, stored, expected) mismatches; a missing
+    row is reported with field None.
+    """
+    mismatches = []
+    for chunk in _user_id_chunks(user_ids):
+        stored = {
+            row['user_id']: row
+            for row in AccountSummary.objects.filter(user_id__in=chunk).values('user_id', *SUMMARY_FIELDS)
+        }
+        for user_id, summary in compute(chunk).items():
+            row = stored.get(user_id)
+            if row is None:
+                mismatches.append((user_id, None, None, None))
+                continue
+            for name, expected in _quantize(summary).items():
+                if row[name] != expected:
+                    mismatches.append((user_id, name, row[name], expected))
+    return mismatches
+
+
+def get_summary(user):
+    """Return the user's AccountSummary, building it on first access"""
+    summary = AccountSummary.objects.filter(user=user).first()
+    if summary is None:
+        rebuild(user_ids=[user.pk])
+        summary = AccountSummary.objects.get(user=user)
+    return summary
+
+
+def store_position_values(book):
+    """
+    Write a revaluation (a PositionBook of open positions from
+    valuation_service) in chunks: each position's summary_value, then its
+    owner's open_positions_value summed from them. Summaries of users with
+    no open position left are zeroed.
+    """
+    now = timezone.now()
+    values = [Decimal(f"{value:.2f}") for value in book.market_value.tolist()]
+    positions = [
+        UserStockPosition(pk=position_id, summary_value=value)
+        for position_id, value in zip(book.ids.tolist(), values)
+    ]
+    UserStockPosition.objects.bulk_update(positions, ['summary_value'], batch_size=REBUILD_CHUNK_SIZE)
+
+    open_value = (
+        UserStockPosition.objects.filter(user_id=OuterRef('user_id'), is_active=True)
+        .order_by()
+        .values('user_id')
+        .annotate(total=Sum('summary_value'))
+        .values('total')
+    )
+    user_ids = sorted(set(book.user_ids.tolist()))
+    for chunk in _user_id_chunks(user_ids):
+        AccountSummary.objects.filter(user_id__in=chunk).update(
+            open_positions_value=Coalesce(Subquery(open_value), Value(Decimal('0.00'))),
+            updated_at=now,
+        )
+
+    # Users whose last position closed are not in the book
+    (
+        AccountSummary.objects.exclude(open_positions_value=0)
+        .exclude(user_id__in=UserStockPosition.objects.filter(is_active=True).values('user_id'))
+        .update(open_positions_value=Decimal('0.00'), updated_at=now)
+    )
@@ -1,12 +1,15 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.contrib.auth.admin import UserAdmin
+from django.utils import timezone
+from . import leaderboard_service, outbox_service, valuation_service
 from .models import (
     CustomUser, 
     Transaction, 
     PaymentMethod, 
     AdminWallet, 
     Trader, 
+    TraderPerformancePoint,
     # Asset,
     TraderPortfolio,
     UserTraderCopy,
@@ -15,6 +18,10 @@ from .models import (
     News,
     Stock, 
     UserStockPosition,
+    StockOrder,
+    PriceAlert,
+    EmailOutbox,
+    Broadcast,
 
     WalletConnection,
 
@@ -320,6 +327,86 @@ class StockAdmin(admin.ModelAdmin):
 
 
 
+@admin.register(StockOrder)
+class StockOrderAdmin(admin.ModelAdmin):
+    list_display = [
+        'reference',
+        'user',
+        'stock',
+        'side',
+        'order_type',
+        'shares',
+        'trigger_price',
+        'status',
+        'fill_price',
+        'created_at',
+    ]
+    list_filter = ['status', 'side', 'order_type', 'created_at']
+    search_fields = ['reference', 'trade_reference', 'user__email', 'stock__symbol']
+    readonly_fields = ['reference', 'trade_reference', 'fill_price', 'filled_at', 'created_at', 'updated_at']
+    list_select_related = ['user', 'stock']
+
+
+@admin.register(PriceAlert)
+class PriceAlertAdmin(admin.ModelAdmin):
+    list_display = [
+        'user',
+        'stock',
+        'direction',
+        'target_price',
+        'status',
+        'triggered_price',
+        'triggered_at',
+        'created_at',
+    ]
+    list_filter = ['status', 'direction', 'created_at']
+    search_fields = ['user__email', 'stock__symbol', 'note']
+    readonly_fields = ['triggered_price', 'triggered_at', 'created_at', 'updated_at']
+    list_select_related = ['user', 'stock']
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = [
+        'to_email',
+        'subject',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'created_at',
+        'sent_at',
+    ]
+    list_filter = ['status', 'created_at']
+    search_fields = ['to_email', 'subject', 'last_error']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected dead emails')
+    def requeue(self, request, queryset):
+        requeued = outbox_service.requeue_dead(queryset)
+        self.message_user(request, f'{requeued} emails requeued')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = [
+        'title',
+        'segment',
+        'type',
+        'status',
+        'recipients',
+        'emails',
+        'seconds',
+        'sent_by',
+        'created_at',
+        'completed_at',
+    ]
+    list_filter = ['status', 'segment', 'type', 'send_email', 'created_at']
+    search_fields = ['title', 'message', 'sent_by__email']
+    readonly_fields = ['status', 'last_user_id', 'recipients', 'emails', 'seconds', 'created_at', 'completed_at']
+    list_select_related = ['sent_by']
+
+
 @admin.register(UserStockPosition)
 class UserStockPositionAdmin(admin.ModelAdmin):
     list_display = [
@@ -338,7 +425,8 @@ class UserStockPositionAdmin(admin.ModelAdmin):
         'calculated_current_value', 
         'calculated_profit_loss',
         'calculated_profit_loss_percent',
-        'opened_at'
+        'opened_at',
+        'exits_updated_at',
     ]
     
     fieldsets = (
@@ -370,6 +458,14 @@ class UserStockPositionAdmin(admin.ModelAdmin):
             ),
             'description': 'Enable "Use admin profit" to override calculated values with custom profit/loss'
         }),
+        ('Automatic Exits', {
+            'fields': (
+                'stop_loss',
+                'take_profit',
+                'exits_updated_at',
+            ),
+            'description': 'The whole position is sold when the stock price crosses either level'
+        }),
     )
     
     def user_email(self, obj):
@@ -382,18 +478,36 @@ class UserStockPositionAdmin(admin.ModelAdmin):
     stock_symbol.short_description = 'Stock'
     stock_symbol.admin_order_field = 'stock__symbol'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'stock')
+
+    def save_model(self, request, obj, form, change):
+        if 'stop_loss' in form.changed_data or 'take_profit' in form.changed_data:
+            # Lets the alert books pick the new levels up on their next sync
+            obj.exits_updated_at = timezone.now()
+        super().save_model(request, obj, form, change)
+
+    def get_changelist_instance(self, request):
+        """Value the whole changelist page in one vectorized pass"""
+        changelist = super().get_changelist_instance(request)
+        valuations = valuation_service.value_positions(changelist.result_list)
+        for obj in changelist.result_list:
+            obj._valuation = valuations[obj.id]
+        return changelist
+    
+    def _valuation(self, obj):
+        valuation = getattr(obj, '_valuation', None)
+        if valuation is None:
+            valuation = obj._valuation = valuation_service.value_positions([obj])[obj.id]
+        return valuation
+    
     def display_current_value(self, obj):
         """Display current value with color coding"""
         # Check if required fields exist
         if not obj.stock or not obj.shares or not obj.total_invested:
             return format_html('<span>-</span>')
         
-        if obj.use_admin_profit:
-            value = float(obj.total_invested) + float(obj.admin_profit_loss)
-        else:
-            value = float(obj.current_value)
-        
-        formatted_value = f"${value:,.2f}"
+        formatted_value = f"${self._valuation(obj).value:,.2f}"
         return format_html(
             '<span style="font-weight: bold;">{}</span>',
             formatted_value
@@ -406,8 +520,9 @@ class UserStockPositionAdmin(admin.ModelAdmin):
         if not obj.stock or not obj.shares or not obj.total_invested:
             return format_html('<span>-</span>')
         
-        pl = float(obj.profit_loss)
-        pl_percent = float(obj.profit_loss_percent)
+        valuation = self._valuation(obj)
+        pl = valuation.profit_loss
+        pl_percent = valuation.profit_loss_percent
         color = 'green' if pl >= 0 else 'red'
         symbol = '+' if pl >= 0 else ''
         
@@ -431,11 +546,8 @@ class UserStockPositionAdmin(admin.ModelAdmin):
         if not obj.stock or not obj.shares or obj.stock.price is None:
             return format_html('<span style="color: gray;">-</span>')
         
-        calc_value = float(obj.shares) * float(obj.stock.price)
-        price = float(obj.stock.price)
-        
-        formatted_value = f"${calc_value:,.2f}"
-        formatted_price = f"${price:,.2f}"
+        formatted_value = f"${self._valuation(obj).market_value:,.2f}"
+        formatted_price = f"${float(obj.stock.price):,.2f}"
         
         return format_html(
             '{} <small>(@ {}/share)</small>',
@@ -450,8 +562,7 @@ class UserStockPositionAdmin(admin.ModelAdmin):
         if not obj.stock or not obj.shares or not obj.total_invested or obj.stock.price is None:
             return format_html('<span style="color: gray;">-</span>')
         
-        calc_value = float(obj.shares) * float(obj.stock.price)
-        calc_pl = calc_value - float(obj.total_invested)
+        calc_pl = self._valuation(obj).market_profit_loss
         color = 'green' if calc_pl >= 0 else 'red'
         symbol = '+' if calc_pl >= 0 else ''
         
@@ -470,11 +581,7 @@ class UserStockPositionAdmin(admin.ModelAdmin):
         if not obj.stock or not obj.shares or not obj.total_invested or obj.stock.price is None:
             return format_html('<span style="color: gray;">-</span>')
         
-        calc_value = float(obj.shares) * float(obj.stock.price)
-        calc_pl = calc_value - float(obj.total_invested)
-        
-        total_invested = float(obj.total_invested)
-        calc_pl_percent = (calc_pl / total_invested * 100) if total_invested > 0 else 0
+        calc_pl_percent = self._valuation(obj).market_profit_loss_percent
         
         color = 'green' if calc_pl_percent >= 0 else 'red'
         symbol = '+' if calc_pl_percent >= 0 else ''
@@ -641,9 +748,20 @@ class UserSignalPurchaseAdmin(admin.ModelAdmin):
 admin.site.register(UserTraderCopy)
 
 
+class TraderPerformancePointInline(admin.TabularInline):
+    """Chart points, replacing the old performance JSON fields; history points are kept in step with copy trades"""
+    model = TraderPerformancePoint
+    fields = ('series', 'period', 'value', 'source')
+    readonly_fields = ('source',)
+    ordering = ('series', '-period')
+    extra = 0
+
+
 @admin.register(Trader)
 class TraderAdmin(admin.ModelAdmin):
     """Admin configuration for Trader model"""
+
+    inlines = [TraderPerformancePointInline]
     
     list_display = [
         'name',
@@ -791,11 +909,13 @@ class TraderAdmin(admin.ModelAdmin):
     @admin.action(description='Mark selected traders as active')
     def mark_as_active(self, request, queryset):
         updated = queryset.update(is_active=True)
+        leaderboard_service.invalidate()
         self.message_user(request, f'{updated} trader(s) marked as active.')
     
     @admin.action(description='Mark selected traders as inactive')
     def mark_as_inactive(self, request, queryset):
         updated = queryset.update(is_active=False)
+        leaderboard_service.invalidate()
         self.message_user(request, f'{updated} trader(s) marked as inactive.')
 
 
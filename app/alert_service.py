@@ -0,0 +1,410 @@
+"""
+Alert service for Citadel Markets Pro
+Price alerts and stop-loss/take-profit exits, matched on price updates through sorted trigger books
+"""
+
+from datetime import timedelta
+import threading
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import balance_service, sync_service
+from .models import Notification, PriceAlert, Stock, UserStockPosition
+from .price_triggers import ABOVE, BELOW, TriggerIndex
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AlertError(Exception):
+    """Raised when an alert or exit level cannot be set"""
+
+
+# How far back each sync re-reads new alerts and changed exit levels
+SYNC_LOOKBACK = timedelta(seconds=30)
+
+# Per-process books; the DB rows stay the source of truth.
+# _alerts is keyed by PriceAlert id, _exits by UserStockPosition id.
+_alerts = TriggerIndex()
+_exits = TriggerIndex()
+_lock = threading.Lock()
+_known_alerts = set()
+_armed_exits = {}  # position id -> (symbol, stop_loss, take_profit)
+_synced_at = None
+
+
+def _arm_exit(position_id, symbol, stop_loss, take_profit):
+    """Put a position's exit levels in the book, replacing any it had. Caller holds _lock."""
+    _disarm_exit(position_id)
+    if stop_loss is None and take_profit is None:
+        return
+    if stop_loss is not None:
+        _exits.add(symbol, BELOW, stop_loss, position_id)
+    if take_profit is not None:
+        _exits.add(symbol, ABOVE, take_profit, position_id)
+    _armed_exits[position_id] = (symbol, stop_loss, take_profit)
+
+
+def _disarm_exit(position_id):
+    """Caller holds _lock"""
+    armed = _armed_exits.pop(position_id, None)
+    if armed is None:
+        return
+    symbol, stop_loss, take_profit = armed
+    if stop_loss is not None:
+        _exits.remove(symbol, BELOW, stop_loss, position_id)
+    if take_profit is not None:
+        _exits.remove(symbol, ABOVE, take_profit, position_id)
+
+
+def _sync_books():
+    """
+    Load active alerts and armed positions. The first call per process reads
+    them all; later calls only read alerts created, and positions whose exit
+    levels changed, since the previous sync. Caller must hold _lock.
+    """
+    global _synced_at
+
+    now = timezone.now()
+    alerts = PriceAlert.objects.filter(status='active')
+    positions = UserStockPosition.objects.filter(
+        Q(stop_loss__isnull=False) | Q(take_profit__isnull=False),
+        is_active=True,
+    )
+    if _synced_at is not None:
+        since = _synced_at - SYNC_LOOKBACK
+        alerts = alerts.filter(created_at__gte=since)
+        # Closed and cleared positions are read too, so they get disarmed
+        positions = UserStockPosition.objects.filter(exits_updated_at__gte=since)
+
+    # order_by() drops the default ordering so the index range scan is used
+    rows = alerts.order_by().values_list('id', 'stock__symbol', 'direction', 'target_price')
+    for alert_id, symbol, direction, target_price in rows.iterator():
+        if alert_id in _known_alerts:
+            continue
+        _known_alerts.add(alert_id)
+        _alerts.add(symbol, direction, target_price, alert_id)
+
+    rows = positions.order_by().values_list('id', 'stock__symbol', 'is_active', 'stop_loss', 'take_profit')
+    for position_id, symbol, is_active, stop_loss, take_profit in rows.iterator():
+        if is_active:
+            _arm_exit(position_id, symbol, stop_loss, take_profit)
+        else:
+            _disarm_exit(position_id)
+
+    _synced_at = now
+
+
+def rebuild_books():
+    """Drop the in-memory books and reload them from the DB. Returns (alerts, positions)."""
+    global _synced_at
+
+    with _lock:
+        _alerts.clear()
+        _exits.clear()
+        _known_alerts.clear()
+        _armed_exits.clear()
+        _synced_at = None
+        _sync_books()
+        return len(_known_alerts), len(_armed_exits)
+
+
+# ---------------------------------------------------------------------------
+# Alerts
+# ---------------------------------------------------------------------------
+
+def _crossed(direction, level, price):
+    return price <= level if direction == BELOW else price >= level
+
+
+def create_alert(user, stock, target_price, direction=None, note=""):
+    """
+    Arm a one-shot alert. direction defaults to the side of the current price
+    the target is on; an explicit direction that is already crossed is refused.
+    Returns the PriceAlert.
+    """
+    if direction is None:
+        direction = ABOVE if target_price > stock.price else BELOW
+    elif _crossed(direction, target_price, stock.price):
+        raise AlertError(
+            f"{stock.symbol} is already {direction} ${target_price} (current price ${stock.price})"
+        )
+
+    alert = PriceAlert.objects.create(
+        user=user,
+        stock=stock,
+        direction=direction,
+        target_price=target_price,
+        note=note,
+    )
+    with _lock:
+        _known_alerts.add(alert.id)
+        _alerts.add(stock.symbol, direction, target_price, alert.id)
+    return alert
+
+
+def cancel_alert(user, alert_id):
+    """Cancel one of the user's active alerts. Returns True if it was active."""
+    alert = PriceAlert.objects.filter(
+        pk=alert_id,
+        user=user,
+        status='active',
+    ).select_related('stock').first()
+
+    if alert is None:
+        return False
+
+    cancelled = PriceAlert.objects.filter(pk=alert.pk, status='active').update(
+        status='cancelled',
+        updated_at=timezone.now(),
+    )
+
+    with _lock:
+        _known_alerts.discard(alert.id)
+        _alerts.remove(alert.stock.symbol, alert.direction, alert.target_price, alert.id)
+
+    return bool(cancelled)
+
+
+# ---------------------------------------------------------------------------
+# Stop-loss / take-profit
+# ---------------------------------------------------------------------------
+
+def set_position_exits(user, position_id, stop_loss=None, take_profit=None):
+    """
+    Set (or clear, with None) the exit levels of one of the user's open
+    positions. stop_loss must be below and take_profit above the current price.
+    Returns the position, or None if the user has no such open position.
+    """
+    position = UserStockPosition.objects.filter(
+        pk=position_id,
+        user=user,
+        is_active=True,
+    ).select_related('stock').first()
+
+    if position is None:
+        return None
+
+    price = position.stock.price
+    if stop_loss is not None and stop_loss >= price:
+        raise AlertError(f"Stop-loss must be below the current price (${price})")
+    if take_profit is not None and take_profit <= price:
+        raise AlertError(f"Take-profit must be above the current price (${price})")
+
+    position.stop_loss = stop_loss
+    position.take_profit = take_profit
+    position.exits_updated_at = timezone.now()
+    UserStockPosition.objects.filter(pk=position.pk).update(
+        stop_loss=stop_loss,
+        take_profit=take_profit,
+        exits_updated_at=position.exits_updated_at,
+    )
+    sync_service.record([position])
+
+    with _lock:
+        _arm_exit(position.id, position.stock.symbol, stop_loss, take_profit)
+
+    return position
+
+
+def exit_reason(position, price):
+    """'stop_loss', 'take_profit' or None for a position at price"""
+    if position.stop_loss is not None and price <= position.stop_loss:
+        return 'stop_loss'
+    if position.take_profit is not None and price >= position.take_profit:
+        return 'take_profit'
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Matching
+# ---------------------------------------------------------------------------
+
+def match_prices(prices):
+    """
+    Fire every alert and exit crossed by a batch of price updates.
+
+    Each book hands back only the crossed keys with one bisect per symbol,
+    so a quote costs the same however many levels are armed.
+
+    Args:
+        prices: dict of symbol -> new price
+
+    Returns: (alerts triggered, positions visited by an exit)
+    """
+    if not prices:
+        return [], []
+
+    with _lock:
+        _sync_books()
+        alert_hits = _alerts.pop_crossed_entries(prices)
+        exit_hits = _exits.pop_crossed(prices)
+
+        alert_ids = [alert_id for entries in alert_hits.values() for _, _, alert_id in entries]
+        _known_alerts.difference_update(alert_ids)
+
+        # Either leg firing takes the position out; drop its other leg too
+        position_ids = sorted({pk for ids in exit_hits.values() for pk in ids})
+        armed = {pk: _armed_exits[pk] for pk in position_ids if pk in _armed_exits}
+        for position_id in position_ids:
+            _disarm_exit(position_id)
+
+    # A batch that raises rolled back, so its alerts and exits are still
+    # live in the DB: put them back in the books for a later quote
+    try:
+        alerts = _fire_alerts(alert_ids, prices) if alert_ids else []
+    except Exception:
+        _restore(alert_hits, armed)
+        raise
+    try:
+        positions = _execute_exits(position_ids, prices) if position_ids else []
+    except Exception:
+        _restore({}, armed)
+        raise
+    return alerts, positions
+
+
+def _restore(alert_hits, armed):
+    """Return popped alerts and disarmed exits, skipping any a sync has re-added meanwhile"""
+    with _lock:
+        for symbol, entries in alert_hits.items():
+            for direction, level, alert_id in entries:
+                if alert_id not in _known_alerts:
+                    _known_alerts.add(alert_id)
+                    _alerts.add(symbol, direction, level, alert_id)
+        for position_id, (symbol, stop_loss, take_profit) in armed.items():
+            if position_id not in _armed_exits:
+                _arm_exit(position_id, symbol, stop_loss, take_profit)
+
+
+def _fire_alerts(alert_ids, prices):
+    """Mark a batch of alerts triggered and notify their owners, one UPDATE and one INSERT"""
+    now = timezone.now()
+    notifications = []
+
+    with transaction.atomic():
+        alerts = list(
+            PriceAlert.objects.select_for_update()
+            .filter(pk__in=alert_ids, status='active')
+            .select_related('stock')
+        )
+
+        for alert in alerts:
+            symbol = alert.stock.symbol
+            price = prices[symbol]
+            alert.status = 'triggered'
+            alert.triggered_price = price
+            alert.triggered_at = now
+            alert.updated_at = now
+            notifications.append(Notification(
+                user_id=alert.user_id,
+                type='alert',
+                title=f'{symbol} Price Alert',
+                message=f"{symbol} {alert.get_direction_display().lower()} ${alert.target_price} (now ${price})",
+                full_details=alert.note or f"Your alert on {symbol} at ${alert.target_price} was triggered at ${price}.",
+                metadata={'alert_id': alert.id, 'symbol': symbol, 'price': str(price)},
+            ))
+
+        PriceAlert.objects.bulk_update(alerts, ['status', 'triggered_price', 'triggered_at', 'updated_at'])
+        balance_service.record(notifications=notifications)
+
+    if alerts:
+        logger.info(f"Price alerts: {len(alerts)} triggered")
+    return alerts
+
+
+def _execute_exits(position_ids, prices):
+    """
+    Sell out a batch of positions whose stop-loss or take-profit was crossed,
+    in one transaction with a savepoint per position (as order_service does).
+    A position whose levels moved since it was armed is re-armed instead.
+    """
+    ledger_entries, trades, notifications = [], [], []
+    fired, rearm = [], []
+    now = timezone.now()
+
+    with transaction.atomic():
+        positions = list(
+            UserStockPosition.objects.select_for_update()
+            .filter(pk__in=position_ids, is_active=True)
+            .select_related('user', 'stock')
+            .order_by('id')
+        )
+
+        for position in positions:
+            symbol = position.stock.symbol
+            price = prices[symbol]
+            reason = exit_reason(position, price)
+            if reason is None:
+                rearm.append((position.id, symbol, position.stop_loss, position.take_profit))
+                continue
+
+            label = 'Stop-loss' if reason == 'stop_loss' else 'Take-profit'
+            level = position.stop_loss if reason == 'stop_loss' else position.take_profit
+            shares = position.shares
+            fired.append(position)
+
+            try:
+                with transaction.atomic():
+                    sale = balance_service.apply_sell(
+                        position.user, position.stock, shares, price,
+                        notes=f"{label} @ ${level}", position=position,
+                    )
+            except balance_service.BalanceError as e:
+                notifications.append(Notification(
+                    user=position.user,
+                    type='trade',
+                    title=f'{label} Not Executed',
+                    message=f"Your {label.lower()} on {symbol} could not be executed",
+                    full_details=f"Reason: {e}\nLevel: ${level}\nPrice: ${price}",
+                ))
+            else:
+                ledger_entries.append(sale['transaction'])
+                trades.append(sale['trade'])
+                notifications.append(Notification(
+                    user=position.user,
+                    type='trade',
+                    title=f'{label} Executed',
+                    message=f"Sold {shares} {symbol} at ${price} ({label.lower()} ${level})",
+                    full_details=(
+                        f"Proceeds: ${sale['sale_value']:.2f}\n"
+                        f"P/L: ${sale['profit_loss']:.2f}\n"
+                        f"Reference: {sale['reference']}"
+                    ),
+                ))
+
+        # Exits are one-shot: clear the levels on everything that fired
+        UserStockPosition.objects.filter(pk__in=[p.pk for p in fired]).update(
+            stop_loss=None,
+            take_profit=None,
+            exits_updated_at=now,
+        )
+        sync_service.record(fired)
+        balance_service.record(
+            transactions=ledger_entries,
+            trades=trades,
+            notifications=notifications,
+        )
+
+    if rearm:
+        with _lock:
+            for args in rearm:
+                _arm_exit(*args)
+
+    if fired:
+        logger.info(f"Position exits: {len(trades)} executed, {len(fired) - len(trades)} failed")
+    return fired
+
+
+@receiver(post_save, sender=Stock)
+def match_alerts_on_price_save(sender, instance, **kwargs):
+    """Run the books against a stock saved with a new price (admin edits)"""
+    if not instance.is_active:
+        return
+
+    prices = {instance.symbol: instance.price}
+    transaction.on_commit(lambda: match_prices(prices))
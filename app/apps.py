@@ -5,4 +5,19 @@ class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
 
-    
+    def ready(self):
+        # Connect the signal receivers that live in the service modules
+        from . import (  # noqa: F401
+            account_summary_service,
+            alert_service,
+            auth_credentials,
+            copy_trading_service,
+            leaderboard_service,
+            notification_service,
+            order_service,
+            price_history_service,
+            referral_service,
+            stream_service,
+            sync_service,
+            trader_stats_service,
+        )
@@ -1,5 +1,17 @@
 # auth.py
-from rest_framework.authentication import BaseAuthentication
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.authtoken.models import Token
 
@@ -12,9 +24,260 @@ class CookieTokenAuthentication(BaseAuthentication):
         if not token_key:
             return None  # No token provided → DRF will move to next auth class
 
+        cached = authenticate_cached(token_key)
+        if cached is not None:
+            return cached
+
         try:
-            token = Token.objects.get(key=token_key)
+            token = Token.objects.select_related("user").get(key=token_key)
         except Token.DoesNotExist:
             raise AuthenticationFailed("Invalid or expired token")
 
+        remember(token)
         return (token.user, token)
+
+
+# ---------------------------------------------------------------------------
+# Token cache
+#
+# A repeat request with the same token within AUTH_TOKEN_CACHE_TTL seconds
+# skips the Token + CustomUser query. Entries are keyed by a hash of the token
+# so raw keys never sit in the cache, and each request gets its own fresh
+# user instance built from the cached row.
+#
+# Only the fields authentication and permissions read are cached (AUTH_FIELDS):
+# never the password hash or verification codes, and never balances, which
+# a cached copy could write back stale. Any other field of request.user is
+# loaded from the database on first access (see CustomUser.refresh_from_db).
+#
+# Set AUTH_TOKEN_CACHE_ALIAS to a CACHES alias (e.g. a shared Redis cache) so
+# logouts, password changes and deactivations are seen by every worker at
+# once. Without one, the in-process LRU is used only when the server runs a
+# single worker (WEB_CONCURRENCY, or AUTH_TOKEN_CACHE_WORKERS, of 1); with
+# more, every request re-checks its token in the database.
+# ---------------------------------------------------------------------------
+
+TTL = getattr(settings, "AUTH_TOKEN_CACHE_TTL", 60)
+MAX_ENTRIES = getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 10000)
+CACHE_ALIAS = getattr(settings, "AUTH_TOKEN_CACHE_ALIAS", None)
+WORKERS = int(getattr(settings, "AUTH_TOKEN_CACHE_WORKERS", os.environ.get("WEB_CONCURRENCY", 1)))
+
+AUTH_FIELDS = (
+    "id",
+    "email",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "is_verified",
+    "email_verified",
+    "has_submitted_kyc",
+    "two_factor_enabled",
+)
+
+
+def token_hash(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class LocalTokenCache:
+    """Bounded LRU with TTL, plus a user -> hashes map for invalidation"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key_hash):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires < time.monotonic():
+                self._discard(key_hash)
+                return None
+            self._entries.move_to_end(key_hash)
+            return payload
+
+    def set(self, key_hash, payload):
+        with self._lock:
+            self._discard(key_hash)
+            self._entries[key_hash] = (time.monotonic() + self.ttl, payload)
+            self._by_user.setdefault(payload["user_id"], set()).add(key_hash)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_token(self, key_hash):
+        with self._lock:
+            self._discard(key_hash)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key_hash in list(self._by_user.get(user_id, ())):
+                self._discard(key_hash)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _discard(self, key_hash):
+        entry = self._entries.pop(key_hash, None)
+        if entry is None:
+            return
+        user_id = entry[1]["user_id"]
+        hashes = self._by_user.get(user_id)
+        if hashes is not None:
+            hashes.discard(key_hash)
+            if not hashes:
+                del self._by_user[user_id]
+
+
+class SharedTokenCache:
+    """
+    Token cache on a Django cache backend. Per-user invalidation bumps a
+    generation counter that every entry is checked against, so a hit costs
+    two cache reads and no DB query.
+    """
+
+    def __init__(self, alias, ttl=TTL):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def _generation_key(self, user_id):
+        return f"authtoken:gen:{user_id}"
+
+    def get(self, key_hash):
+        payload = self.cache.get(f"authtoken:{key_hash}")
+        if payload is None:
+            return None
+        generation = self.cache.get(self._generation_key(payload["user_id"]), 0)
+        return payload if payload.get("generation") == generation else None
+
+    def set(self, key_hash, payload):
+        generation = self.cache.get(self._generation_key(payload["user_id"]), 0)
+        self.cache.set(f"authtoken:{key_hash}", {**payload, "generation": generation}, self.ttl)
+
+    def invalidate_token(self, key_hash):
+        self.cache.delete(f"authtoken:{key_hash}")
+
+    def invalidate_user(self, user_id):
+        key = self._generation_key(user_id)
+        self.cache.add(key, 0, None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+
+    def clear(self):
+        pass
+
+
+if CACHE_ALIAS:
+    token_cache = SharedTokenCache(CACHE_ALIAS)
+elif WORKERS <= 1:
+    token_cache = LocalTokenCache()
+else:
+    # Invalidations would only reach the worker that made them
+    token_cache = None
+
+
+def _auth_field_names():
+    # In model field order, as Model.from_db expects
+    return [
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.attname in AUTH_FIELDS
+    ]
+
+
+def remember(token):
+    """Cache a token loaded together with its user"""
+    if TTL <= 0 or token_cache is None:
+        return
+    user = token.user
+    names = _auth_field_names()
+    token_cache.set(token_hash(token.key), {
+        "user_id": user.pk,
+        "created": token.created,
+        "fields": names,
+        "values": [getattr(user, name) for name in names],
+    })
+
+
+def authenticate_cached(key):
+    """Return (user, token) for a cached token, or None on a miss"""
+    if TTL <= 0 or token_cache is None:
+        return None
+    payload = token_cache.get(token_hash(key))
+    if payload is None:
+        return None
+
+    User = get_user_model()
+    user = User.from_db(User.objects.db, payload["fields"], payload["values"])
+    user._from_token_cache = True
+    if not user.is_active:
+        return None
+
+    token = Token(key=key, user=user, created=payload["created"])
+    token._state.adding = False
+    token._state.db = User.objects.db
+    return (user, token)
+
+
+def invalidate_user(user_id):
+    """
+    Drop a user's cached tokens now and again once the current transaction
+    commits, so a request that read the old row in between cannot leave
+    it cached.
+    """
+    if token_cache is None:
+        return
+    token_cache.invalidate_user(user_id)
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
+
+
+def invalidate_token(key):
+    if token_cache is None:
+        return
+    key_hash = token_hash(key)
+    token_cache.invalidate_token(key_hash)
+    transaction.on_commit(lambda: token_cache.invalidate_token(key_hash))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    DRF TokenAuthentication ("Authorization: Token <key>") that serves
+    repeat requests from the token cache
+    """
+
+    def authenticate_credentials(self, key):
+        cached = authenticate_cached(key)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        remember(token)
+        return (user, token)
+
+
+# Any save of a user (password change, 2FA toggle, is_active, profile edit)
+# or removal of a token drops the cached entries
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_on_save(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_on_delete(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_on_delete(sender, instance, **kwargs):
+    invalidate_token(instance.key)
@@ -14,6 +14,8 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from datetime import timedelta
 
+from . import referral_service
+
 # Import your email service
 from .email_service import (
     generate_verification_code,
@@ -95,12 +97,13 @@ def register_user_with_verification(request):
             email_verified=False,  # NOT VERIFIED YET
             is_active=True,  # Keep active for login, but check email_verified in frontend
         )
+        referral_service.add_to_tree(user)
 
         # Generate and save verification code
         verification_code = generate_verification_code()
         user.verification_code = verification_code
         user.code_created_at = timezone.now()
-        user.save()
+        user.save(update_fields=["verification_code", "code_created_at"])
 
         # Send welcome email (non-blocking)
         try:
@@ -190,7 +193,7 @@ def verify_email(request):
     user.email_verified = True
     user.verification_code = None  # Clear the code
     user.code_created_at = None
-    user.save()
+    user.save(update_fields=["email_verified", "verification_code", "code_created_at"])
 
     return Response(
         {
@@ -234,7 +237,7 @@ def resend_verification_code(request):
     verification_code = generate_verification_code()
     user.verification_code = verification_code
     user.code_created_at = timezone.now()
-    user.save()
+    user.save(update_fields=["verification_code", "code_created_at"])
 
     # Send verification email
     email_sent = send_verification_code_email(user, verification_code)
@@ -295,7 +298,7 @@ def login_with_2fa(request):
         verification_code = generate_verification_code()
         user.verification_code = verification_code
         user.code_created_at = timezone.now()
-        user.save()
+        user.save(update_fields=["verification_code", "code_created_at"])
 
         # Send 2FA code email
         email_sent = send_2fa_code_email(user, verification_code)
@@ -391,7 +394,7 @@ def verify_2fa_login(request):
     # Clear verification code
     user.verification_code = None
     user.code_created_at = None
-    user.save()
+    user.save(update_fields=["verification_code", "code_created_at"])
 
     # Create/get token
     token, _ = Token.objects.get_or_create(user=user)
@@ -441,7 +444,7 @@ def resend_2fa_code(request):
     verification_code = generate_verification_code()
     user.verification_code = verification_code
     user.code_created_at = timezone.now()
-    user.save()
+    user.save(update_fields=["verification_code", "code_created_at"])
 
     # Send 2FA email
     email_sent = send_2fa_code_email(user, verification_code)
@@ -473,7 +476,7 @@ def enable_2fa(request):
         )
 
     user.two_factor_enabled = True
-    user.save()
+    user.save(update_fields=["two_factor_enabled"])
 
     return Response(
         {
@@ -517,7 +520,7 @@ def disable_2fa(request):
     user.two_factor_enabled = False
     user.verification_code = None
     user.code_created_at = None
-    user.save()
+    user.save(update_fields=["two_factor_enabled", "verification_code", "code_created_at"])
 
     return Response(
         {
@@ -0,0 +1,425 @@
+"""
+Balance service for Citadel Markets Pro
+Applies every money-moving operation inside a single database transaction
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from . import account_summary_service, notification_service, referral_service, stream_service, sync_service
+from .auth_credentials import invalidate_user
+from .models import (
+    CustomUser,
+    Transaction,
+    TradeHistory,
+    Notification,
+    UserStockPosition,
+    UserSignalPurchase,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceError(Exception):
+    """Raised when a balance operation cannot be applied"""
+
+
+class InsufficientFundsError(BalanceError):
+    """Raised when the account balance does not cover a debit"""
+
+
+def generate_reference(prefix):
+    """Generate a ledger reference such as BUY-XXXXXXXXXXXX"""
+    return f"{prefix}-{get_random_string(12).upper()}"
+
+
+def debit(user, amount):
+    """
+    Subtract amount from the user's balance.
+
+    The balance check and the subtraction happen in one conditional UPDATE,
+    so two concurrent debits can never take the balance below zero.
+    The in-memory user instance is refreshed with the stored balance.
+    """
+    updated = CustomUser.objects.filter(
+        pk=user.pk,
+        balance__gte=amount,
+    ).update(balance=F('balance') - amount)
+
+    invalidate_user(user.pk)
+    user.refresh_from_db(fields=['balance'])
+
+    if not updated:
+        raise InsufficientFundsError(
+            f"Insufficient balance. Required: ${amount:.2f}, Available: ${user.balance:.2f}"
+        )
+    sync_service.record_balance([user.pk])
+
+
+def credit(user, amount):
+    """Add amount to the user's balance with an atomic UPDATE"""
+    CustomUser.objects.filter(pk=user.pk).update(balance=F('balance') + amount)
+    invalidate_user(user.pk)
+    user.refresh_from_db(fields=['balance'])
+    sync_service.record_balance([user.pk])
+
+
+def adjust(user, delta, profit_delta=None):
+    """
+    Apply a signed balance change without a funds check (admin corrections).
+    Optionally moves the cumulative profit field by profit_delta as well.
+    """
+    changes = {'balance': F('balance') + delta}
+    if profit_delta is not None:
+        changes['profit'] = F('profit') + profit_delta
+
+    CustomUser.objects.filter(pk=user.pk).update(**changes)
+    invalidate_user(user.pk)
+    user.refresh_from_db(fields=list(changes))
+    sync_service.record_balance([user.pk])
+
+
+def record(transactions=(), trades=(), notifications=()):
+    """
+    Write the side records of a balance operation with one INSERT per table.
+    Instances must already carry their reference since bulk_create skips save().
+    """
+    if transactions:
+        Transaction.objects.bulk_create(transactions)
+        account_summary_service.record_transactions(transactions)
+        referral_service.record_transactions(transactions)
+    if trades:
+        TradeHistory.objects.bulk_create(trades)
+    if notifications:
+        Notification.objects.bulk_create(notifications)
+        notification_service.record_created(notifications)
+        stream_service.publish_notifications(notifications)
+    sync_service.record([*transactions, *trades, *notifications])
+
+
+def lock_transaction(transaction_id):
+    """Re-read a Transaction row under a row lock (call inside atomic())"""
+    return Transaction.objects.select_for_update().select_related('user').get(pk=transaction_id)
+
+
+def apply_buy(user, stock, shares, price, notes="Market buy order"):
+    """
+    Debit the cost of shares and add them to the user's open position.
+    Must run inside atomic(); the side records are returned, not written,
+    so callers settling many orders can insert them in one batch.
+
+    Returns (position, total_cost, reference, transaction, trade).
+    """
+    total_cost = shares * price
+    debit(user, total_cost)
+
+    position = UserStockPosition.objects.select_for_update().filter(
+        user=user,
+        stock=stock,
+        is_active=True,
+    ).first()
+
+    if position is None:
+        position = UserStockPosition.objects.create(
+            user=user,
+            stock=stock,
+            shares=shares,
+            average_buy_price=price,
+            total_invested=total_cost,
+        )
+    else:
+        new_total = position.total_invested + total_cost
+        new_shares = position.shares + shares
+        position.average_buy_price = new_total / new_shares
+        position.shares = new_shares
+        position.total_invested = new_total
+        position.save(update_fields=['average_buy_price', 'shares', 'total_invested'])
+
+    reference = generate_reference("BUY")
+    ledger_entry = Transaction(
+        user=user,
+        transaction_type="withdrawal",  # Buying is a withdrawal from balance
+        amount=total_cost,
+        reference=reference,
+        description=f"Bought {shares} shares of {stock.symbol} @ ${price}",
+        status="completed",
+    )
+    trade = TradeHistory(
+        user=user,
+        stock=stock,
+        trade_type='buy',
+        shares=shares,
+        price_per_share=price,
+        total_amount=total_cost,
+        reference=reference,
+        notes=notes,
+    )
+    return position, total_cost, reference, ledger_entry, trade
+
+
+def buy_stock(user, stock, shares, price=None, notes="Market buy order"):
+    """
+    Buy shares at price (the current stock price by default).
+
+    Returns (position, total_cost, reference).
+    """
+    price = stock.price if price is None else price
+
+    with transaction.atomic():
+        position, total_cost, reference, ledger_entry, trade = apply_buy(
+            user, stock, shares, price, notes
+        )
+        record(transactions=[ledger_entry], trades=[trade])
+
+    return position, total_cost, reference
+
+
+def _sale_value(position, shares, price):
+    """Return (sale_value, profit_loss) for selling shares out of position"""
+    if position.use_admin_profit:
+        # Use admin-set profit/loss, proportional on partial sales
+        if position.shares == shares:
+            profit_loss = position.admin_profit_loss
+            return position.total_invested + profit_loss, profit_loss
+
+        proportion = shares / position.shares
+        profit_loss = position.admin_profit_loss * proportion
+        return position.total_invested * proportion + profit_loss, profit_loss
+
+    sale_value = shares * price
+    return sale_value, sale_value - shares * position.average_buy_price
+
+
+def apply_sell(user, stock, shares, price, notes="Market sell order", position=None):
+    """
+    Remove shares from the user's open position and credit the proceeds.
+    Must run inside atomic(); like apply_buy the side records are returned.
+    A position already locked by the caller can be passed in.
+
+    Returns a dict with position, sale_value, profit_loss, reference,
+    transaction and trade.
+    """
+    if position is None:
+        position = UserStockPosition.objects.select_for_update().filter(
+            user=user,
+            stock=stock,
+            is_active=True,
+        ).first()
+
+    if position is None:
+        raise BalanceError("You don't own any shares of this stock")
+
+    if position.shares < shares:
+        raise BalanceError(f"Insufficient shares. You own {position.shares} shares")
+
+    sale_value, profit_loss = _sale_value(position, shares, price)
+
+    if position.shares == shares:
+        # Selling all shares - close position
+        position.is_active = False
+        position.closed_at = timezone.now()
+        if position.stop_loss is not None or position.take_profit is not None:
+            # Disarm automatic exits; alert_service picks this up on its next sync
+            position.stop_loss = None
+            position.take_profit = None
+            position.exits_updated_at = position.closed_at
+    else:
+        # Partial sale - scale invested amount (and admin P/L) proportionally
+        remaining_shares = position.shares - shares
+        proportion = remaining_shares / position.shares
+        position.shares = remaining_shares
+        position.total_invested = position.total_invested * proportion
+        if position.use_admin_profit:
+            position.admin_profit_loss = position.admin_profit_loss * proportion
+
+    position.save()
+    credit(user, sale_value)
+
+    reference = generate_reference("SELL")
+    return {
+        'position': position,
+        'sale_value': sale_value,
+        'profit_loss': profit_loss,
+        'reference': reference,
+        'transaction': Transaction(
+            user=user,
+            transaction_type="deposit",  # Selling is a deposit to balance
+            amount=sale_value,
+            reference=reference,
+            description=f"Sold {shares} shares of {stock.symbol} @ ${price} (P/L: ${float(profit_loss):.2f})",
+            status="completed",
+        ),
+        'trade': TradeHistory(
+            user=user,
+            stock=stock,
+            trade_type='sell',
+            shares=shares,
+            price_per_share=price,
+            total_amount=sale_value,
+            profit_loss=profit_loss,
+            reference=reference,
+            notes=notes,
+        ),
+    }
+
+
+def sell_stock(user, stock, shares, price=None, notes="Market sell order"):
+    """
+    Sell shares at price (the current stock price by default).
+
+    Returns a dict with position, sale_value, profit_loss and reference.
+    """
+    price = stock.price if price is None else price
+
+    with transaction.atomic():
+        sale = apply_sell(user, stock, shares, price, notes)
+        record(transactions=[sale.pop('transaction')], trades=[sale.pop('trade')])
+
+    return sale
+
+
+def purchase_signal(user, signal, signal_snapshot):
+    """Charge the signal price and create the purchase record"""
+    reference = generate_reference("SIG")
+
+    with transaction.atomic():
+        debit(user, signal.price)
+
+        purchase = UserSignalPurchase.objects.create(
+            user=user,
+            signal=signal,
+            amount_paid=signal.price,
+            purchase_reference=reference,
+            signal_data=signal_snapshot,
+        )
+
+        record(
+            transactions=[Transaction(
+                user=user,
+                transaction_type="withdrawal",
+                amount=signal.price,
+                reference=reference,
+                description=f"Purchased signal: {signal.name}",
+                status="completed",
+            )],
+            notifications=[Notification(
+                user=user,
+                type="system",
+                title="Signal Purchased Successfully",
+                message=f"You have successfully purchased the {signal.name} trading signal.",
+                full_details=f"Signal: {signal.name}\nAmount Paid: ${signal.price}\nReference: {reference}",
+            )],
+        )
+
+    return purchase
+
+
+def request_withdrawal(user, amount, balance_field='balance', **fields):
+    """
+    Hold amount from the user's balance and create a pending withdrawal.
+
+    balance_field lets the legacy withdrawal endpoint draw from the other
+    funding columns (equity, user_funds, free_margin).
+    """
+    with transaction.atomic():
+        updated = CustomUser.objects.filter(
+            pk=user.pk,
+            **{f'{balance_field}__gte': amount}
+        ).update(**{balance_field: F(balance_field) - amount})
+
+        invalidate_user(user.pk)
+        user.refresh_from_db(fields=[balance_field])
+
+        if not updated:
+            raise InsufficientFundsError(
+                f"Insufficient {balance_field.replace('_', ' ')} balance"
+            )
+        sync_service.record_balance([user.pk])
+
+        fields.setdefault('reference', generate_reference("WTH"))
+        withdrawal = Transaction.objects.create(
+            user=user,
+            transaction_type="withdrawal",
+            amount=amount,
+            status="pending",
+            **fields
+        )
+
+    return withdrawal
+
+
+def credit_earnings(user, amount, description):
+    """Credit admin-added earnings with their transaction and notification"""
+    reference = generate_reference("EARN")
+
+    with transaction.atomic():
+        credit(user, amount)
+        record(
+            transactions=[Transaction(
+                user=user,
+                transaction_type='deposit',
+                amount=amount,
+                status='completed',
+                reference=reference,
+                description=description,
+            )],
+            notifications=[Notification(
+                user=user,
+                type='system',
+                title='Earnings Added',
+                message=f'${amount} has been added to your account',
+                full_details=description,
+            )],
+        )
+
+    return reference
+
+
+def set_deposit_status(deposit_id, new_status, amount=None):
+    """
+    Change a deposit's status (and optionally amount) and move the balance
+    by the difference in credited value. Crediting depends on the locked
+    previous status, so approving the same deposit twice credits it once.
+
+    Returns (deposit, balance_delta).
+    """
+    with transaction.atomic():
+        deposit = lock_transaction(deposit_id)
+        old_credit = deposit.amount if deposit.status == 'completed' else Decimal('0')
+
+        deposit.status = new_status
+        if amount is not None:
+            deposit.amount = amount
+        deposit.save(update_fields=['status', 'amount', 'updated_at'])
+
+        new_credit = deposit.amount if deposit.status == 'completed' else Decimal('0')
+        delta = new_credit - old_credit
+        if delta:
+            adjust(deposit.user, delta)
+
+    return deposit, delta
+
+
+def reject_withdrawal(withdrawal_id, new_status='failed'):
+    """
+    Mark a withdrawal as not processed and refund the held amount.
+    The refund only happens on the first transition away from pending/completed.
+
+    Returns (withdrawal, refunded).
+    """
+    with transaction.atomic():
+        withdrawal = lock_transaction(withdrawal_id)
+        refunded = withdrawal.status not in ('failed', 'cancelled')
+
+        withdrawal.status = new_status
+        withdrawal.save(update_fields=['status', 'updated_at'])
+
+        if refunded:
+            credit(withdrawal.user, withdrawal.amount)
+
+    return withdrawal, refunded
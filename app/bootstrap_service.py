@@ -0,0 +1,58 @@
+"""
+Bootstrap service for Citadel Markets Pro
+Builds independent response sections concurrently on a shared thread pool
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Sections of one request run side by side; each worker keeps its own
+# database connection, reused across requests within CONN_MAX_AGE
+WORKERS = getattr(settings, 'BOOTSTRAP_WORKERS', 8)
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='bootstrap')
+
+
+def _run(name, build):
+    # Worker threads see no request_started/finished signals, so apply the
+    # same connection hygiene around each section
+    close_old_connections()
+    started = time.perf_counter()
+    try:
+        return build(), None, time.perf_counter() - started
+    except Exception as e:
+        logger.exception(f"Bootstrap section '{name}' failed")
+        return None, str(e), time.perf_counter() - started
+    finally:
+        close_old_connections()
+
+
+def build(sections):
+    """
+    Build every section concurrently.
+
+    Args:
+        sections: dict of name -> zero-argument callable returning the section
+
+    Returns: (results, errors, timings) dicts keyed by section name. A failing
+    section lands in errors and does not affect the others.
+    """
+    futures = {name: _pool.submit(_run, name, fn) for name, fn in sections.items()}
+
+    results, errors, timings = {}, {}, {}
+    for name, future in futures.items():
+        result, error, seconds = future.result()
+        timings[name] = seconds
+        if error is None:
+            results[name] = result
+        else:
+            errors[name] = error
+    return results, errors, timings
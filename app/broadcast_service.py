@@ -0,0 +1,273 @@
+"""
+Broadcast service for Citadel Markets Pro
+Fans one notification (and optionally an email) out to a segment of users in bulk batches
+"""
+
+import time
+
+from django.db import connections, transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from . import email_templates, notification_service, outbox_service, stream_service, sync_service
+from .models import Broadcast, CustomUser, Notification, UserStockPosition, UserTraderCopy
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastError(Exception):
+    """Raised when a segment cannot be resolved"""
+
+
+# Recipients read, and notifications inserted, per round trip
+CHUNK_SIZE = 5000
+
+SEGMENTS = {
+    'all': 'All active users',
+    'verified': 'Users with a verified email',
+    'trader_copiers': 'Users actively copying a trader',
+    'stock_holders': 'Users holding a stock',
+}
+
+
+def segment_users(segment, trader=None, stock=None):
+    """
+    The users a segment targets, as a queryset (nothing is read yet).
+    trader_copiers needs a Trader and stock_holders a Stock.
+    """
+    users = CustomUser.objects.filter(is_active=True)
+
+    if segment == 'all':
+        return users
+    if segment == 'verified':
+        return users.filter(email_verified=True)
+    if segment == 'trader_copiers':
+        if trader is None:
+            raise BroadcastError("The trader_copiers segment needs a trader")
+        return users.filter(id__in=UserTraderCopy.objects.filter(
+            trader=trader,
+            is_actively_copying=True,
+        ).values('user_id'))
+    if segment == 'stock_holders':
+        if stock is None:
+            raise BroadcastError("The stock_holders segment needs a stock")
+        return users.filter(id__in=UserStockPosition.objects.filter(
+            stock=stock,
+            is_active=True,
+        ).values('user_id'))
+
+    raise BroadcastError(f"Unknown segment '{segment}'")
+
+
+def id_ranges(users, chunk_size=CHUNK_SIZE, after_id=0):
+    """
+    Split a user queryset into (after_id, last_id) primary key ranges of
+    chunk_size users each, starting after after_id. Each boundary is one
+    indexed query, and no cursor or transaction stays open between chunks.
+    """
+    last_id = after_id
+    ids = users.order_by('id').values_list('id', flat=True)
+    while True:
+        boundary = list(ids.filter(id__gt=last_id)[chunk_size - 1:chunk_size])
+        if boundary:
+            yield last_id, boundary[0]
+            last_id = boundary[0]
+        else:
+            if ids.filter(id__gt=last_id).exists():
+                yield last_id, None
+            return
+
+
+def _in_range(users, after_id, last_id):
+    users = users.filter(id__gt=after_id)
+    return users if last_id is None else users.filter(id__lte=last_id)
+
+
+def insert_notifications(users, notification):
+    """
+    INSERT ... SELECT one copy of an unsaved Notification for every user in
+    the queryset, entirely inside the database. Returns the number of rows.
+    """
+    now = timezone.now()
+    values = {
+        'type': notification.type,
+        'title': notification.title,
+        'message': notification.message,
+        'full_details': notification.full_details,
+        'metadata': notification.metadata,
+        'read': False,
+        'created_at': now,
+        'updated_at': now,
+    }
+    columns = {
+        f"_n_{name}": Value(value, output_field=Notification._meta.get_field(name))
+        for name, value in values.items()
+    }
+    rows = users.order_by().annotate(**columns).values_list('id', *columns)
+
+    connection = connections[rows.db]
+    names = [Notification._meta.get_field('user').column]
+    names += [Notification._meta.get_field(name).column for name in values]
+    sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(Notification._meta.db_table)} "
+            f"({', '.join(connection.ops.quote_name(name) for name in names)}) {sql}",
+            params,
+        )
+        inserted = cursor.rowcount
+
+    notification_service.record_inserted(users)
+    sync_service.record_queryset(Notification.objects.filter(user__in=users, created_at=now))
+    return inserted
+
+
+def queue_broadcast(segment, title, message, full_details='', type='system', send_email=False,
+                    trader=None, stock=None, sent_by=None):
+    """
+    Record a pending Broadcast for the worker to deliver (see deliver_pending).
+    The segment is checked now, so a bad one fails here rather than in the
+    worker. Returns the Broadcast record.
+    """
+    segment_users(segment, trader=trader, stock=stock)
+    return Broadcast.objects.create(
+        segment=segment,
+        trader=trader,
+        stock=stock,
+        type=type,
+        title=title,
+        message=message,
+        full_details=full_details,
+        send_email=send_email,
+        sent_by=sent_by,
+    )
+
+
+def broadcast(users, title, message, full_details='', type='system', send_email=False,
+              segment='', trader=None, stock=None, sent_by=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Create one Notification per user in a queryset and optionally queue an
+    announcement email to each, in this process. Returns the Broadcast record.
+    """
+    record = Broadcast.objects.create(
+        segment=segment,
+        trader=trader,
+        stock=stock,
+        type=type,
+        title=title,
+        message=message,
+        full_details=full_details,
+        send_email=send_email,
+        status='sending',
+        sent_by=sent_by,
+    )
+    return _deliver(record, users, chunk_size, progress)
+
+
+def deliver(record, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Deliver a queued (or resume an interrupted) Broadcast to its segment,
+    after the last user it reached. Returns the record.
+    """
+    Broadcast.objects.filter(pk=record.pk).update(status='sending')
+    record.status = 'sending'
+    users = segment_users(record.segment, trader=record.trader, stock=record.stock)
+    return _deliver(record, users, chunk_size, progress)
+
+
+def deliver_pending(chunk_size=CHUNK_SIZE):
+    """
+    Deliver every pending Broadcast, oldest first. Each one is claimed with a
+    conditional UPDATE, so concurrent workers never deliver the same one.
+    A broadcast that raises is marked failed and the rest still go out.
+    Returns the delivered records.
+    """
+    delivered = []
+    for record in Broadcast.objects.filter(status='pending').select_related('trader', 'stock').order_by('id'):
+        if not Broadcast.objects.filter(pk=record.pk, status='pending').update(status='sending'):
+            continue
+        record.status = 'sending'
+        try:
+            users = segment_users(record.segment, trader=record.trader, stock=record.stock)
+            delivered.append(_deliver(record, users, chunk_size))
+        except Exception:
+            logger.exception(f"Broadcast {record.id} failed after user {record.last_user_id}")
+            Broadcast.objects.filter(pk=record.pk).update(status='failed')
+    return delivered
+
+
+def _deliver(record, users, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Recipients are walked in primary key ranges of chunk_size. Each range
+    is one INSERT ... SELECT, so no per-recipient work happens in Python
+    unless emails are rendered. Each range commits together with the
+    record's running counts and last_user_id, so a broadcast that fails
+    part way has delivered whole ranges only and can be resumed with
+    deliver(). progress(record) is called after each range.
+    """
+    template = Notification(
+        type=record.type,
+        title=record.title,
+        message=record.message,
+        full_details=record.full_details or record.message,
+        metadata={'broadcast_id': record.id},
+    )
+    started = time.perf_counter() - record.seconds
+
+    for after_id, last_id in id_ranges(users, chunk_size, after_id=record.last_user_id):
+        chunk = _in_range(users, after_id, last_id)
+
+        with transaction.atomic():
+            created = insert_notifications(chunk, template)
+
+            if record.send_email:
+                record.emails += _queue_emails(chunk, record.title, record.message, chunk_size)
+
+            record.recipients += created
+            record.last_user_id = last_id if last_id is not None else (
+                users.order_by('-id').values_list('id', flat=True).first() or after_id
+            )
+            record.seconds = time.perf_counter() - started
+            record.save(update_fields=['recipients', 'emails', 'seconds', 'last_user_id'])
+
+            # Only read back the rows someone is connected to receive
+            live = stream_service.hub.subscribed_user_ids()
+            if live:
+                stream_service.publish_notifications(list(
+                    _in_range(Notification.objects.filter(user_id__in=live), after_id, last_id)
+                    .filter(created_at__gte=record.created_at, title=record.title)
+                ))
+
+        if progress is not None:
+            progress(record)
+
+    record.seconds = time.perf_counter() - started
+    record.status = 'completed'
+    record.completed_at = timezone.now()
+    record.save(update_fields=['seconds', 'status', 'completed_at'])
+
+    logger.info(
+        f"Broadcast {record.id} '{record.title}': {record.recipients} notifications, {record.emails} emails "
+        f"in {record.seconds:.2f}s ({record.per_second:,.0f}/sec)"
+    )
+    return record
+
+
+def _queue_emails(users, title, message, batch_size):
+    """Render the announcement layout for a chunk of users and queue it. Returns the count."""
+    rows = list(users.order_by('id').values_list('email', 'first_name'))
+    documents = email_templates.get_template('announcement').render_many(
+        {
+            'first_name': first_name or 'Trader',
+            'email': email,
+            'title': title,
+            'message': message,
+        }
+        for email, first_name in rows
+    )
+    outbox_service.enqueue_many(
+        ((email, title, html) for (email, _), html in zip(rows, documents)),
+        batch_size=batch_size,
+    )
+    return len(documents)
@@ -0,0 +1,250 @@
+"""
+Copy trading service for Citadel Markets Pro
+Keeps trader copy relationships consistent with each trader's minimum balance, with set-based updates
+"""
+
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import broadcast_service, stream_service, valuation_service
+from .models import CustomUser, Notification, Trader, UserCopyTraderHistory, UserTraderCopy
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Live valuations of each user's open copy trades are cached for this many
+# seconds; each web worker values a user on their first request after the
+# entry expires. The revalue_copy_trades job rewrites every entry in one
+# pass, which only helps when COPY_TRADE_VALUATION_CACHE_ALIAS names a cache
+# shared with the web workers (e.g. Redis): with the default per-process
+# LocMem cache its writes die with the job, so the job refuses to run.
+VALUATION_TTL = getattr(settings, 'COPY_TRADE_VALUATION_TTL', 60)
+VALUATION_CACHE_ALIAS = getattr(settings, 'COPY_TRADE_VALUATION_CACHE_ALIAS', 'default')
+
+
+def stop_copies_below_threshold(trader_id, old_threshold, new_threshold):
+    """
+    Stop every active copy of a trader whose user's balance is below the
+    trader's new minimum, and notify those users.
+
+    One conditional UPDATE on UserTraderCopy and one INSERT ... SELECT of
+    notifications, whatever the number of copiers. Returns the number of
+    copies stopped.
+    """
+    trader = Trader.objects.filter(pk=trader_id).only('id', 'name').first()
+    if trader is None:
+        return 0
+
+    now = timezone.now()
+    with transaction.atomic():
+        stopped = UserTraderCopy.objects.filter(
+            trader_id=trader_id,
+            is_actively_copying=True,
+            user__balance__lt=new_threshold,
+        ).update(
+            is_actively_copying=False,
+            stopped_copying_at=now,
+            last_updated=now,
+        )
+        if not stopped:
+            return 0
+
+        # The rows the UPDATE just stamped are exactly the ones to notify
+        users = CustomUser.objects.filter(id__in=UserTraderCopy.objects.filter(
+            trader_id=trader_id,
+            is_actively_copying=False,
+            stopped_copying_at=now,
+        ).values('user_id'))
+
+        notification = Notification(
+            type="alert",
+            title="Copy Trading Stopped",
+            message=f"Your copy of {trader.name} has been stopped due to minimum balance requirement change.",
+            full_details=(
+                f"The minimum balance requirement for {trader.name} has changed from ${old_threshold} "
+                f"to ${new_threshold}, and your balance is below the new minimum. Your copy trading has "
+                f"been automatically stopped. Please review and copy again if you meet the new requirements."
+            ),
+            metadata={'trader_id': trader_id, 'min_account_threshold': str(new_threshold)},
+        )
+        broadcast_service.insert_notifications(users, notification)
+
+        live = stream_service.hub.subscribed_user_ids()
+        if live:
+            stream_service.publish_notifications(list(Notification.objects.filter(
+                user_id__in=users.filter(id__in=live).values('id'),
+                created_at__gte=now,
+                title=notification.title,
+            )))
+
+    logger.info(
+        f"Trader {trader_id} threshold {old_threshold} -> {new_threshold}: {stopped} copies stopped"
+    )
+    return stopped
+
+
+@receiver(pre_save, sender=Trader)
+def check_trader_threshold_change(sender, instance, update_fields=None, **kwargs):
+    """
+    When admin changes trader's min_account_threshold, stop the copies of
+    users who no longer meet it once the trader save commits. The save
+    itself only pays for reading the old threshold.
+    """
+    if not instance.pk:
+        return
+    if update_fields is not None and 'min_account_threshold' not in update_fields:
+        return
+
+    old_threshold = Trader.objects.filter(pk=instance.pk).values_list(
+        'min_account_threshold', flat=True
+    ).first()
+    if old_threshold is None or old_threshold == instance.min_account_threshold:
+        return
+
+    transaction.on_commit(partial(
+        stop_copies_below_threshold,
+        instance.pk,
+        old_threshold,
+        instance.min_account_threshold,
+    ))
+
+
+def history_summary(user):
+    """
+    A user's copy trade figures overall and per trader, from one grouped
+    conditional aggregate over their history (the overall figures are the
+    sum of the per-trader rows).
+    """
+    closed = Q(status='closed')
+    rows = (
+        UserCopyTraderHistory.objects.filter(user=user)
+        .values('trader_id', 'trader__name', 'trader__username')
+        .annotate(
+            open_trades=Count('id', filter=Q(status='open')),
+            closed_trades=Count('id', filter=closed),
+            winning_trades=Count('id', filter=closed & Q(profit_loss__gt=0)),
+            open_amount=Sum('amount', filter=Q(status='open')),
+            total_profit_loss=Sum('profit_loss', filter=closed),
+        )
+        .order_by('trader_id')
+    )
+
+    by_trader = []
+    open_trades = closed_trades = 0
+    total_profit_loss = Decimal('0.00')
+    for row in rows:
+        profit_loss = (row['total_profit_loss'] or Decimal('0')).quantize(Decimal('0.01'))
+        open_trades += row['open_trades']
+        closed_trades += row['closed_trades']
+        total_profit_loss += profit_loss
+        by_trader.append({
+            "trader_id": row['trader_id'],
+            "trader_name": row['trader__name'],
+            "trader_username": row['trader__username'],
+            "open_trades": row['open_trades'],
+            "closed_trades": row['closed_trades'],
+            "winning_trades": row['winning_trades'],
+            "open_amount": str(row['open_amount'] or Decimal('0')),
+            "total_profit_loss": str(profit_loss),
+        })
+
+    return {
+        "open_trades": open_trades,
+        "closed_trades": closed_trades,
+        "total_profit_loss": str(total_profit_loss),
+        "by_trader": by_trader,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Live valuation of open copy trades
+# ---------------------------------------------------------------------------
+
+def _valuation_key(user_id):
+    return f"copytrade:valuation:{user_id}"
+
+
+def _valuation_payload(book, positions, valued_at):
+    prices = book.price[positions].tolist()
+    priced = book.priced[positions].tolist()
+    columns = zip(
+        book.ids[positions].tolist(),
+        prices,
+        book.pl[positions].tolist(),
+        book.pl_percent[positions].tolist(),
+        priced,
+    )
+    totals = book.totals(positions)
+    return {
+        "valued_at": valued_at,
+        "trades": [
+            {
+                "id": trade_id,
+                "current_price": price if is_priced else None,
+                "profit_loss": f"{profit_loss:.2f}",
+                "profit_loss_percent": f"{percent:.2f}",
+                "priced": is_priced,
+            }
+            for trade_id, price, profit_loss, percent, is_priced in columns
+        ],
+        "summary": {
+            "open_trades": totals['open_trades'],
+            "open_amount": f"{totals['open_amount']:.2f}",
+            "profit_loss": f"{totals['profit_loss']:.2f}",
+            "profit_loss_percent": f"{totals['profit_loss_percent']:.2f}",
+            "unpriced_trades": totals['unpriced_trades'],
+        },
+    }
+
+
+def valuation_cache_is_shared():
+    """False when the valuation cache lives in each process (LocMem) or nowhere (Dummy)"""
+    return not isinstance(caches[VALUATION_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def store_valuations(book):
+    """Cache the valuation of every user in a CopyTradeBook. Returns the user count."""
+    valued_at = timezone.now().isoformat()
+    payloads = {
+        _valuation_key(user_id): _valuation_payload(book, positions, valued_at)
+        for user_id, positions in book.by_user()
+    }
+    caches[VALUATION_CACHE_ALIAS].set_many(payloads, VALUATION_TTL)
+    return len(payloads)
+
+
+def live_valuation(user):
+    """
+    Unrealized P/L of the user's open copy trades against current Asset
+    quotes, per trade and in total. Served from the cache; a miss values
+    the user's open trades (two queries) and caches the result.
+    """
+    cache = caches[VALUATION_CACHE_ALIAS]
+    payload = cache.get(_valuation_key(user.pk))
+    if payload is None:
+        book, _ = valuation_service.revalue_open_copy_trades(user_ids=[user.pk])
+        payload = _valuation_payload(book, slice(None), timezone.now().isoformat())
+        cache.set(_valuation_key(user.pk), payload, VALUATION_TTL)
+    return payload
+
+
+def forget_valuation(user_id):
+    caches[VALUATION_CACHE_ALIAS].delete(_valuation_key(user_id))
+
+
+@receiver(post_save, sender=UserCopyTraderHistory)
+@receiver(post_delete, sender=UserCopyTraderHistory)
+def forget_valuation_on_change(sender, instance, **kwargs):
+    # Opened, closed or edited trade: the user's cached valuation is stale
+    transaction.on_commit(partial(forget_valuation, instance.user_id))
@@ -0,0 +1,453 @@
+"""
+Email templates for Citadel Markets Pro
+Layouts are compiled once per process; a render only fills in the per-recipient fields
+"""
+
+from html import escape
+import re
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+
+# ---------------------------------------------------------------------------
+# Compiler
+# ---------------------------------------------------------------------------
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class CompiledTemplate:
+    """
+    A template split into literal chunks and field names.
+
+    Placeholders are written {{ name }}, so CSS braces need no escaping.
+    Values passed as static at compile time (theme colours, FRONTEND_URL)
+    are folded into the literal chunks; only the remaining fields are
+    looked up, HTML-escaped and joined on each render.
+    """
+
+    __slots__ = ('literals', 'fields', '_head', '_pairs')
+
+    def __init__(self, source, static=None):
+        static = static or {}
+        literals, fields, chunk = [], [], []
+        pos = 0
+        for match in _PLACEHOLDER.finditer(source):
+            chunk.append(source[pos:match.start()])
+            name = match.group(1)
+            if name in static:
+                chunk.append(str(static[name]))
+            else:
+                literals.append(''.join(chunk))
+                fields.append(name)
+                chunk = []
+            pos = match.end()
+        chunk.append(source[pos:])
+        literals.append(''.join(chunk))
+
+        self.literals = tuple(literals)
+        self.fields = tuple(fields)
+        self._head = literals[0]
+        self._pairs = tuple(zip(fields, literals[1:]))
+
+    def render(self, context):
+        parts = [self._head]
+        for name, literal in self._pairs:
+            parts.append(escape(str(context[name])))
+            parts.append(literal)
+        return ''.join(parts)
+
+    def render_many(self, contexts):
+        """Render one document per context in a single call"""
+        head, pairs, esc = self._head, self._pairs, escape
+        documents = []
+        append = documents.append
+        for context in contexts:
+            parts = [head]
+            for name, literal in pairs:
+                parts.append(esc(str(context[name])))
+                parts.append(literal)
+            append(''.join(parts))
+        return documents
+
+
+# ---------------------------------------------------------------------------
+# Shared shell
+# ---------------------------------------------------------------------------
+
+THEMES = {
+    'green': {
+        'accent': '#10b981',
+        'accent_dark': '#059669',
+        'tint_light': '#f0fdf4',
+        'tint': '#dcfce7',
+    },
+    'blue': {
+        'accent': '#3b82f6',
+        'accent_dark': '#2563eb',
+        'tint_light': '#eff6ff',
+        'tint': '#dbeafe',
+    },
+}
+
+BASE_CSS = """
+            body {
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                line-height: 1.6;
+                color: #333;
+                margin: 0;
+                padding: 0;
+                background-color: #f4f4f4;
+            }
+            .container {
+                max-width: 600px;
+                margin: 0 auto;
+                background-color: #ffffff;
+                border-radius: 10px;
+                overflow: hidden;
+                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+            }
+            .header {
+                background: linear-gradient(135deg, {{ accent }} 0%, {{ accent_dark }} 100%);
+                color: white;
+                padding: 40px 20px;
+                text-align: center;
+            }
+            .header h1 {
+                margin: 0;
+                font-size: 28px;
+                font-weight: 700;
+            }
+            .content {
+                padding: 40px 30px;
+            }
+            .greeting {
+                font-size: 20px;
+                font-weight: 600;
+                color: {{ accent }};
+                margin-bottom: 20px;
+            }
+            .message {
+                font-size: 16px;
+                color: #555;
+                margin-bottom: 30px;
+            }
+            .footer {
+                background-color: #f8f9fa;
+                padding: 30px;
+                text-align: center;
+                font-size: 14px;
+                color: #666;
+            }
+            .footer a {
+                color: {{ accent }};
+                text-decoration: none;
+            }"""
+
+CODE_CSS = """
+            .content {
+                text-align: center;
+            }
+            .message {
+                text-align: left;
+            }
+            .code-box {
+                background: linear-gradient(135deg, {{ tint_light }} 0%, {{ tint }} 100%);
+                border: 3px dashed {{ accent }};
+                border-radius: 10px;
+                padding: 30px;
+                margin: 30px 0;
+            }
+            .code {
+                font-size: 48px;
+                font-weight: 700;
+                color: {{ accent }};
+                letter-spacing: 15px;
+                font-family: 'Courier New', monospace;
+            }
+            .code-label {
+                font-size: 14px;
+                color: #666;
+                margin-top: 10px;
+            }
+            .warning {
+                background-color: #fef3c7;
+                border-left: 4px solid #f59e0b;
+                padding: 15px;
+                margin: 20px 0;
+                text-align: left;
+            }
+            .warning-title {
+                font-weight: 600;
+                color: #f59e0b;
+                margin-bottom: 5px;
+            }
+            .expiry {
+                font-size: 14px;
+                color: #666;
+                margin: 20px 0;
+            }"""
+
+WELCOME_CSS = """
+            .features {
+                background-color: #f8fffe;
+                border-left: 4px solid {{ accent }};
+                padding: 20px;
+                margin: 30px 0;
+            }
+            .features h3 {
+                color: {{ accent }};
+                margin-top: 0;
+            }
+            .features ul {
+                margin: 10px 0;
+                padding-left: 20px;
+            }
+            .features li {
+                margin: 8px 0;
+                color: #555;
+            }
+            .cta-button {
+                display: inline-block;
+                background: linear-gradient(135deg, {{ accent }} 0%, {{ accent_dark }} 100%);
+                color: white;
+                padding: 15px 40px;
+                text-decoration: none;
+                border-radius: 5px;
+                font-weight: 600;
+                margin: 20px 0;
+            }
+            .divider {
+                height: 1px;
+                background-color: #e5e7eb;
+                margin: 30px 0;
+            }"""
+
+SHELL = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>{css}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{title}</h1>
+        </div>
+
+        <div class="content">
+{body}
+        </div>
+
+        <div class="footer">
+            <p><strong>Citadel Markets Pro</strong></p>
+            <p>Professional Trading & Investment Platform</p>{links}
+            <p style="margin-top: 20px; font-size: 12px; color: #999;">
+                {notice}
+            </p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+class EmailLayout:
+    """One kind of email: its subject, theme, extra CSS, body and footer"""
+
+    def __init__(self, subject, title, body, theme='green', css='', links=(), notice='This email was sent to {{ email }}'):
+        self.subject = subject
+        self.title = title
+        self.body = body
+        self.theme = theme
+        self.css = css
+        self.links = links
+        self.notice = notice
+
+    def source(self):
+        """The full document with every {{ placeholder }} still in place"""
+        links = ''
+        if self.links:
+            anchors = ' | \n                '.join(
+                f'<a href="{{{{ frontend_url }}}}{path}">{label}</a>' for path, label in self.links
+            )
+            links = f"\n            <p>\n                {anchors}\n            </p>"
+        return SHELL.format(
+            css=BASE_CSS + self.css,
+            title=self.title,
+            body=self.body,
+            links=links,
+            notice=self.notice,
+        )
+
+    def static_context(self):
+        return {**THEMES[self.theme], 'frontend_url': settings.FRONTEND_URL}
+
+    def compile(self):
+        return CompiledTemplate(self.source(), self.static_context())
+
+
+# ---------------------------------------------------------------------------
+# Layouts
+# ---------------------------------------------------------------------------
+
+LAYOUTS = {
+    'welcome': EmailLayout(
+        subject="Welcome to Citadel Markets Pro! 🎉",
+        title="Welcome to Citadel Markets Pro",
+        css=WELCOME_CSS,
+        links=(('/privacy-policy', 'Privacy Policy'), ('/terms-service', 'Terms of Service')),
+        notice="This email was sent to {{ email }}. If you didn't create this account, please ignore this email.",
+        body="""            <div class="greeting">
+                Hello {{ first_name }}! 👋
+            </div>
+
+            <div class="message">
+                <p>Welcome to <strong>Citadel Markets Pro</strong> - your gateway to professional trading and investment management!</p>
+
+                <p>We're thrilled to have you join our community of traders and investors. Your account has been created successfully, and you're now one step closer to achieving your financial goals.</p>
+            </div>
+
+            <div class="features">
+                <h3>🚀 What's Next?</h3>
+                <ul>
+                    <li><strong>Verify your email</strong> to activate your account</li>
+                    <li><strong>Complete KYC verification</strong> for full access</li>
+                    <li><strong>Explore trading options</strong> - stocks, crypto, forex & more</li>
+                    <li><strong>Copy professional traders</strong> and learn from the best</li>
+                    <li><strong>Access premium signals</strong> for informed decisions</li>
+                </ul>
+            </div>
+
+            <div class="divider"></div>
+
+            <div class="message">
+                <p><strong>Need help getting started?</strong></p>
+                <p>Our support team is available 24/7 to assist you. Feel free to reach out anytime!</p>
+            </div>""",
+    ),
+    'verification_code': EmailLayout(
+        subject="Your Citadel Markets Pro Verification Code",
+        title="🔐 Email Verification",
+        css=CODE_CSS,
+        body="""            <div class="greeting">
+                Hello {{ first_name }}!
+            </div>
+
+            <div class="message">
+                <p>Thank you for registering with Citadel Markets Pro. To complete your account setup, please verify your email address using the code below:</p>
+            </div>
+
+            <div class="code-box">
+                <div class="code">{{ code }}</div>
+                <div class="code-label">Your Verification Code</div>
+            </div>
+
+            <div class="expiry">
+                ⏰ This code will expire in <strong>10 minutes</strong>
+            </div>
+
+            <div class="warning">
+                <div class="warning-title">⚠️ Security Notice</div>
+                <p style="margin: 5px 0; font-size: 14px;">Never share this code with anyone. Citadel Markets Pro staff will never ask for your verification code.</p>
+            </div>
+
+            <div class="message">
+                <p>If you didn't request this code, please ignore this email or contact our support team immediately.</p>
+            </div>""",
+    ),
+    'two_factor_code': EmailLayout(
+        subject="Your Citadel Markets Pro Login Code",
+        title="🔒 Two-Factor Authentication",
+        theme='blue',
+        css=CODE_CSS,
+        links=(('/settings', 'Account Settings'), ('/support', 'Contact Support')),
+        body="""            <div class="greeting">
+                Hello {{ first_name }}!
+            </div>
+
+            <div class="message">
+                <p>A login attempt was detected on your Citadel Markets Pro account. To complete your login, please use the verification code below:</p>
+            </div>
+
+            <div class="code-box">
+                <div class="code">{{ code }}</div>
+                <div class="code-label">Your 2FA Code</div>
+            </div>
+
+            <div class="expiry">
+                ⏰ This code will expire in <strong>10 minutes</strong>
+            </div>
+
+            <div class="warning">
+                <div class="warning-title">⚠️ Security Alert</div>
+                <p style="margin: 5px 0; font-size: 14px;">If you didn't attempt to log in, your account may be compromised. Please change your password immediately and contact our support team.</p>
+            </div>
+
+            <div class="message">
+                <p><strong>Login Details:</strong></p>
+                <p style="font-size: 14px; color: #666;">
+                    Time: {{ login_time }}<br>
+                    Email: {{ email }}
+                </p>
+            </div>""",
+    ),
+    'announcement': EmailLayout(
+        subject="News from Citadel Markets Pro",
+        title="📢 {{ title }}",
+        links=(('/settings', 'Account Settings'), ('/support', 'Contact Support')),
+        body="""            <div class="greeting">
+                Hello {{ first_name }}!
+            </div>
+
+            <div class="message" style="white-space: pre-line;">{{ message }}</div>""",
+    ),
+}
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def get_template(name):
+    """The compiled template for a layout, compiled on first use in this process"""
+    template = _compiled.get(name)
+    if template is None:
+        with _lock:
+            template = _compiled.get(name)
+            if template is None:
+                template = _compiled[name] = LAYOUTS[name].compile()
+    return template
+
+
+def clear_cache():
+    """Forget compiled templates (after changing LAYOUTS or FRONTEND_URL)"""
+    with _lock:
+        _compiled.clear()
+
+
+def user_context(user, **extra):
+    return {
+        'first_name': user.first_name or 'Trader',
+        'email': user.email,
+        'login_time': timezone.now().strftime('%B %d, %Y at %I:%M %p UTC'),
+        **extra,
+    }
+
+
+def render(name, context):
+    """Returns (subject, html) for one recipient"""
+    return LAYOUTS[name].subject, get_template(name).render(context)
+
+
+def render_many(name, contexts):
+    """Returns (subject, [html, ...]) with one document per context"""
+    return LAYOUTS[name].subject, get_template(name).render_many(contexts)
@@ -0,0 +1,192 @@
+"""
+Leaderboard service for Citadel Markets Pro
+Keeps the active traders serialized and pre-ranked in memory so trader list pages are served without the DB
+"""
+
+from dataclasses import dataclass
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import pagination
+from .models import Trader
+from .serializers import TraderListSerializer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Ranking name -> metrics, highest first; ties go to the newest trader (highest id)
+RANKINGS = {
+    'gain': ('gain', 'copiers'),
+    'copiers': ('copiers', 'gain'),
+    'return_ytd': ('return_ytd', 'gain'),
+    'win_rate': ('win_rate', 'gain'),
+    'score': ('score', 'gain'),
+}
+DEFAULT_RANKING = 'gain'
+
+# A board is rebuilt at most this often (seconds) even without a Trader
+# write, which bounds how stale other workers can be when no shared cache
+# is configured. Set LEADERBOARD_CACHE_ALIAS to a CACHES alias (e.g. a
+# shared Redis cache) to publish invalidations to every worker at once.
+TTL = getattr(settings, 'LEADERBOARD_TTL', 60)
+CACHE_ALIAS = getattr(settings, 'LEADERBOARD_CACHE_ALIAS', None)
+
+_GENERATION_KEY = 'leaderboard:generation'
+
+# Decodes ranking metrics back from page cursors
+CURSOR_FIELD = models.FloatField()
+
+
+def win_rate(trader):
+    """From the copy trade history (TraderStats) when it has any, else the admin-entered counts"""
+    stats = getattr(trader, 'stats', None)
+    if stats is not None and stats.closed_trades:
+        return stats.win_rate
+    return trader.win_rate
+
+
+def score(trader):
+    """Risk-adjusted score: gain per point of the trader's 1-10 risk score"""
+    return float(trader.gain) / max(trader.risk, 1)
+
+
+@dataclass
+class Board:
+    rows: list          # serialized traders, in id order
+    metrics: list       # ranking metrics per row, as floats
+    search: list        # lower-cased "name username" per row
+    orders: dict        # ranking -> (row positions in rank order, their sort keys)
+    generation: int
+    expires: float
+
+
+def _build(generation):
+    traders = list(Trader.objects.filter(is_active=True).select_related('stats').order_by('id'))
+    rows = TraderListSerializer(traders, many=True).data
+
+    metrics = []
+    for trader, row in zip(traders, rows):
+        # Only complete Cloudinary URLs go out
+        for field in ('avatar', 'country_flag'):
+            if row.get(field) and not row[field].startswith('http'):
+                row[field] = None
+        values = {
+            'gain': float(trader.gain),
+            'copiers': float(trader.copiers),
+            'return_ytd': float(trader.return_ytd),
+            'win_rate': round(win_rate(trader), 2),
+            'score': round(score(trader), 4),
+            'risk': trader.risk,
+        }
+        row['return_ytd'] = str(trader.return_ytd)
+        row['win_rate'] = values['win_rate']
+        row['score'] = values['score']
+        metrics.append(values)
+
+    orders = {}
+    for ranking, names in RANKINGS.items():
+        keys = [
+            tuple(-values[name] for name in names) + (-trader.pk,)
+            for trader, values in zip(traders, metrics)
+        ]
+        positions = sorted(range(len(traders)), key=keys.__getitem__)
+        orders[ranking] = (positions, [keys[position] for position in positions])
+
+    return Board(
+        rows=list(rows),
+        metrics=metrics,
+        search=[f"{trader.name} {trader.username}".lower() for trader in traders],
+        orders=orders,
+        generation=generation,
+        expires=time.monotonic() + TTL,
+    )
+
+
+_board = None
+_lock = threading.Lock()
+
+
+def _generation():
+    if CACHE_ALIAS is None:
+        return 0
+    return caches[CACHE_ALIAS].get(_GENERATION_KEY, 0)
+
+
+def board():
+    """The current Board, rebuilt (one query) when invalidated or expired"""
+    global _board
+    generation = _generation()
+    current = _board
+    if current is not None and current.generation == generation and current.expires > time.monotonic():
+        return current
+
+    with _lock:
+        # Another thread may have rebuilt it while this one waited
+        current = _board
+        if current is None or current.generation != generation or current.expires <= time.monotonic():
+            started = time.perf_counter()
+            current = _board = _build(generation)
+            logger.info(
+                f"Leaderboard rebuilt: {len(current.rows)} traders in "
+                f"{(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+    return current
+
+
+def invalidate():
+    global _board
+    _board = None
+    if CACHE_ALIAS is not None:
+        cache = caches[CACHE_ALIAS]
+        cache.add(_GENERATION_KEY, 0, None)
+        try:
+            cache.incr(_GENERATION_KEY)
+        except ValueError:
+            cache.set(_GENERATION_KEY, 1, None)
+
+
+@receiver(post_save, sender=Trader)
+@receiver(post_delete, sender=Trader)
+def invalidate_on_trader_change(sender, **kwargs):
+    # After commit, so a rebuild cannot pick up the pre-write rows again
+    transaction.on_commit(invalidate)
+
+
+def page(request, ranking=DEFAULT_RANKING, search=None, badge=None, min_gain=None, max_risk=None, country=None):
+    """
+    One keyset page of active traders in ranking order, filtered in memory.
+    No query unless the board has to be rebuilt.
+    """
+    current = board()
+    positions, keys = current.orders[ranking]
+
+    checks = []
+    if search:
+        search = search.lower()
+        checks.append(lambda position: search in current.search[position])
+    if badge:
+        checks.append(lambda position: current.rows[position]['badge'] == badge)
+    if min_gain is not None:
+        checks.append(lambda position: current.metrics[position]['gain'] >= min_gain)
+    if max_risk is not None:
+        checks.append(lambda position: current.metrics[position]['risk'] <= max_risk)
+    if country:
+        country = country.lower()
+        checks.append(lambda position: current.rows[position]['country'].lower() == country)
+
+    result = pagination.paginate_sorted(
+        request,
+        positions,
+        keys,
+        [CURSOR_FIELD] * (len(RANKINGS[ranking]) + 1),
+        match=(lambda position: all(check(position) for check in checks)) if checks else None,
+    )
+    result.items = [current.rows[position] for position in result.items]
+    return result
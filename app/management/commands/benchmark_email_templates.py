@@ -0,0 +1,93 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import email_templates
+
+
+def _format_string(source):
+    """
+    A layout as one str.format string: the shape of the f-string renderers
+    the compiled templates replaced, which interpolated the whole document
+    (CSS included) on every send.
+    """
+    parts = email_templates._PLACEHOLDER.split(source)
+    return ''.join(
+        part.replace('{', '{{').replace('}', '}}') if i % 2 == 0 else '{' + part + '}'
+        for i, part in enumerate(parts)
+    )
+
+
+class Command(BaseCommand):
+    help = "Measure email renders/sec: the old f-string style renderers vs the compiled, cached templates"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--layout",
+            action="append",
+            choices=sorted(email_templates.LAYOUTS),
+            help="Layouts to measure (repeatable, default: all)",
+        )
+        parser.add_argument(
+            "--renders",
+            type=int,
+            default=20000,
+            help="Documents rendered per measurement",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Recipients per render_many call",
+        )
+
+    def handle(self, *args, **options):
+        renders = options["renders"]
+        batch_size = options["batch_size"]
+        if renders <= 0 or batch_size <= 0:
+            raise CommandError("--renders and --batch-size must be positive")
+
+        users = [
+            SimpleNamespace(first_name=f"Trader{i}", email=f"trader{i}@example.com")
+            for i in range(renders)
+        ]
+        contexts = [
+            email_templates.user_context(
+                user,
+                code=f"{i % 10000:04d}",
+                title="Scheduled maintenance",
+                message="Trading will pause for 10 minutes at 02:00 UTC.",
+            )
+            for i, user in enumerate(users)
+        ]
+
+        for name in options["layout"] or sorted(email_templates.LAYOUTS):
+            layout = email_templates.LAYOUTS[name]
+            email_templates.clear_cache()
+
+            batches = [contexts[i:i + batch_size] for i in range(0, renders, batch_size)]
+
+            # Before: one f-string per email, interpolating the full document
+            # and reading the theme and settings on every send
+            legacy = _format_string(layout.source())
+            started = time.perf_counter()
+            for batch in batches:
+                [legacy.format(**layout.static_context(), **context) for context in batch]
+            uncached = renders / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for batch in batches:
+                [email_templates.render(name, context) for context in batch]
+            cached = renders / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for batch in batches:
+                email_templates.render_many(name, batch)
+            batched = renders / (time.perf_counter() - started)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {uncached:,.0f} renders/sec f-string, "
+                f"{cached:,.0f} compiled ({cached / uncached:.1f}x), "
+                f"{batched:,.0f} batched ({batched / uncached:.1f}x)"
+            ))
@@ -0,0 +1,122 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import broadcast_service
+from app.models import Broadcast, Notification, Stock, Trader
+
+
+class Command(BaseCommand):
+    help = "Send one notification (and optionally an email) to every user in a segment"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--segment",
+            choices=sorted(broadcast_service.SEGMENTS),
+            default="all",
+        )
+        parser.add_argument("--trader-id", type=int, help="Trader for the trader_copiers segment")
+        parser.add_argument("--symbol", help="Stock for the stock_holders segment")
+        parser.add_argument("--title")
+        parser.add_argument("--message")
+        parser.add_argument("--details", default="", help="Full details (defaults to the message)")
+        parser.add_argument(
+            "--type",
+            choices=[choice for choice, _ in Notification.TYPE_CHOICES],
+            default="system",
+        )
+        parser.add_argument(
+            "--email",
+            action="store_true",
+            help="Also queue an announcement email to each recipient",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=broadcast_service.CHUNK_SIZE,
+        )
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help="Deliver the broadcasts queued from the dashboard instead of sending a new one",
+        )
+        parser.add_argument(
+            "--resume",
+            type=int,
+            metavar="BROADCAST_ID",
+            help="Continue a failed or interrupted broadcast after the last user it reached",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the recipients",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive")
+
+        if options["pending"]:
+            for record in broadcast_service.deliver_pending(chunk_size=options["chunk_size"]):
+                self._report(record)
+            return
+
+        if options["resume"] is not None:
+            record = Broadcast.objects.filter(pk=options["resume"]).first()
+            if record is None:
+                raise CommandError(f"No broadcast with id {options['resume']}")
+            if record.status == 'completed':
+                raise CommandError(f"Broadcast {record.id} is already completed")
+            try:
+                record = broadcast_service.deliver(record, chunk_size=options["chunk_size"])
+            except broadcast_service.BroadcastError as e:
+                raise CommandError(str(e))
+            self._report(record)
+            return
+
+        if not options["title"] or not options["message"]:
+            raise CommandError("--title and --message are required")
+
+        trader = stock = None
+        if options["trader_id"] is not None:
+            trader = Trader.objects.filter(pk=options["trader_id"]).first()
+            if trader is None:
+                raise CommandError(f"No trader with id {options['trader_id']}")
+        if options["symbol"]:
+            stock = Stock.objects.filter(symbol=options["symbol"].upper()).first()
+            if stock is None:
+                raise CommandError(f"No stock with symbol {options['symbol']}")
+
+        try:
+            users = broadcast_service.segment_users(options["segment"], trader=trader, stock=stock)
+        except broadcast_service.BroadcastError as e:
+            raise CommandError(str(e))
+
+        if options["dry_run"]:
+            self.stdout.write(f"{users.count()} recipients in segment {options['segment']}")
+            return
+
+        def progress(result):
+            self.stdout.write(
+                f"  {result.recipients} notifications, {result.emails} emails "
+                f"({result.per_second:,.0f}/sec)"
+            )
+
+        result = broadcast_service.broadcast(
+            users,
+            title=options["title"],
+            message=options["message"],
+            full_details=options["details"],
+            type=options["type"],
+            send_email=options["email"],
+            segment=options["segment"],
+            trader=trader,
+            stock=stock,
+            chunk_size=options["chunk_size"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        self._report(result)
+
+    def _report(self, result):
+        self.stdout.write(self.style.SUCCESS(
+            f"Broadcast {result.id}: {result.recipients} notifications, {result.emails} emails queued "
+            f"in {result.seconds:.2f}s ({result.per_second:,.0f} notifications/sec)"
+        ))
@@ -0,0 +1,73 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import account_summary_service, market_data_service, valuation_service
+
+
+class Command(BaseCommand):
+    help = "Stream Stock or Asset quotes from CSV/NDJSON files (or stdin) into the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files",
+            nargs="*",
+            default=["-"],
+            help="Quote files to read; '-' or nothing reads stdin",
+        )
+        parser.add_argument(
+            "--kind",
+            choices=["stocks", "assets"],
+            default="stocks",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            help="Input format (detected from the first line when omitted)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=market_data_service.DEFAULT_CHUNK_SIZE,
+        )
+        parser.add_argument(
+            "--revalue",
+            action="store_true",
+            help="Mark all open positions to market after the refresh",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive")
+
+        for path in options["files"]:
+            if path == "-":
+                report = self._ingest(sys.stdin, options)
+            else:
+                try:
+                    with open(path, newline="", encoding="utf-8") as f:
+                        report = self._ingest(f, options)
+                except OSError as e:
+                    raise CommandError(f"Cannot read {path}: {e}")
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: {report.rows} rows, {report.updated} updated, "
+                f"{report.skipped} skipped in {report.seconds:.2f}s "
+                f"({report.rows_per_sec:,.0f} rows/sec)"
+            ))
+
+        if options["revalue"] and options["kind"] == "stocks":
+            book, per_user, seconds = valuation_service.revalue_open_positions()
+            account_summary_service.store_position_values(book)
+            self.stdout.write(self.style.SUCCESS(
+                f"Revalued {len(book)} open positions for {len(per_user[0])} users "
+                f"in {seconds * 1000:.0f} ms"
+            ))
+
+    def _ingest(self, lines, options):
+        return market_data_service.ingest(
+            lines,
+            kind=options["kind"],
+            fmt=options["format"],
+            chunk_size=options["chunk_size"],
+        )
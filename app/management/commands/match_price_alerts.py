@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from app import alert_service
+from app.models import Stock
+
+
+class Command(BaseCommand):
+    help = "Rebuild the alert and stop-loss/take-profit books and match them against current stock prices"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--symbol",
+            action="append",
+            help="Only match these symbols (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        armed_alerts, armed_positions = alert_service.rebuild_books()
+
+        stocks = Stock.objects.filter(is_active=True)
+        if options["symbol"]:
+            stocks = stocks.filter(symbol__in=[s.upper() for s in options["symbol"]])
+
+        prices = dict(stocks.values_list("symbol", "price"))
+        alerts, positions = alert_service.match_prices(prices)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{armed_alerts} active alerts, {armed_positions} armed positions; "
+            f"{len(alerts)} alerts triggered, {len(positions)} positions exited"
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from app import order_service
+from app.models import Stock
+
+
+class Command(BaseCommand):
+    help = "Rebuild the order book from open orders and match it against current stock prices"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--symbol",
+            action="append",
+            help="Only match these symbols (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        resting = order_service.rebuild_book()
+
+        stocks = Stock.objects.filter(is_active=True)
+        if options["symbol"]:
+            stocks = stocks.filter(symbol__in=[s.upper() for s in options["symbol"]])
+
+        prices = dict(stocks.values_list("symbol", "price"))
+        orders = order_service.match_prices(prices)
+        filled = sum(1 for order in orders if order.status == "filled")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resting} resting orders, {filled} filled, {len(orders) - filled} rejected"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import sync_service
+
+
+class Command(BaseCommand):
+    help = "Delete delta-sync deletion markers older than the retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=sync_service.TOMBSTONE_DAYS,
+            help="Keep markers newer than this many days",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1")
+
+        deleted = sync_service.prune(days=options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} sync deletion markers"))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import retention_service
+from app.models import Notification
+
+
+class Command(BaseCommand):
+    help = "Delete read notifications past their per-type retention, optionally archiving them first"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            action="append",
+            dest="types",
+            choices=[value for value, _ in Notification.TYPE_CHOICES],
+            help="Only purge this notification type (repeatable)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=retention_service.CHUNK_SIZE,
+            help="Rows deleted per transaction",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between chunks",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            help="Write purged rows to a gzipped NDJSON file in this directory first",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        started = time.perf_counter()
+        report, archive_path = retention_service.purge(
+            types=options["types"],
+            chunk_size=options["chunk_size"],
+            archive_dir=options["archive_dir"],
+            pause=options["pause"],
+            dry_run=options["dry_run"],
+        )
+
+        days = retention_service.retention_days()
+        verb = "due" if options["dry_run"] else "deleted"
+        for type, row in report.items():
+            self.stdout.write(
+                f"{type} (>{days[type]}d): {row['deleted']} {verb} "
+                f"in {row['seconds']:.2f}s ({row['per_second']:,.0f} rows/sec)"
+            )
+        if archive_path:
+            self.stdout.write(f"Archived to {archive_path}")
+
+        total = sum(row["deleted"] for row in report.values())
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} notifications {verb} in {elapsed:.2f}s ({rate:,.0f} rows/sec)"
+        ))
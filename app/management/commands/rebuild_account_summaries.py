@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import account_summary_service
+
+
+class Command(BaseCommand):
+    help = "Rebuild AccountSummary rows from transactions, portfolios and positions, or verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare stored summaries with the source tables",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Limit to these user ids (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"]
+
+        if options["verify"]:
+            mismatches = account_summary_service.verify(user_ids)
+            for user_id, field, stored, expected in mismatches[:50]:
+                if field is None:
+                    self.stdout.write(f"user {user_id}: summary missing")
+                else:
+                    self.stdout.write(f"user {user_id}: {field} is {stored}, expected {expected}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} mismatches found")
+            self.stdout.write(self.style.SUCCESS("All account summaries match"))
+            return
+
+        written = account_summary_service.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} account summaries"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import notification_service
+
+
+class Command(BaseCommand):
+    help = "Recount unread notifications into NotificationCounter rows, or verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare stored counters with the Notification table",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Limit to these user ids (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"]
+
+        if options["verify"]:
+            mismatches = notification_service.verify(user_ids)
+            for user_id, stored, expected in mismatches[:50]:
+                if stored is None:
+                    self.stdout.write(f"user {user_id}: counter missing")
+                else:
+                    self.stdout.write(f"user {user_id}: unread is {stored}, expected {expected}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} mismatches found")
+            self.stdout.write(self.style.SUCCESS("All notification counters match"))
+            return
+
+        written = notification_service.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} notification counters"))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import referral_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute each user's first completed deposit for the referral stats, or verify them; "
+        "--tree rebuilds the referral tree instead"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare stored first deposits with the Transaction table",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Limit to these user ids (repeatable)",
+        )
+        parser.add_argument(
+            "--tree",
+            action="store_true",
+            help="Rebuild the referral tree (ReferralClosure) from referred_by",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"]
+
+        if options["tree"]:
+            if options["verify"] or user_ids:
+                raise CommandError("--tree always rebuilds the whole tree")
+            written = referral_service.rebuild_tree()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} referral paths"))
+            return
+
+        if options["verify"]:
+            mismatches = referral_service.verify(user_ids)
+            for user_id, stored, expected in mismatches[:50]:
+                if stored is None:
+                    self.stdout.write(f"user {user_id}: first deposit missing")
+                else:
+                    self.stdout.write(f"user {user_id}: stored {stored}, expected {expected}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} mismatches found")
+            self.stdout.write(self.style.SUCCESS("All first deposits match"))
+            return
+
+        written = referral_service.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} first deposits"))
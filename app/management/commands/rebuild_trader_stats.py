@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import trader_stats_service
+
+
+class Command(BaseCommand):
+    help = "Rebuild TraderStats and monthly buckets from the copy trade history, or verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare stored stats with the copy trade history",
+        )
+        parser.add_argument(
+            "--trader",
+            type=int,
+            action="append",
+            dest="trader_ids",
+            help="Limit to these trader ids (repeatable)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=trader_stats_service.REBUILD_CHUNK_SIZE,
+            help="History rows read per query",
+        )
+
+    def handle(self, *args, **options):
+        trader_ids = options["trader_ids"]
+        trader_stats_service.REBUILD_CHUNK_SIZE = options["chunk_size"]
+
+        if options["verify"]:
+            mismatches = trader_stats_service.verify(trader_ids)
+            for trader_id, month, field, stored, expected in mismatches[:50]:
+                where = f"trader {trader_id}" + (f" {month:%Y-%m}" if month else "")
+                if field is None:
+                    self.stdout.write(f"{where}: stats missing")
+                else:
+                    self.stdout.write(f"{where}: {field} is {stored}, expected {expected}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} mismatches found")
+            self.stdout.write(self.style.SUCCESS("All trader stats match"))
+            return
+
+        written = trader_stats_service.rebuild(trader_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {written} traders"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import copy_trading_service, valuation_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark every open copy trade to current asset quotes and cache each user's live valuation. "
+        "Needs COPY_TRADE_VALUATION_CACHE_ALIAS to name a cache shared with the web workers."
+    )
+
+    def handle(self, *args, **options):
+        if not copy_trading_service.valuation_cache_is_shared():
+            raise CommandError(
+                f"The '{copy_trading_service.VALUATION_CACHE_ALIAS}' cache is local to this process, "
+                f"so web workers would never see the valuations. Set COPY_TRADE_VALUATION_CACHE_ALIAS "
+                f"to a shared cache (e.g. Redis); until then workers value users on demand."
+            )
+
+        book, seconds = valuation_service.revalue_open_copy_trades()
+        totals = book.totals()
+
+        self.stdout.write(
+            f"{len(book)} open copy trades: "
+            f"amount ${totals['open_amount']:,.2f}, "
+            f"P/L ${totals['profit_loss']:,.2f} "
+            f"({totals['profit_loss_percent']:.2f}%), "
+            f"{totals['unpriced_trades']} without a quote"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Revalued in {seconds * 1000:.0f} ms"))
+
+        users = copy_trading_service.store_valuations(book)
+        self.stdout.write(f"Cached live valuations for {users} users")
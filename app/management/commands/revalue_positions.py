@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from app import account_summary_service, valuation_service
+
+
+class Command(BaseCommand):
+    help = "Mark every open stock position to market and print the aggregate result"
+
+    def handle(self, *args, **options):
+        book, per_user, seconds = valuation_service.revalue_open_positions()
+        totals = book.totals()
+
+        self.stdout.write(
+            f"{len(book)} positions across {len(per_user[0])} users: "
+            f"invested ${totals['total_invested']:,.2f}, "
+            f"value ${totals['total_current_value']:,.2f}, "
+            f"P/L ${totals['total_profit_loss']:,.2f} "
+            f"({totals['total_profit_loss_percent']:.2f}%)"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Revalued in {seconds * 1000:.0f} ms"))
+
+        account_summary_service.store_position_values(book)
+        self.stdout.write(f"Stored open position values for {len(per_user[0])} account summaries")
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import price_history_service
+
+
+class Command(BaseCommand):
+    help = "Roll price ticks into 1m/5m/1h/1d candles and compact history past its retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-compact",
+            action="store_true",
+            help="Only roll up, keep ticks and candles past retention",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        written = price_history_service.rollup()
+        summary = ", ".join(f"{interval}: {count}" for interval, count in written.items())
+        self.stdout.write(f"Candles written - {summary}")
+
+        if not options["no_compact"]:
+            deleted = price_history_service.compact()
+            summary = ", ".join(f"{level}: {count}" for level, count in deleted.items())
+            self.stdout.write(f"Rows compacted - {summary or 'none'}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.2f}s"))
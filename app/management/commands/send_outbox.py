@@ -0,0 +1,111 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import broadcast_service, outbox_service
+
+
+class Command(BaseCommand):
+    help = "Deliver queued broadcasts, then queued emails from the outbox over a pool of SMTP connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send everything that is due, then exit",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when the outbox is empty",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=outbox_service.BATCH_SIZE,
+        )
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            default=outbox_service.POOL_SIZE,
+            help="Number of SMTP connections kept open",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=outbox_service.MAX_ATTEMPTS,
+            help="Attempts before a message is moved to the dead state",
+        )
+        parser.add_argument("--smtp-host", help="Override EMAIL_HOST (e.g. a local SMTP stand-in)")
+        parser.add_argument("--smtp-port", type=int, help="Override EMAIL_PORT")
+        parser.add_argument(
+            "--smtp-security",
+            choices=["ssl", "starttls", "none"],
+            help="Override EMAIL_USE_SSL/EMAIL_USE_TLS",
+        )
+        parser.add_argument(
+            "--purge-interval",
+            type=float,
+            default=3600,
+            help="Seconds between purges of sent/dead emails past EMAIL_OUTBOX_RETENTION_DAYS (0 disables)",
+        )
+        parser.add_argument(
+            "--requeue-dead",
+            action="store_true",
+            help="Give dead messages a fresh set of attempts before sending",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("batch_size", "pool_size", "max_attempts"):
+            if options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive")
+
+        if options["requeue_dead"]:
+            requeued = outbox_service.requeue_dead()
+            self.stdout.write(f"Requeued {requeued} dead messages")
+
+        config = outbox_service.SMTPSettings.from_settings(
+            host=options["smtp_host"],
+            port=options["smtp_port"],
+            security=options["smtp_security"],
+        )
+        pool = outbox_service.SMTPPool(config, size=options["pool_size"])
+
+        purged_at = None
+        try:
+            while True:
+                if options["purge_interval"] > 0 and (
+                    purged_at is None or time.monotonic() - purged_at >= options["purge_interval"]
+                ):
+                    purged = outbox_service.purge()
+                    purged_at = time.monotonic()
+                    if purged:
+                        self.stdout.write(f"Purged {purged} sent/dead emails")
+
+                # Broadcasts queued from the dashboard fan out here, then
+                # their emails go out with the rest of the outbox
+                for record in broadcast_service.deliver_pending():
+                    self.stdout.write(
+                        f"Broadcast {record.id}: {record.recipients} notifications, "
+                        f"{record.emails} emails queued"
+                    )
+
+                started = time.monotonic()
+                sent, retried, dead = outbox_service.drain(
+                    pool,
+                    batch_size=options["batch_size"],
+                    max_attempts=options["max_attempts"],
+                )
+                if sent or retried or dead or options["once"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{sent} sent, {retried} retried, {dead} dead "
+                        f"in {time.monotonic() - started:.2f}s"
+                    ))
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close()
@@ -0,0 +1,268 @@
+"""
+Market data service for Citadel Markets Pro
+Streams quote batches (CSV or NDJSON) into Stock and Asset with chunked bulk updates
+"""
+
+import csv
+import json
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from . import alert_service, order_service, price_history_service, stream_service
+from .models import Asset, Stock
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+STOCK_FIELDS = ['price', 'change', 'change_percent', 'volume', 'market_cap', 'updated_at']
+ASSET_FIELDS = ['bid', 'ask', 'low', 'high', 'change', 'time']
+
+
+@dataclass
+class IngestReport:
+    rows: int = 0
+    updated: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+        }
+
+
+def iter_records(lines, fmt=None):
+    """
+    Yield quote dicts from an iterable of text lines.
+
+    fmt is "csv" or "ndjson"; when omitted it is detected from the first
+    non-blank line (NDJSON lines start with "{"). Nothing is read ahead
+    beyond that first line, so stdin and request bodies stream.
+    """
+    lines = iter(lines)
+    first = ""
+    for first in lines:
+        if first.strip():
+            break
+    else:
+        return
+
+    if fmt is None:
+        fmt = "ndjson" if first.lstrip().startswith("{") else "csv"
+
+    def all_lines():
+        yield first
+        yield from lines
+
+    if fmt == "ndjson":
+        for line in all_lines():
+            if line.strip():
+                yield json.loads(line)
+    else:
+        for row in csv.DictReader(all_lines()):
+            yield row
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _column(chunk, key, default=np.nan):
+    """Pull one optional numeric column out of a chunk as a float64 array"""
+    values = []
+    for record in chunk:
+        value = record.get(key)
+        values.append(default if value in (None, "") else float(value))
+    return np.asarray(values, dtype=np.float64)
+
+
+def _to_decimal(value, places):
+    return Decimal(f"{value:.{places}f}")
+
+
+def _after_stock_prices(stocks):
+    """Hand a batch of updated active stocks to the components that react to quotes"""
+    prices = {stock.symbol: stock.price for stock in stocks}
+    order_service.match_prices(prices)
+    alert_service.match_prices(prices)
+    stream_service.publish_stocks(stocks)
+
+
+def _after_asset_prices(assets):
+    stream_service.publish_assets(assets)
+
+
+def ingest_stock_quotes(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Apply stock quotes: symbol, price and optionally prev_close, volume, market_cap.
+
+    change/change_percent are measured against prev_close when the feed sends
+    it, otherwise against the reference already implied by the stored row
+    (price - change), so intraday ticks keep accumulating against the same close.
+    """
+    report = IngestReport()
+    started = time.perf_counter()
+
+    for chunk in _chunks(records, chunk_size):
+        report.rows += len(chunk)
+
+        # Last quote per symbol wins within a chunk
+        latest = {}
+        for record in chunk:
+            symbol = (record.get("symbol") or "").strip().upper()
+            if symbol:
+                latest[symbol] = record
+
+        stocks = {s.symbol: s for s in Stock.objects.filter(symbol__in=latest)}
+        report.skipped += len(chunk) - len(stocks)
+        if not stocks:
+            continue
+
+        symbols = list(stocks)
+        rows = [latest[symbol] for symbol in symbols]
+
+        price = _column(rows, "price")
+        prev_close = _column(rows, "prev_close")
+        old_price = np.array([float(stocks[s].price) for s in symbols])
+        old_change = np.array([float(stocks[s].change) for s in symbols])
+
+        price = np.where(np.isnan(price), old_price, price)
+        reference = np.where(np.isnan(prev_close), old_price - old_change, prev_close)
+        change = price - reference
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_percent = np.where(reference != 0, change / reference * 100, 0.0)
+
+        volume = _column(rows, "volume")
+        market_cap = _column(rows, "market_cap")
+        now = timezone.now()
+
+        ticks = []
+        for i, symbol in enumerate(symbols):
+            stock = stocks[symbol]
+            stock.price = _to_decimal(price[i], 2)
+            stock.change = _to_decimal(change[i], 2)
+            stock.change_percent = _to_decimal(change_percent[i], 2)
+            traded = 0
+            if not np.isnan(volume[i]):
+                # Feed volume is the session total; the tick keeps the increment
+                traded = max(0, int(volume[i]) - stock.volume)
+                stock.volume = int(volume[i])
+            if not np.isnan(market_cap[i]):
+                stock.market_cap = int(market_cap[i])
+            stock.updated_at = now
+            ticks.append((stock.pk, stock.price, traded))
+
+        with transaction.atomic():
+            Stock.objects.bulk_update(stocks.values(), STOCK_FIELDS, batch_size=chunk_size)
+            price_history_service.record_ticks(ticks, recorded_at=now)
+        report.updated += len(stocks)
+
+        _after_stock_prices([stock for stock in stocks.values() if stock.is_active])
+
+    report.seconds = time.perf_counter() - started
+    logger.info(f"Stock quotes ingested: {report.as_dict()}")
+    return report
+
+
+def ingest_asset_quotes(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Apply asset quotes: symbol, bid, ask and optionally low, high, prev_close.
+
+    change is the % move of the mid price against prev_close, or against the
+    reference implied by the stored mid and change. low/high extend the stored
+    range with the new bid when the feed does not send them.
+    """
+    report = IngestReport()
+    started = time.perf_counter()
+
+    for chunk in _chunks(records, chunk_size):
+        report.rows += len(chunk)
+
+        latest = {}
+        for record in chunk:
+            symbol = (record.get("symbol") or "").strip().upper()
+            if symbol:
+                latest[symbol] = record
+
+        assets = {a.symbol: a for a in Asset.objects.filter(symbol__in=latest)}
+        report.skipped += len(chunk) - len(assets)
+        if not assets:
+            continue
+
+        symbols = list(assets)
+        rows = [latest[symbol] for symbol in symbols]
+
+        old_bid = np.array([float(assets[s].bid) for s in symbols])
+        old_ask = np.array([float(assets[s].ask) for s in symbols])
+        old_low = np.array([float(assets[s].low) for s in symbols])
+        old_high = np.array([float(assets[s].high) for s in symbols])
+        old_change = np.array([assets[s].change for s in symbols], dtype=np.float64)
+
+        bid = _column(rows, "bid")
+        ask = _column(rows, "ask")
+        bid = np.where(np.isnan(bid), old_bid, bid)
+        ask = np.where(np.isnan(ask), old_ask, ask)
+
+        low = _column(rows, "low")
+        high = _column(rows, "high")
+        low = np.where(np.isnan(low), np.minimum(old_low, bid), low)
+        high = np.where(np.isnan(high), np.maximum(old_high, bid), high)
+
+        mid = (bid + ask) / 2
+        old_mid = (old_bid + old_ask) / 2
+        prev_close = _column(rows, "prev_close")
+        reference = np.where(np.isnan(prev_close), old_mid / (1 + old_change / 100), prev_close)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(reference != 0, (mid - reference) / reference * 100, 0.0)
+        change = np.round(change, 4)
+
+        now = timezone.localtime().time()
+
+        for i, symbol in enumerate(symbols):
+            asset = assets[symbol]
+            asset.bid = _to_decimal(bid[i], 6)
+            asset.ask = _to_decimal(ask[i], 6)
+            asset.low = _to_decimal(low[i], 6)
+            asset.high = _to_decimal(high[i], 6)
+            asset.change = float(change[i])
+            asset.time = now
+
+        with transaction.atomic():
+            Asset.objects.bulk_update(assets.values(), ASSET_FIELDS, batch_size=chunk_size)
+        report.updated += len(assets)
+
+        _after_asset_prices(list(assets.values()))
+
+    report.seconds = time.perf_counter() - started
+    logger.info(f"Asset quotes ingested: {report.as_dict()}")
+    return report
+
+
+def ingest(lines, kind="stocks", fmt=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Parse and apply a quote stream. kind is "stocks" or "assets"."""
+    records = iter_records(lines, fmt)
+    if kind == "assets":
+        return ingest_asset_quotes(records, chunk_size)
+    return ingest_stock_quotes(records, chunk_size)
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_alter_customuser_email_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell')], max_length=4)),
+                ('order_type', models.CharField(choices=[('limit', 'Limit'), ('stop', 'Stop')], max_length=10)),
+                ('shares', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('trigger_price', models.DecimalField(decimal_places=2, help_text='Limit price for limit orders, stop price for stop orders', max_digits=12)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('filled', 'Filled'), ('cancelled', 'Cancelled'), ('rejected', 'Rejected')], default='open', max_length=10)),
+                ('status_reason', models.CharField(blank=True, max_length=255)),
+                ('fill_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('trade_reference', models.CharField(blank=True, help_text='Reference of the TradeHistory/Transaction rows written on fill', max_length=100)),
+                ('reference', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('filled_at', models.DateTimeField(blank=True, null=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='app.stock')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Order',
+                'verbose_name_plural': 'Stock Orders',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='app_stockor_status_050061_idx'), models.Index(fields=['stock', 'status'], name='app_stockor_stock_i_50ba31_idx'), models.Index(fields=['user', 'status', '-created_at'], name='app_stockor_user_id_787bb4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_stockorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(choices=[('1m', '1 Minute'), ('5m', '5 Minutes'), ('1h', '1 Hour'), ('1d', '1 Day')], max_length=3)),
+                ('bucket_start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('volume', models.BigIntegerField(default=0)),
+                ('tick_count', models.PositiveIntegerField(default=0)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='app.stock')),
+            ],
+            options={
+                'verbose_name': 'Price Candle',
+                'verbose_name_plural': 'Price Candles',
+                'ordering': ['stock', 'interval', 'bucket_start'],
+                'indexes': [models.Index(fields=['interval', 'bucket_start'], name='app_priceca_interva_c97971_idx')],
+                'constraints': [models.UniqueConstraint(fields=('stock', 'interval', 'bucket_start'), name='unique_price_candle')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceTick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('volume', models.BigIntegerField(default=0, help_text='Volume traded since the previous tick')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticks', to='app.stock')),
+            ],
+            options={
+                'verbose_name': 'Price Tick',
+                'verbose_name_plural': 'Price Ticks',
+                'ordering': ['recorded_at'],
+                'indexes': [models.Index(fields=['recorded_at'], name='app_priceti_recorde_102a8c_idx')],
+            },
+        ),
+    ]
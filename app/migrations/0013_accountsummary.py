@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:53
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_pricetick_pricecandle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_deposits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('total_withdrawals', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('deposits_count', models.PositiveIntegerField(default=0)),
+                ('withdrawals_count', models.PositiveIntegerField(default=0)),
+                ('active_portfolios_count', models.PositiveIntegerField(default=0)),
+                ('active_portfolios_invested', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('open_positions_count', models.PositiveIntegerField(default=0)),
+                ('open_positions_invested', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('open_positions_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='account_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Account Summary',
+                'verbose_name_plural': 'Account Summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_accountsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-published_at', '-id'], name='app_news_publish_2fb0b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['category', '-published_at', '-id'], name='app_news_categor_4d2eca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signal',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='app_signal_is_acti_a7a495_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trader',
+            index=models.Index(fields=['is_active', '-gain', '-copiers', '-id'], name='app_trader_is_acti_c43cf2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='app_transac_user_id_e10270_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersignalpurchase',
+            index=models.Index(fields=['user', '-purchased_at', '-id'], name='app_usersig_user_id_312084_idx'),
+        ),
+    ]
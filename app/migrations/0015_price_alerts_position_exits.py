@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('above', 'Rises to'), ('below', 'Falls to')], max_length=5)),
+                ('target_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('triggered', 'Triggered'), ('cancelled', 'Cancelled')], default='active', max_length=10)),
+                ('triggered_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Price Alert',
+                'verbose_name_plural': 'Price Alerts',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='userstockposition',
+            name='exits_updated_at',
+            field=models.DateTimeField(blank=True, help_text='Last change to stop_loss/take_profit (used to sync trigger books)', null=True),
+        ),
+        migrations.AddField(
+            model_name='userstockposition',
+            name='stop_loss',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Sell the position once the price falls to this level', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='userstockposition',
+            name='take_profit',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Sell the position once the price rises to this level', max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userstockposition',
+            index=models.Index(fields=['exits_updated_at'], name='app_usersto_exits_u_728bb3_idx'),
+        ),
+        migrations.AddField(
+            model_name='pricealert',
+            name='stock',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='app.stock'),
+        ),
+        migrations.AddField(
+            model_name='pricealert',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['status', 'created_at'], name='app_priceal_status_7510da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['user', 'status', '-created_at', '-id'], name='app_priceal_user_id_590943_idx'),
+        ),
+    ]
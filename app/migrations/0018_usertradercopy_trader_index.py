@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_broadcasts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usertradercopy',
+            index=models.Index(fields=['trader', 'is_actively_copying'], name='app_usertra_trader__eb841a_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_notification_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['type', 'read', 'created_at'], name='app_notific_type_c0df93_idx'),
+        ),
+    ]
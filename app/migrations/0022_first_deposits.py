@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_sync_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirstDeposit',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='first_deposit', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('deposited_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.transaction')),
+            ],
+            options={
+                'verbose_name': 'First Deposit',
+                'verbose_name_plural': 'First Deposits',
+                'indexes': [models.Index(fields=['-deposited_at'], name='app_firstde_deposit_4f6eb2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    """Backfill every referral path from referred_by (later kept up by referral_service)"""
+    CustomUser = apps.get_model('app', 'CustomUser')
+    ReferralClosure = apps.get_model('app', 'ReferralClosure')
+    db = schema_editor.connection.alias
+
+    children = {}
+    for user_id, referrer_id in CustomUser.objects.using(db).filter(
+        referred_by__isnull=False
+    ).values_list('pk', 'referred_by_id').iterator(chunk_size=5000):
+        children.setdefault(referrer_id, []).append(user_id)
+
+    batch = []
+    for ancestor_id in children:
+        seen = {ancestor_id}
+        level, depth = children[ancestor_id], 1
+        while level:
+            next_level = []
+            for user_id in level:
+                if user_id in seen:
+                    continue  # referred_by cycle
+                seen.add(user_id)
+                batch.append(ReferralClosure(ancestor_id=ancestor_id, descendant_id=user_id, depth=depth))
+                next_level.extend(children.get(user_id, ()))
+            level, depth = next_level, depth + 1
+            if len(batch) >= 5000:
+                ReferralClosure.objects.using(db).bulk_create(batch)
+                batch = []
+    ReferralClosure.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_first_deposits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(help_text='1 for a direct referral, 2 for theirs, ...')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='downline_paths', to=settings.AUTH_USER_MODEL)),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upline_paths', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Referral Path',
+                'verbose_name_plural': 'Referral Paths',
+                'indexes': [models.Index(fields=['ancestor', 'depth', 'descendant'], name='app_referra_ancesto_6d7aa2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_referral_path')],
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:39
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_referral_closure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraderStats',
+            fields=[
+                ('trader', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='app.trader')),
+                ('closed_trades', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('win_profit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('win_amount', models.DecimalField(decimal_places=8, default=Decimal('0'), max_digits=28)),
+                ('loss_profit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('loss_amount', models.DecimalField(decimal_places=8, default=Decimal('0'), max_digits=28)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Trader Stats',
+                'verbose_name_plural': 'Trader Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='TraderMonthlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('closed_trades', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('profit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('amount', models.DecimalField(decimal_places=8, default=Decimal('0'), max_digits=28)),
+                ('trader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_stats', to='app.trader')),
+            ],
+            options={
+                'verbose_name': 'Trader Monthly Stats',
+                'verbose_name_plural': 'Trader Monthly Stats',
+                'constraints': [models.UniqueConstraint(fields=('trader', 'month'), name='unique_trader_month')],
+            },
+        ),
+    ]
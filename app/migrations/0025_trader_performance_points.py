@@ -0,0 +1,148 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:42
+
+import calendar
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+MONTH_NUMBERS = {
+    **{name.lower(): number for number, name in enumerate(calendar.month_abbr) if name},
+    **{name.lower(): number for number, name in enumerate(calendar.month_name) if name},
+}
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m', '%Y/%m', '%m/%Y', '%b %Y', '%B %Y', '%b-%Y', '%B-%Y', "%b '%y")
+
+
+def parse_month(label):
+    """(year or None, month) of a month label such as '2024-03', 'Mar 2024' or 'March'"""
+    text = str(label).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+        return parsed.year, parsed.month
+    month = MONTH_NUMBERS.get(text.lower()) or MONTH_NUMBERS.get(text[:3].lower())
+    return (None, month) if month else None
+
+
+def parse_value(raw):
+    try:
+        return Decimal(str(raw).replace('%', '').replace(',', '').replace('$', '').strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def json_points(entries, key, until):
+    """
+    Points of one JSON series. Labels without a year are taken to be in
+    date order, ending no later than the trader's last update.
+    """
+    parsed = []
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        month, value = parse_month(entry.get('month', '')), parse_value(entry.get(key))
+        if month is not None and value is not None and value.is_finite():
+            parsed.append((month, value))
+
+    points = {}
+    cursor = date(until.year, until.month, 1)
+    for (year, month), value in reversed(parsed):
+        if year is None:
+            year = cursor.year if month <= cursor.month else cursor.year - 1
+        period = date(year, month, 1)
+        points.setdefault(period, value.quantize(Decimal('0.0001')))
+        # The entry before this one is at least a month earlier
+        cursor = date(year - 1, 12, 1) if month == 1 else date(year, month - 1, 1)
+    return points
+
+
+def backfill(apps, schema_editor):
+    Trader = apps.get_model('app', 'Trader')
+    TraderMonthlyStats = apps.get_model('app', 'TraderMonthlyStats')
+    TraderPerformancePoint = apps.get_model('app', 'TraderPerformancePoint')
+    db = schema_editor.connection.alias
+
+    points = {}
+    traders = Trader.objects.using(db).values_list('pk', 'performance_data', 'monthly_performance', 'updated_at')
+    for trader_id, performance_data, monthly_performance, updated_at in traders.iterator(chunk_size=500):
+        for series, entries, key in (
+            ('value', performance_data, 'value'),
+            ('percentage', monthly_performance, 'percentage'),
+        ):
+            for period, value in json_points(entries, key, updated_at).items():
+                points[trader_id, series, period] = (value, 'admin')
+
+    # Months with closed copy trades (TraderStats, 0024) win over the JSON
+    buckets = TraderMonthlyStats.objects.using(db).values_list('trader_id', 'month', 'profit', 'amount')
+    for trader_id, month, profit, amount in buckets.iterator(chunk_size=2000):
+        percentage = (profit / amount * 100).quantize(Decimal('0.0001')) if amount else Decimal(0)
+        points[trader_id, 'value', month] = (profit, 'history')
+        points[trader_id, 'percentage', month] = (percentage, 'history')
+
+    TraderPerformancePoint.objects.using(db).bulk_create(
+        [
+            TraderPerformancePoint(trader_id=trader_id, series=series, period=period, value=value, source=source)
+            for (trader_id, series, period), (value, source) in points.items()
+        ],
+        batch_size=2000,
+    )
+
+
+def restore_json(apps, schema_editor):
+    Trader = apps.get_model('app', 'Trader')
+    TraderPerformancePoint = apps.get_model('app', 'TraderPerformancePoint')
+    db = schema_editor.connection.alias
+
+    series = {}
+    for trader_id, name, period, value in TraderPerformancePoint.objects.using(db).order_by(
+        'trader_id', 'series', 'period'
+    ).values_list('trader_id', 'series', 'period', 'value'):
+        key = 'value' if name == 'value' else 'percentage'
+        series.setdefault(trader_id, {}).setdefault(name, []).append(
+            {'month': period.strftime('%Y-%m'), key: float(value)}
+        )
+    for trader_id, data in series.items():
+        Trader.objects.using(db).filter(pk=trader_id).update(
+            performance_data=data.get('value', []),
+            monthly_performance=data.get('percentage', []),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_trader_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraderPerformancePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(choices=[('value', 'Profit / Loss'), ('percentage', 'Return %')], max_length=20)),
+                ('period', models.DateField(help_text='First day of the period this point covers')),
+                ('value', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('source', models.CharField(choices=[('admin', 'Entered by admin'), ('history', 'Copy trade history')], default='admin', help_text='History points are rewritten from closed copy trades and replace admin points for their month', max_length=10)),
+                ('trader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performance_points', to='app.trader')),
+            ],
+            options={
+                'verbose_name': 'Trader Performance Point',
+                'verbose_name_plural': 'Trader Performance Points',
+                'ordering': ['trader', 'series', 'period'],
+                'constraints': [models.UniqueConstraint(fields=('trader', 'series', 'period'), name='unique_trader_performance_point')],
+            },
+        ),
+        migrations.RunPython(backfill, restore_json),
+        migrations.RemoveField(
+            model_name='trader',
+            name='monthly_performance',
+        ),
+        migrations.RemoveField(
+            model_name='trader',
+            name='performance_data',
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing(apps, schema_editor):
+    # Broadcasts from before the queue were sent in-process: none is pending
+    Broadcast = apps.get_model('app', 'Broadcast')
+    Broadcast.objects.filter(completed_at__isnull=False).update(status='completed')
+    Broadcast.objects.filter(completed_at__isnull=True).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_trader_performance_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcast',
+            name='full_details',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='broadcast',
+            name='last_user_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='broadcast',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='broadcast',
+            name='stock',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.stock'),
+        ),
+        migrations.AddField(
+            model_name='broadcast',
+            name='trader',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.trader'),
+        ),
+        migrations.RunPython(mark_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:20
+
+from django.db import migrations
+
+
+def clear_sent_bodies(apps, schema_editor):
+    # Sent emails no longer keep their HTML (it can hold one-time codes)
+    EmailOutbox = apps.get_model('app', 'EmailOutbox')
+    EmailOutbox.objects.filter(status='sent').exclude(html_body='').update(html_body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_broadcast_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_sent_bodies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:05
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def store_summary_values(apps, schema_editor):
+    # Count every open position at today's price, then make the summaries
+    # match the per-position values they will be adjusted against
+    Stock = apps.get_model('app', 'Stock')
+    UserStockPosition = apps.get_model('app', 'UserStockPosition')
+    AccountSummary = apps.get_model('app', 'AccountSummary')
+
+    price = Stock.objects.filter(pk=OuterRef('stock_id')).values('price')[:1]
+    UserStockPosition.objects.filter(is_active=True).update(
+        summary_value=Round(F('shares') * Subquery(price), 2)
+    )
+
+    value = (
+        UserStockPosition.objects.filter(user_id=OuterRef('user_id'), is_active=True)
+        .order_by()
+        .values('user_id')
+        .annotate(total=Sum('summary_value'))
+        .values('total')
+    )
+    AccountSummary.objects.update(
+        open_positions_value=Coalesce(Subquery(value), Value(Decimal('0.00')))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0027_outbox_clear_sent_bodies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstockposition',
+            name='summary_value',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, help_text="Value counted in the owner's account summary (set on save and by revaluation)", max_digits=20),
+        ),
+        migrations.RunPython(store_summary_values, migrations.RunPython.noop),
+    ]
@@ -9,9 +9,6 @@ from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 from decimal import Decimal
 
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
-
 from cloudinary.models import CloudinaryField
 
 
@@ -180,6 +177,15 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # A user restored from the token cache holds only its auth fields;
+        # the first read of any other field loads all of the rest at once
+        if fields is not None and getattr(self, '_from_token_cache', False):
+            deferred = self.get_deferred_fields()
+            if deferred and set(fields) <= deferred:
+                fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 
 def generate_unique_account_id():
     while True:
@@ -399,16 +405,6 @@ class Trader(models.Model):
     )
     
     # JSON fields for complex data
-    performance_data = models.JSONField(
-        default=list,
-        blank=True,
-        help_text="Monthly performance data as list of {month, value}"
-    )
-    monthly_performance = models.JSONField(
-        default=list,
-        blank=True,
-        help_text="Monthly performance percentages as list of {month, percentage}"
-    )
     frequently_traded = models.JSONField(
         default=list,
         blank=True,
@@ -427,6 +423,9 @@ class Trader(models.Model):
         verbose_name_plural = "Copy Traders"
         verbose_name = "Trader"
         ordering = ["-gain", "-copiers"]
+        indexes = [
+            models.Index(fields=['is_active', '-gain', '-copiers', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.country})"
@@ -647,6 +646,7 @@ class UserTraderCopy(models.Model):
         indexes = [
             models.Index(fields=['user', 'trader', 'is_actively_copying']),
             models.Index(fields=['is_actively_copying']),
+            models.Index(fields=['trader', 'is_actively_copying']),
         ]
     
     def __str__(self):
@@ -664,40 +664,6 @@ class UserTraderCopy(models.Model):
             self.stopped_copying_at = None
         super().save(*args, **kwargs)
 
-@receiver(pre_save, sender=Trader)
-def check_trader_threshold_change(sender, instance, **kwargs):
-    """
-    When admin changes trader's min_account_threshold,
-    automatically stop all active copies for users who no longer meet the threshold
-    """
-    if instance.pk:  # Only for existing traders
-        try:
-            old_trader = Trader.objects.get(pk=instance.pk)
-            # Check if min_account_threshold changed
-            if old_trader.min_account_threshold != instance.min_account_threshold:
-                # Get all active copies of this trader
-                active_copies = UserTraderCopy.objects.filter(
-                    trader=instance,
-                    is_actively_copying=True
-                )
-                
-                # Deactivate copies where minimum changed
-                for copy_relation in active_copies:
-                    # Stop copying since threshold changed
-                    copy_relation.is_actively_copying = False
-                    copy_relation.stopped_copying_at = timezone.now()
-                    copy_relation.save()
-                    
-                    # Create notification for user
-                    Notification.objects.create(
-                        user=copy_relation.user,
-                        type="alert",
-                        title="Copy Trading Stopped",
-                        message=f"Your copy of {instance.name} has been stopped due to minimum balance requirement change.",
-                        full_details=f"The minimum balance requirement for {instance.name} has changed from ${old_trader.min_account_threshold} to ${instance.min_account_threshold}. Your copy trading has been automatically stopped. Please review and copy again if you meet the new requirements.",
-                    )
-        except Trader.DoesNotExist:
-            pass
 
 class TraderPortfolio(models.Model):
     DIRECTION_CHOICES = [
@@ -806,6 +772,239 @@ class Transaction(models.Model):
         ordering = ['-created_at']
         verbose_name_plural = "Transactions"
         verbose_name = "Transaction"
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+
+class AccountSummary(models.Model):
+    """
+    Materialized per-user totals read by the dashboard endpoints.
+    Kept in step with Transaction, Portfolio and UserStockPosition writes by
+    app/account_summary_service.py; rebuild with `manage.py rebuild_account_summaries`.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="account_summary"
+    )
+
+    # Completed transactions
+    total_deposits = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    total_withdrawals = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    deposits_count = models.PositiveIntegerField(default=0)
+    withdrawals_count = models.PositiveIntegerField(default=0)
+
+    # Active portfolios
+    active_portfolios_count = models.PositiveIntegerField(default=0)
+    active_portfolios_invested = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+
+    # Open stock positions (value is the sum of each position's summary_value:
+    # shares x price as of its last save or revaluation)
+    open_positions_count = models.PositiveIntegerField(default=0)
+    open_positions_invested = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    open_positions_value = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Account Summary"
+        verbose_name_plural = "Account Summaries"
+
+    def __str__(self):
+        return f"Summary for {self.user.email}"
+
+
+class FirstDeposit(models.Model):
+    """
+    A user's first completed deposit, read by the referral views instead of
+    querying Transaction once per referred user. amount and deposited_at stay
+    null until the user has a completed deposit. Kept in step with Transaction
+    writes by app/referral_service.py; rebuild with `manage.py rebuild_referral_stats`.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="first_deposit"
+    )
+    transaction = models.ForeignKey(
+        'Transaction',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    deposited_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "First Deposit"
+        verbose_name_plural = "First Deposits"
+        indexes = [
+            models.Index(fields=['-deposited_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.amount} at {self.deposited_at}"
+
+
+class TraderStats(models.Model):
+    """
+    Running totals of a trader's closed copy trades (UserCopyTraderHistory),
+    read by the trader detail and leaderboard instead of aggregating history.
+    Kept in step with copy trade writes by app/trader_stats_service.py;
+    rebuild with `manage.py rebuild_trader_stats`.
+    """
+    trader = models.OneToOneField(
+        Trader,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats"
+    )
+
+    closed_trades = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+
+    # profit_loss and amount summed separately over winning and losing trades
+    win_profit = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    win_amount = models.DecimalField(max_digits=28, decimal_places=8, default=Decimal('0'))
+    loss_profit = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    loss_amount = models.DecimalField(max_digits=28, decimal_places=8, default=Decimal('0'))
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Trader Stats"
+        verbose_name_plural = "Trader Stats"
+
+    def __str__(self):
+        return f"Trader {self.trader_id}: {self.wins}W/{self.losses}L"
+
+    @property
+    def win_rate(self):
+        """Winning share of the trades that won or lost, in percent"""
+        total = self.wins + self.losses
+        if total == 0:
+            return 0
+        return (self.wins / total) * 100
+
+    @property
+    def avg_profit_percent(self):
+        """Profit of the winning trades as a percentage of the amount they put in"""
+        if not self.win_amount:
+            return Decimal('0.00')
+        return (self.win_profit / self.win_amount * 100).quantize(Decimal('0.01'))
+
+    @property
+    def avg_loss_percent(self):
+        """Loss of the losing trades as a (negative) percentage of the amount they put in"""
+        if not self.loss_amount:
+            return Decimal('0.00')
+        return (self.loss_profit / self.loss_amount * 100).quantize(Decimal('0.01'))
+
+
+class TraderMonthlyStats(models.Model):
+    """Closed copy trades of a trader per calendar month (UTC) of closed_at"""
+    trader = models.ForeignKey(
+        Trader,
+        on_delete=models.CASCADE,
+        related_name="monthly_stats"
+    )
+    month = models.DateField(help_text="First day of the month")
+
+    closed_trades = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    profit = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    amount = models.DecimalField(max_digits=28, decimal_places=8, default=Decimal('0'))
+
+    class Meta:
+        verbose_name = "Trader Monthly Stats"
+        verbose_name_plural = "Trader Monthly Stats"
+        constraints = [
+            models.UniqueConstraint(fields=['trader', 'month'], name='unique_trader_month'),
+        ]
+
+    def __str__(self):
+        return f"Trader {self.trader_id} {self.month:%Y-%m}: {self.profit}"
+
+
+class TraderPerformancePoint(models.Model):
+    """
+    One point of a trader's performance chart: the value of a series over
+    the period starting at `period`. Read by range through
+    app/performance_service.py, which downsamples for the chart resolution.
+    """
+    SERIES_CHOICES = [
+        ('value', 'Profit / Loss'),
+        ('percentage', 'Return %'),
+    ]
+    SOURCE_CHOICES = [
+        ('admin', 'Entered by admin'),
+        ('history', 'Copy trade history'),
+    ]
+
+    trader = models.ForeignKey(
+        Trader,
+        on_delete=models.CASCADE,
+        related_name="performance_points"
+    )
+    series = models.CharField(max_length=20, choices=SERIES_CHOICES)
+    period = models.DateField(help_text="First day of the period this point covers")
+    value = models.DecimalField(max_digits=20, decimal_places=4)
+    source = models.CharField(
+        max_length=10,
+        choices=SOURCE_CHOICES,
+        default='admin',
+        help_text="History points are rewritten from closed copy trades and replace admin points for their month"
+    )
+
+    class Meta:
+        verbose_name = "Trader Performance Point"
+        verbose_name_plural = "Trader Performance Points"
+        ordering = ['trader', 'series', 'period']
+        constraints = [
+            models.UniqueConstraint(fields=['trader', 'series', 'period'], name='unique_trader_performance_point'),
+        ]
+
+    def __str__(self):
+        return f"Trader {self.trader_id} {self.series} {self.period}: {self.value}"
+
+
+class ReferralClosure(models.Model):
+    """
+    Every (ancestor, descendant) pair of the referral tree with the number of
+    referral hops between them, so a whole downline is one indexed range on
+    ancestor. Maintained by app/referral_service.py; rebuild with
+    `manage.py rebuild_referral_stats --tree`.
+    """
+    ancestor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="downline_paths"
+    )
+    descendant = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upline_paths"
+    )
+    depth = models.PositiveIntegerField(help_text="1 for a direct referral, 2 for theirs, ...")
+
+    class Meta:
+        verbose_name = "Referral Path"
+        verbose_name_plural = "Referral Paths"
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_referral_path'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth', 'descendant']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
 
 class Ticket(models.Model):
     user = models.ForeignKey(
@@ -1003,6 +1202,10 @@ class News(models.Model):
         verbose_name = "News Article"
         verbose_name_plural = "News Articles"
         ordering = ["-published_at"]
+        indexes = [
+            models.Index(fields=['-published_at', '-id']),
+            models.Index(fields=['category', '-published_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.category}"
@@ -1077,6 +1280,7 @@ class Notification(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['user', 'read']),
             models.Index(fields=['type']),
+            models.Index(fields=['type', 'read', 'created_at']),
         ]
     
     def __str__(self):
@@ -1084,6 +1288,29 @@ class Notification(models.Model):
     
 
 
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread notification count per user, read by the unread
+    count endpoint instead of COUNT(*). Kept in step with Notification writes
+    by app/notification_service.py; repair with `manage.py rebuild_notification_counters`.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_counter"
+    )
+    unread = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Notification Counter"
+        verbose_name_plural = "Notification Counters"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
 # ADD THIS TO YOUR EXISTING models.py FILE AT THE END
 
 class Stock(models.Model):
@@ -1239,6 +1466,36 @@ class UserStockPosition(models.Model):
         help_text="Use admin-set profit instead of calculated profit"
     )
     
+    # Automatic exits: the whole position is sold when the price crosses either level
+    stop_loss = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Sell the position once the price falls to this level"
+    )
+    take_profit = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Sell the position once the price rises to this level"
+    )
+    exits_updated_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last change to stop_loss/take_profit (used to sync trigger books)"
+    )
+    
+    # Market value this position last added to AccountSummary.open_positions_value
+    summary_value = models.DecimalField(
+        max_digits=20,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        help_text="Value counted in the owner's account summary (set on save and by revaluation)"
+    )
+    
     is_active = models.BooleanField(default=True)
     opened_at = models.DateTimeField(auto_now_add=True)
     closed_at = models.DateTimeField(null=True, blank=True)
@@ -1249,6 +1506,7 @@ class UserStockPosition(models.Model):
         ordering = ["-opened_at"]
         indexes = [
             models.Index(fields=['user', 'stock', 'is_active']),
+            models.Index(fields=['exits_updated_at']),
         ]
     
     def __str__(self):
@@ -1414,6 +1672,338 @@ class TradeHistory(models.Model):
         return f"{self.user.email} - {self.trade_type.upper()} {self.shares} {self.stock.symbol}"
 
 
+class PriceTick(models.Model):
+    """Raw price observation for a stock, kept only until rolled into candles"""
+    stock = models.ForeignKey(
+        Stock,
+        on_delete=models.CASCADE,
+        related_name='ticks'
+    )
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    volume = models.BigIntegerField(default=0, help_text="Volume traded since the previous tick")
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['recorded_at']
+        verbose_name = 'Price Tick'
+        verbose_name_plural = 'Price Ticks'
+        indexes = [
+            models.Index(fields=['recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.stock.symbol} {self.price} @ {self.recorded_at}"
+
+
+class PriceCandle(models.Model):
+    """Pre-aggregated OHLCV bar for one stock and interval"""
+
+    INTERVALS = [
+        ('1m', '1 Minute'),
+        ('5m', '5 Minutes'),
+        ('1h', '1 Hour'),
+        ('1d', '1 Day'),
+    ]
+
+    stock = models.ForeignKey(
+        Stock,
+        on_delete=models.CASCADE,
+        related_name='candles'
+    )
+    interval = models.CharField(max_length=3, choices=INTERVALS)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=12, decimal_places=2)
+    high = models.DecimalField(max_digits=12, decimal_places=2)
+    low = models.DecimalField(max_digits=12, decimal_places=2)
+    close = models.DecimalField(max_digits=12, decimal_places=2)
+    volume = models.BigIntegerField(default=0)
+    tick_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['stock', 'interval', 'bucket_start']
+        verbose_name = 'Price Candle'
+        verbose_name_plural = 'Price Candles'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stock', 'interval', 'bucket_start'],
+                name='unique_price_candle',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['interval', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.stock.symbol} {self.interval} {self.bucket_start}"
+
+
+class StockOrder(models.Model):
+    """Resting limit/stop order that executes when the stock price crosses its trigger"""
+
+    SIDES = [
+        ('buy', 'Buy'),
+        ('sell', 'Sell'),
+    ]
+
+    ORDER_TYPES = [
+        ('limit', 'Limit'),
+        ('stop', 'Stop'),
+    ]
+
+    ORDER_STATUS = [
+        ('open', 'Open'),
+        ('filled', 'Filled'),
+        ('cancelled', 'Cancelled'),
+        ('rejected', 'Rejected'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='stock_orders'
+    )
+    stock = models.ForeignKey(
+        Stock,
+        on_delete=models.CASCADE,
+        related_name='orders'
+    )
+    side = models.CharField(max_length=4, choices=SIDES)
+    order_type = models.CharField(max_length=10, choices=ORDER_TYPES)
+    shares = models.DecimalField(max_digits=20, decimal_places=8)
+    trigger_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Limit price for limit orders, stop price for stop orders"
+    )
+    status = models.CharField(max_length=10, choices=ORDER_STATUS, default='open')
+    status_reason = models.CharField(max_length=255, blank=True)
+
+    fill_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    trade_reference = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Reference of the TradeHistory/Transaction rows written on fill"
+    )
+    reference = models.CharField(max_length=100, unique=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    filled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Stock Order'
+        verbose_name_plural = 'Stock Orders'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['stock', 'status']),
+            models.Index(fields=['user', 'status', '-created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.reference:
+            from django.utils.crypto import get_random_string
+            self.reference = f"ORD-{get_random_string(12).upper()}"
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.user.email} - {self.order_type.upper()} {self.side.upper()} {self.shares} {self.stock.symbol} @ {self.trigger_price}"
+
+    @property
+    def fires_below(self):
+        """True when the order executes once the price falls to the trigger (buy limit, sell stop)"""
+        return (self.side == 'buy') == (self.order_type == 'limit')
+
+
+class PriceAlert(models.Model):
+    """One-shot notification when a stock price crosses a target level"""
+
+    DIRECTIONS = [
+        ('above', 'Rises to'),
+        ('below', 'Falls to'),
+    ]
+
+    ALERT_STATUS = [
+        ('active', 'Active'),
+        ('triggered', 'Triggered'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='price_alerts'
+    )
+    stock = models.ForeignKey(
+        Stock,
+        on_delete=models.CASCADE,
+        related_name='alerts'
+    )
+    direction = models.CharField(max_length=5, choices=DIRECTIONS)
+    target_price = models.DecimalField(max_digits=12, decimal_places=2)
+    note = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=ALERT_STATUS, default='active')
+
+    triggered_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    triggered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Price Alert'
+        verbose_name_plural = 'Price Alerts'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['user', 'status', '-created_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.stock.symbol} {self.get_direction_display().lower()} {self.target_price}"
+
+
+class EmailOutbox(models.Model):
+    """Outgoing email queued by the request path and delivered by the send_outbox worker"""
+
+    OUTBOX_STATUS = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255)
+    html_body = models.TextField()
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS, default='pending')
+
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the row is next due; while sending, when the worker's claim expires"
+    )
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Outgoing Email'
+        verbose_name_plural = 'Email Outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.status})"
+
+
+class Broadcast(models.Model):
+    """One notification fanned out to a segment of users by broadcast_service"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    segment = models.CharField(max_length=30, blank=True)
+    # Segment parameters, so a queued broadcast can be resolved by the worker
+    trader = models.ForeignKey('Trader', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    stock = models.ForeignKey('Stock', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES, default='system')
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    full_details = models.TextField(blank=True)
+    send_email = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    # Recipients up to this user id have been delivered; a resumed broadcast continues after it
+    last_user_id = models.PositiveBigIntegerField(default=0)
+    sent_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='broadcasts_sent'
+    )
+
+    recipients = models.PositiveIntegerField(default=0)
+    emails = models.PositiveIntegerField(default=0)
+    seconds = models.FloatField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Broadcast'
+        verbose_name_plural = 'Broadcasts'
+
+    def __str__(self):
+        return f"{self.title} ({self.segment or 'custom'}, {self.recipients} recipients)"
+
+    @property
+    def per_second(self):
+        return self.recipients / self.seconds if self.seconds else 0.0
+
+
+class SyncState(models.Model):
+    """
+    A user's delta-sync version. Created by the user's first sync; from then
+    on every change to their synced records bumps it (see app/sync_service.py).
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="sync_state"
+    )
+    # Starts at 1 so that a client cursor of 0 always means "no cursor"
+    version = models.PositiveBigIntegerField(default=1)
+    # Deleted-record markers up to this version have been pruned; older
+    # cursors must take a full snapshot again
+    pruned_version = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Sync State"
+        verbose_name_plural = "Sync States"
+
+    def __str__(self):
+        return f"{self.user_id}: version {self.version}"
+
+
+class SyncChange(models.Model):
+    """The latest version at which one synced record of a user was written or deleted"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="sync_changes"
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    version = models.PositiveBigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Sync Change"
+        verbose_name_plural = "Sync Changes"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'model', 'object_id'], name='unique_sync_change'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'version']),
+            models.Index(fields=['deleted', 'changed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.model} {self.object_id} @ {self.version}"
+
+
 # SIGNALS
 
 class Signal(models.Model):
@@ -1497,6 +2087,9 @@ class Signal(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Trading Signal'
         verbose_name_plural = 'Trading Signals'
+        indexes = [
+            models.Index(fields=['is_active', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.name} - ${self.price}"
@@ -1532,6 +2125,9 @@ class UserSignalPurchase(models.Model):
         verbose_name = 'Signal Purchase'
         verbose_name_plural = 'Signal Purchases'
         unique_together = ['user', 'signal']  # One user can only purchase each signal once
+        indexes = [
+            models.Index(fields=['user', '-purchased_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.signal.name} - ${self.amount_paid}"
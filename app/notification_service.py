@@ -0,0 +1,235 @@
+"""
+Notification service for Citadel Markets Pro
+Keeps the per-user NotificationCounter in step with notification writes, reads and deletes
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import sync_service
+from .models import CustomUser, Notification, NotificationCounter
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+REBUILD_CHUNK_SIZE = 2000
+
+
+# ---------------------------------------------------------------------------
+# Applying deltas
+# ---------------------------------------------------------------------------
+
+def apply_deltas(deltas):
+    """
+    Add per-user unread deltas to the stored counters, with one UPDATE per
+    distinct delta (a fan-out of +1 to many users is a single UPDATE).
+    Users without a counter row are skipped; unread_count() builds the row
+    from the Notification table on first read.
+
+    Args:
+        deltas: dict of user_id -> change in unread count
+    """
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+
+    now = timezone.now()
+    for delta, user_ids in by_delta.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(
+            unread=Greatest(F('unread') + delta, Value(0)),
+            updated_at=now,
+        )
+
+
+def record_created(notifications):
+    """Account for Notification rows written with bulk_create (no signals fire)"""
+    deltas = defaultdict(int)
+    for notification in notifications:
+        if not notification.read:
+            deltas[notification.user_id] += 1
+    apply_deltas(deltas)
+
+
+def record_inserted(users):
+    """Account for one unread notification inserted for every user in a queryset"""
+    NotificationCounter.objects.filter(user_id__in=users.values('id')).update(
+        unread=F('unread') + 1,
+        updated_at=timezone.now(),
+    )
+
+
+def mark_all_read(user):
+    """Mark all of a user's notifications read. Returns the number marked."""
+    ids = list(Notification.objects.filter(user=user, read=False).values_list('id', flat=True))
+    marked = Notification.objects.filter(pk__in=ids, read=False).update(
+        read=True,
+        updated_at=timezone.now(),
+    )
+    apply_deltas({user.pk: -marked})
+    sync_service.record_rows('notifications', ((user.pk, pk) for pk in ids))
+    return marked
+
+
+def mark_read(notification):
+    """
+    Mark one notification read. Only the request whose UPDATE finds the row
+    still unread takes the counter down, so concurrent marks count once.
+    Returns True if this call marked it.
+    """
+    now = timezone.now()
+    marked = Notification.objects.filter(pk=notification.pk, read=False).update(
+        read=True,
+        updated_at=now,
+    )
+    notification.read = True
+    notification._counter_state = (notification.user_id, True)
+    if not marked:
+        return False
+
+    notification.updated_at = now
+    apply_deltas({notification.user_id: -1})
+    sync_service.record([notification])
+    return True
+
+
+@receiver(post_init, sender=Notification)
+def remember_read_state(sender, instance, **kwargs):
+    values = instance.__dict__
+    if 'read' in values and 'user_id' in values:
+        instance._counter_state = (values['user_id'], values['read'])
+    else:
+        instance._counter_state = None
+
+
+@receiver(post_save, sender=Notification)
+def update_counter_on_save(sender, instance, created, **kwargs):
+    old_state = None if created else getattr(instance, '_counter_state', None)
+    new_state = (instance.user_id, instance.read)
+
+    if old_state is None and not created:
+        # Partial instance: the delta cannot be trusted, recount this user
+        recount([instance.user_id])
+        return
+
+    deltas = defaultdict(int)
+    if old_state is not None and not old_state[1]:
+        deltas[old_state[0]] -= 1
+    if not new_state[1]:
+        deltas[new_state[0]] += 1
+    apply_deltas(deltas)
+
+    instance._counter_state = new_state
+
+
+@receiver(post_delete, sender=Notification)
+def update_counter_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_counter_state', None)
+    if state is not None and not state[1]:
+        apply_deltas({state[0]: -1})
+
+
+# ---------------------------------------------------------------------------
+# Rebuild / verify / read
+# ---------------------------------------------------------------------------
+
+def compute(user_ids):
+    """Count unread notifications from the Notification table for the given users"""
+    counts = dict.fromkeys(user_ids, 0)
+    rows = (
+        Notification.objects.filter(user_id__in=user_ids, read=False)
+        .order_by()
+        .values('user_id')
+        .annotate(unread=Count('id'))
+        .values_list('user_id', 'unread')
+    )
+    counts.update(rows)
+    return counts
+
+
+def _user_id_chunks(user_ids=None):
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        for i in range(0, len(user_ids), REBUILD_CHUNK_SIZE):
+            yield user_ids[i:i + REBUILD_CHUNK_SIZE]
+        return
+
+    last_id = 0
+    while True:
+        chunk = list(
+            CustomUser.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:REBUILD_CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def recount(user_ids):
+    """
+    Recount the given users' counters against concurrent writers.
+
+    Missing rows are created empty first, so writers' UPDATEs land on them
+    from then on instead of being skipped. The count is then taken with the
+    rows locked, so a writer that has not committed waits for the new value
+    rather than being overwritten by it. Returns {user_id: unread}.
+    """
+    now = timezone.now()
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, unread=0, updated_at=now) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    with transaction.atomic():
+        list(NotificationCounter.objects.select_for_update().filter(user_id__in=user_ids).values_list('pk'))
+        counts = compute(user_ids)
+        NotificationCounter.objects.bulk_create(
+            [
+                NotificationCounter(user_id=user_id, unread=unread, updated_at=now)
+                for user_id, unread in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['unread', 'updated_at'],
+        )
+    return counts
+
+
+def rebuild(user_ids=None):
+    """Recount and upsert counters (all users when user_ids is None). Returns the row count."""
+    written = 0
+    for chunk in _user_id_chunks(user_ids):
+        written += len(recount(chunk))
+    return written
+
+
+def verify(user_ids=None):
+    """
+    Compare stored counters with fresh counts.
+    Returns a list of (user_id, stored, expected); a missing row has stored None.
+    """
+    mismatches = []
+    for chunk in _user_id_chunks(user_ids):
+        stored = dict(
+            NotificationCounter.objects.filter(user_id__in=chunk).values_list('user_id', 'unread')
+        )
+        for user_id, expected in compute(chunk).items():
+            if stored.get(user_id) != expected:
+                mismatches.append((user_id, stored.get(user_id), expected))
+    return mismatches
+
+
+def unread_count(user):
+    """The user's unread notification count: one primary key read once the counter exists"""
+    unread = NotificationCounter.objects.filter(user_id=user.pk).values_list('unread', flat=True).first()
+    if unread is None:
+        unread = recount([user.pk])[user.pk]
+    return unread
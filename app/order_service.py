@@ -0,0 +1,287 @@
+"""
+Order service for Citadel Markets Pro
+Resting limit/stop orders and the in-memory book that matches them on price updates
+"""
+
+from datetime import timedelta
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import balance_service
+from .models import Notification, Stock, StockOrder, UserStockPosition
+from .price_triggers import ABOVE, BELOW, TriggerIndex
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# How far back each sync re-reads open orders, to pick up rows whose insert
+# committed after a later row had already been seen by this process
+SYNC_LOOKBACK = timedelta(seconds=30)
+
+# Per-process book. Keys are StockOrder ids; the DB row stays the source of truth
+_book = TriggerIndex()
+_book_lock = threading.Lock()
+_known_ids = set()
+_synced_at = None
+
+
+def parse_order_type(order_type):
+    """
+    Map the frontend order type label ("Market Buy", "Limit Sell", "stop", ...)
+    to market/limit/stop.
+    """
+    label = (order_type or "market").lower()
+    if "limit" in label:
+        return "limit"
+    if "stop" in label:
+        return "stop"
+    return "market"
+
+
+def _direction(side, order_type):
+    # Buy limits and sell stops fire when the price falls to the trigger
+    return BELOW if (side == 'buy') == (order_type == 'limit') else ABOVE
+
+
+def is_triggered(side, order_type, trigger_price, price):
+    """True if an order with this trigger executes at price"""
+    if _direction(side, order_type) == BELOW:
+        return price <= trigger_price
+    return price >= trigger_price
+
+
+def _sync_book():
+    """
+    Load open orders into the book. The first call per process rebuilds the
+    whole book from the DB; later calls only read recently created orders.
+    Caller must hold _book_lock.
+    """
+    global _synced_at
+
+    now = timezone.now()
+    orders = StockOrder.objects.filter(status='open')
+    if _synced_at is not None:
+        orders = orders.filter(created_at__gte=_synced_at - SYNC_LOOKBACK)
+
+    rows = orders.values_list('id', 'stock__symbol', 'side', 'order_type', 'trigger_price')
+    for order_id, symbol, side, order_type, trigger_price in rows.iterator():
+        if order_id in _known_ids:
+            continue
+        _known_ids.add(order_id)
+        _book.add(symbol, _direction(side, order_type), trigger_price, order_id)
+
+    _synced_at = now
+
+
+def rebuild_book():
+    """Drop the in-memory book and reload every open order from the DB"""
+    global _synced_at
+
+    with _book_lock:
+        _book.clear()
+        _known_ids.clear()
+        _synced_at = None
+        _sync_book()
+        return len(_book)
+
+
+def place_order(user, stock, side, order_type, shares, trigger_price):
+    """
+    Place a limit or stop order. An order whose trigger is already crossed
+    executes right away at the current price.
+
+    Raises balance_service.BalanceError when the account cannot cover it.
+    Returns the StockOrder.
+    """
+    if side == 'buy':
+        required = shares * trigger_price
+        if user.balance < required:
+            raise balance_service.InsufficientFundsError(
+                f"Insufficient balance. Required: ${required:.2f}, Available: ${user.balance:.2f}"
+            )
+    else:
+        position = UserStockPosition.objects.filter(
+            user=user,
+            stock=stock,
+            is_active=True,
+        ).only('shares').first()
+        if position is None:
+            raise balance_service.BalanceError("You don't own any shares of this stock")
+        if position.shares < shares:
+            raise balance_service.BalanceError(f"Insufficient shares. You own {position.shares} shares")
+
+    order = StockOrder.objects.create(
+        user=user,
+        stock=stock,
+        side=side,
+        order_type=order_type,
+        shares=shares,
+        trigger_price=trigger_price,
+    )
+
+    if is_triggered(side, order_type, trigger_price, stock.price):
+        _execute([order.id], {stock.symbol: stock.price})
+        order.refresh_from_db()
+    else:
+        with _book_lock:
+            _known_ids.add(order.id)
+            _book.add(stock.symbol, _direction(side, order_type), trigger_price, order.id)
+
+    return order
+
+
+def cancel_order(user, order_id):
+    """Cancel one of the user's open orders. Returns True if it was open."""
+    order = StockOrder.objects.filter(
+        pk=order_id,
+        user=user,
+        status='open',
+    ).select_related('stock').first()
+
+    if order is None:
+        return False
+
+    cancelled = StockOrder.objects.filter(pk=order.pk, status='open').update(
+        status='cancelled',
+        updated_at=timezone.now(),
+    )
+
+    with _book_lock:
+        _known_ids.discard(order.id)
+        _book.remove(order.stock.symbol, _direction(order.side, order.order_type), order.trigger_price, order.id)
+
+    return bool(cancelled)
+
+
+def match_prices(prices):
+    """
+    Execute every resting order crossed by a batch of price updates.
+
+    Only the crossed orders are touched: the book hands back their ids with
+    one bisect per symbol, so the cost follows the number of fills rather
+    than the number of resting orders.
+
+    Args:
+        prices: dict of symbol -> new price
+
+    Returns: list of StockOrder that were filled or rejected
+    """
+    if not prices:
+        return []
+
+    with _book_lock:
+        _sync_book()
+        hits = _book.pop_crossed_entries(prices)
+        order_ids = [order_id for entries in hits.values() for _, _, order_id in entries]
+        _known_ids.difference_update(order_ids)
+
+    if not order_ids:
+        return []
+
+    try:
+        return _execute(order_ids, prices)
+    except Exception:
+        # The batch rolled back and its orders are still open: put them back
+        # so a later quote fires them (the sync only re-reads recent orders)
+        _restore(hits)
+        raise
+
+
+def _restore(hits):
+    """Return popped book entries, skipping orders a sync has re-added meanwhile"""
+    with _book_lock:
+        for symbol, entries in hits.items():
+            for direction, level, order_id in entries:
+                if order_id not in _known_ids:
+                    _known_ids.add(order_id)
+                    _book.add(symbol, direction, level, order_id)
+
+
+def _execute(order_ids, prices):
+    """
+    Settle a batch of triggered orders in one transaction. Each order runs
+    in its own savepoint so an order the account can no longer cover is
+    rejected without undoing the others. TradeHistory, Transaction and
+    Notification rows for the whole batch go in with one INSERT per table.
+    """
+    ledger_entries, trades, notifications = [], [], []
+    now = timezone.now()
+
+    with transaction.atomic():
+        orders = list(
+            StockOrder.objects.select_for_update()
+            .filter(pk__in=order_ids, status='open')
+            .select_related('user', 'stock')
+            .order_by('created_at', 'id')
+        )
+
+        for order in orders:
+            price = prices[order.stock.symbol]
+            kind = f"{order.get_order_type_display()} {order.side}"
+            notes = f"{kind} order {order.reference} @ ${order.trigger_price}"
+
+            try:
+                with transaction.atomic():
+                    if order.side == 'buy':
+                        _, _, reference, ledger_entry, trade = balance_service.apply_buy(
+                            order.user, order.stock, order.shares, price, notes
+                        )
+                    else:
+                        sale = balance_service.apply_sell(
+                            order.user, order.stock, order.shares, price, notes
+                        )
+                        reference, ledger_entry, trade = sale['reference'], sale['transaction'], sale['trade']
+            except balance_service.BalanceError as e:
+                order.status = 'rejected'
+                order.status_reason = str(e)[:255]
+                notifications.append(Notification(
+                    user=order.user,
+                    type='trade',
+                    title='Order Rejected',
+                    message=f"Your {kind} order for {order.stock.symbol} could not be executed",
+                    full_details=f"Reason: {e}\nReference: {order.reference}",
+                ))
+            else:
+                order.status = 'filled'
+                order.fill_price = price
+                order.filled_at = now
+                order.trade_reference = reference
+                ledger_entries.append(ledger_entry)
+                trades.append(trade)
+                notifications.append(Notification(
+                    user=order.user,
+                    type='trade',
+                    title='Order Filled',
+                    message=f"Your {kind} order for {order.shares} {order.stock.symbol} filled at ${price}",
+                    full_details=f"Trigger: ${order.trigger_price}\nFill price: ${price}\nReference: {reference}",
+                ))
+            order.updated_at = now
+
+        StockOrder.objects.bulk_update(
+            orders,
+            ['status', 'status_reason', 'fill_price', 'filled_at', 'trade_reference', 'updated_at'],
+        )
+        balance_service.record(
+            transactions=ledger_entries,
+            trades=trades,
+            notifications=notifications,
+        )
+
+    if orders:
+        logger.info(f"Order book: {len(trades)} filled, {len(orders) - len(trades)} rejected")
+    return orders
+
+
+@receiver(post_save, sender=Stock)
+def match_orders_on_price_save(sender, instance, **kwargs):
+    """Run the book against a stock saved with a new price (admin edits)"""
+    if not instance.is_active:
+        return
+
+    prices = {instance.symbol: instance.price}
+    transaction.on_commit(lambda: match_prices(prices))
@@ -0,0 +1,366 @@
+"""
+Outbox service for Citadel Markets Pro
+Queues outgoing email in the EmailOutbox table and delivers it over pooled SMTP connections
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+import queue
+import random
+import smtplib
+import socket
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE = getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+POOL_SIZE = getattr(settings, 'EMAIL_OUTBOX_POOL_SIZE', 2)
+MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+
+# Retry n waits BACKOFF_BASE * 2**(n-1), capped at BACKOFF_MAX, +/- 20% jitter
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+# A claimed row is handed to another worker if its claim is not settled
+# within this long (the worker that claimed it died mid-batch)
+CLAIM_LEASE = timedelta(minutes=5)
+
+# Pooled connections idle this long are checked with NOOP before reuse,
+# and recycled after this many messages
+IDLE_CHECK_SECONDS = 30
+MAX_MESSAGES_PER_CONNECTION = 500
+
+SMTP_TIMEOUT = getattr(settings, 'EMAIL_TIMEOUT', None) or 30
+
+# Sent and dead rows are deleted this long after they settle. Sent rows lose
+# their body as soon as they go out, since it can hold one-time codes.
+RETENTION = timedelta(days=getattr(settings, 'EMAIL_OUTBOX_RETENTION_DAYS', 7))
+PURGE_CHUNK_SIZE = 1000
+
+
+# ---------------------------------------------------------------------------
+# Request path
+# ---------------------------------------------------------------------------
+
+def enqueue(to_email, subject, html_content, from_email=None):
+    """Queue one email for the worker. A single INSERT; returns the EmailOutbox row."""
+    return EmailOutbox.objects.create(
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        html_body=html_content,
+    )
+
+
+def enqueue_many(messages, from_email=None, batch_size=1000):
+    """
+    Queue many emails with bulk INSERTs.
+
+    Args:
+        messages: iterable of (to_email, subject, html_content)
+
+    Returns: the created EmailOutbox rows
+    """
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    rows = [
+        EmailOutbox(to_email=to_email, from_email=from_email, subject=subject, html_body=html_content)
+        for to_email, subject, html_content in messages
+    ]
+    return EmailOutbox.objects.bulk_create(rows, batch_size=batch_size)
+
+
+# ---------------------------------------------------------------------------
+# SMTP connection pool
+# ---------------------------------------------------------------------------
+
+@dataclass
+class SMTPSettings:
+    host: str
+    port: int
+    username: str = ''
+    password: str = ''
+    security: str = 'ssl'  # 'ssl', 'starttls' or 'none'
+    timeout: float = SMTP_TIMEOUT
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        if settings.EMAIL_USE_TLS:
+            security = 'starttls'
+        elif getattr(settings, 'EMAIL_USE_SSL', False):
+            security = 'ssl'
+        else:
+            security = 'none'
+
+        values = {
+            'host': settings.EMAIL_HOST,
+            'port': settings.EMAIL_PORT,
+            'username': settings.EMAIL_HOST_USER,
+            'password': settings.EMAIL_HOST_PASSWORD,
+            'security': security,
+        }
+        values.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**values)
+
+
+class PooledConnection:
+    """An authenticated SMTP session that is reused across messages"""
+
+    def __init__(self, config):
+        self.config = config
+        self.server = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    def open(self):
+        config = self.config
+        if config.security == 'ssl':
+            server = smtplib.SMTP_SSL(config.host, config.port, timeout=config.timeout)
+        else:
+            server = smtplib.SMTP(config.host, config.port, timeout=config.timeout)
+            if config.security == 'starttls':
+                server.starttls()
+
+        server.ehlo_or_helo_if_needed()
+        if config.username and server.has_extn('auth'):
+            server.login(config.username, config.password)
+
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def ensure_open(self):
+        """Reconnect if the session was never opened, is worn out, or went stale while idle"""
+        if self.server is not None and self.sent >= MAX_MESSAGES_PER_CONNECTION:
+            self.close()
+        elif self.server is not None and time.monotonic() - self.last_used > IDLE_CHECK_SECONDS:
+            try:
+                alive = self.server.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                alive = False
+            if not alive:
+                self.server.close()
+                self.server = None
+        if self.server is None:
+            self.open()
+
+    def send(self, from_email, to_email, message):
+        """Send one message, reconnecting once if the server dropped the session"""
+        self.ensure_open()
+        try:
+            self.server.sendmail(from_email, [to_email], message)
+        except smtplib.SMTPServerDisconnected:
+            self.server = None
+            self.open()
+            self.server.sendmail(from_email, [to_email], message)
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """
+    A fixed number of SMTP sessions shared by the worker's sender threads.
+    Sessions are opened lazily and stay open between batches, so the TLS
+    handshake and AUTH are paid once per session rather than once per email.
+    """
+
+    def __init__(self, config=None, size=POOL_SIZE):
+        self.config = config or SMTPSettings.from_settings()
+        self.size = size
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(PooledConnection(self.config))
+
+    def acquire(self):
+        return self._idle.get()
+
+    def release(self, connection):
+        self._idle.put(connection)
+
+    def close(self):
+        """Quit every session; the pool can still be used and reconnects on demand"""
+        connections = [self._idle.get() for _ in range(self.size)]
+        for connection in connections:
+            connection.close()
+            self._idle.put(connection)
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def backoff(attempts):
+    """Delay before the retry that follows the given number of failed attempts"""
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """
+    Claim up to batch_size due rows for this worker. Rows locked by another
+    worker are skipped, so several workers can drain the same table.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        rows = list(due)
+        if rows:
+            EmailOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status='sending',
+                next_attempt_at=now + CLAIM_LEASE,
+            )
+    return rows
+
+
+def build_message(row):
+    message = MIMEMultipart('alternative')
+    message['Subject'] = row.subject
+    message['From'] = row.from_email
+    message['To'] = row.to_email
+    message['Date'] = formatdate(localtime=True)
+    message['Message-ID'] = make_msgid(idstring=f"outbox{row.pk}")
+    message.attach(MIMEText(row.html_body, 'html'))
+    return message.as_string()
+
+
+def _is_permanent(error):
+    """5xx replies (bad address, rejected content) will not succeed on retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    code = getattr(error, 'smtp_code', None)
+    return isinstance(code, int) and code >= 500 and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+# Per-message refusals; smtplib resets the session after these
+_REJECTED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _deliver(pool, row):
+    """Send one row on a pooled session. Returns None on success, else the exception."""
+    connection = pool.acquire()
+    try:
+        connection.send(row.from_email, row.to_email, build_message(row))
+    except _REJECTED as e:
+        # The server refused this message but the session is still usable
+        return e
+    except (smtplib.SMTPException, OSError, socket.timeout) as e:
+        # Drop the session; whatever state it is in, the next send reconnects
+        if connection.server is not None:
+            connection.server.close()
+            connection.server = None
+        return e
+    finally:
+        pool.release(connection)
+    return None
+
+
+def send_batch(rows, pool, max_attempts=MAX_ATTEMPTS):
+    """
+    Deliver claimed rows over the pool and record the outcome of every row
+    with one bulk UPDATE. Returns (sent, retried, dead).
+    """
+    if not rows:
+        return 0, 0, 0
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        errors = list(executor.map(lambda row: _deliver(pool, row), rows))
+
+    now = timezone.now()
+    sent = retried = dead = 0
+    for row, error in zip(rows, errors):
+        row.attempts += 1
+        if error is None:
+            row.status = 'sent'
+            row.sent_at = now
+            row.last_error = ''
+            row.html_body = ''
+            sent += 1
+        elif _is_permanent(error) or row.attempts >= max_attempts:
+            row.status = 'dead'
+            row.last_error = f"{type(error).__name__}: {error}"
+            dead += 1
+            logger.error(f"Email {row.pk} to {row.to_email} dead after {row.attempts} attempts: {error}")
+        else:
+            row.status = 'pending'
+            row.next_attempt_at = now + backoff(row.attempts)
+            row.last_error = f"{type(error).__name__}: {error}"
+            retried += 1
+            logger.warning(f"Email {row.pk} to {row.to_email} failed (attempt {row.attempts}), retrying: {error}")
+
+    EmailOutbox.objects.bulk_update(
+        rows,
+        ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'html_body'],
+    )
+
+    logger.info(f"Outbox batch: {sent} sent, {retried} retried, {dead} dead")
+    return sent, retried, dead
+
+
+def drain(pool, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Send batches until nothing is due. Returns (sent, retried, dead) totals."""
+    totals = [0, 0, 0]
+    while True:
+        rows = claim_batch(batch_size)
+        if not rows:
+            return tuple(totals)
+        for i, count in enumerate(send_batch(rows, pool, max_attempts)):
+            totals[i] += count
+
+
+def requeue_dead(queryset=None):
+    """Give dead rows a fresh set of attempts. Returns the number requeued."""
+    queryset = EmailOutbox.objects.all() if queryset is None else queryset
+    return queryset.filter(status='dead').update(
+        status='pending',
+        attempts=0,
+        next_attempt_at=timezone.now(),
+    )
+
+
+def purge(retention=RETENTION, chunk_size=PURGE_CHUNK_SIZE):
+    """
+    Delete sent rows older than retention (by sent_at) and dead rows older
+    than retention (by created_at), chunk_size rows per DELETE. Returns the
+    number deleted.
+    """
+    cutoff = timezone.now() - retention
+    expired = [
+        EmailOutbox.objects.filter(status='sent', sent_at__lt=cutoff),
+        EmailOutbox.objects.filter(status='dead', created_at__lt=cutoff),
+    ]
+
+    deleted = 0
+    for rows in expired:
+        while True:
+            ids = list(rows.order_by().values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted += EmailOutbox.objects.filter(pk__in=ids).delete()[0]
+
+    if deleted:
+        logger.info(f"Outbox purge: {deleted} sent/dead emails older than {retention.days}d deleted")
+    return deleted
@@ -0,0 +1,220 @@
+"""
+Keyset pagination for Citadel Markets Pro
+Opaque-cursor pages over a stable (sort key, id) ordering for the list endpoints
+"""
+
+import base64
+import binascii
+from bisect import bisect_left, bisect_right
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+import operator
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+CURSOR_PARAM = "cursor"
+PAGE_SIZE_PARAMS = ("page_size", "limit")  # "limit" kept for older clients
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Invalid cursor"
+    default_code = "invalid_cursor"
+
+
+@dataclass
+class Page:
+    items: list
+    page_size: int
+    next: str = None
+    prev: str = None
+    extra: dict = field(default_factory=dict)
+
+    def links(self):
+        return {"next": self.next, "prev": self.prev}
+
+    def apply_headers(self, response):
+        """Add an RFC 8288 Link header, for endpoints whose body is a bare list"""
+        links = [f'<{url}>; rel="{rel}"' for rel, url in self.links().items() if url]
+        if links:
+            response["Link"] = ", ".join(links)
+        return response
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, reverse=False):
+    payload = {"k": [_encode_value(v) for v in values]}
+    if reverse:
+        payload["r"] = 1
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, fields):
+    """Return (values, reverse) for a cursor built over the given model fields"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["k"]
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise InvalidCursor()
+        values = [f.to_python(v) for f, v in zip(fields, values)]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError, DjangoValidationError):
+        raise InvalidCursor()
+    if any(v is None for v in values):
+        raise InvalidCursor()
+    return values, bool(payload.get("r"))
+
+
+def _parse_ordering(queryset, ordering):
+    """Split ordering into [(name, descending)], ending on the primary key"""
+    pk_name = queryset.model._meta.pk.name
+    keys = []
+    for name in ordering:
+        descending = name.startswith("-")
+        name = name.lstrip("-")
+        keys.append((pk_name if name == "pk" else name, descending))
+    if keys[-1][0] != pk_name:
+        keys.append((pk_name, keys[-1][1]))
+    return keys
+
+
+def _after(keys, values, backwards):
+    """
+    Row-value comparison "(k1, k2, ...) > (v1, v2, ...)" spelled out per column,
+    so mixed ASC/DESC orderings work on every backend
+    """
+    clauses = []
+    for i, (name, descending) in enumerate(keys):
+        lookup = "lt" if descending != backwards else "gt"
+        equal = {keys[j][0]: values[j] for j in range(i)}
+        clauses.append(Q(**equal, **{f"{name}__{lookup}": values[i]}))
+    return reduce(operator.or_, clauses)
+
+
+def _key(item, keys):
+    if isinstance(item, dict):
+        return [item[name] for name, _ in keys]
+    return [getattr(item, name) for name, _ in keys]
+
+
+def page_size_from(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    for param in PAGE_SIZE_PARAMS:
+        value = request.query_params.get(param)
+        if value:
+            try:
+                return max(1, min(int(value), maximum))
+            except ValueError:
+                break
+    return default
+
+
+def paginate(request, queryset, ordering, default_page_size=DEFAULT_PAGE_SIZE, max_page_size=MAX_PAGE_SIZE):
+    """
+    Return one Page of queryset ordered by ordering (e.g. ("-created_at",)).
+
+    The primary key is appended as a tie-breaker, so every row has a unique
+    position and each page is a single index range scan with LIMIT - the cost
+    does not grow with how deep the client has paged. Items may be model
+    instances or dicts from .values() (which must include the ordering fields).
+    """
+    keys = _parse_ordering(queryset, ordering)
+    model_fields = [queryset.model._meta.get_field(name) for name, _ in keys]
+    page_size = page_size_from(request, default_page_size, max_page_size)
+
+    cursor = request.query_params.get(CURSOR_PARAM)
+    backwards = False
+    if cursor:
+        values, backwards = decode_cursor(cursor, model_fields)
+        queryset = queryset.filter(_after(keys, values, backwards))
+
+    order_by = [
+        ("-" if descending != backwards else "") + name
+        for name, descending in keys
+    ]
+    items = list(queryset.order_by(*order_by)[:page_size + 1])
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if backwards:
+        items.reverse()
+
+    return _page(
+        request, items, page_size, cursor, backwards, has_more,
+        lambda item: _key(item, keys),
+    )
+
+
+def _page(request, items, page_size, cursor, backwards, has_more, key):
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else bool(cursor)
+
+    page = Page(items=items, page_size=page_size)
+    if items:
+        url = request.build_absolute_uri()
+        if has_next:
+            page.next = replace_query_param(url, CURSOR_PARAM, encode_cursor(key(items[-1])))
+        if has_prev:
+            page.prev = replace_query_param(
+                url, CURSOR_PARAM, encode_cursor(key(items[0]), reverse=True)
+            )
+    elif backwards:
+        # Paged back past the first row: point at the first page
+        page.next = remove_query_param(request.build_absolute_uri(), CURSOR_PARAM)
+    return page
+
+
+def paginate_sorted(request, items, keys, fields, match=None,
+                    default_page_size=DEFAULT_PAGE_SIZE, max_page_size=MAX_PAGE_SIZE):
+    """
+    Return one Page of an in-memory list, with the same cursors as paginate().
+
+    keys is a list parallel to items holding each item's unique sort key
+    tuple, in ascending order (negate values for a descending ranking);
+    fields are model fields that parse the key values back from a cursor.
+    Items failing match (optional predicate) are skipped.
+    """
+    page_size = page_size_from(request, default_page_size, max_page_size)
+
+    cursor = request.query_params.get(CURSOR_PARAM)
+    backwards = False
+    start = 0
+    if cursor:
+        values, backwards = decode_cursor(cursor, fields)
+        bound = bisect_left if backwards else bisect_right
+        start = bound(keys, tuple(values))
+
+    positions = range(start - 1, -1, -1) if backwards else range(start, len(items))
+    picked = []
+    for position in positions:
+        if match is None or match(items[position]):
+            picked.append(position)
+            if len(picked) > page_size:
+                break
+    has_more = len(picked) > page_size
+    picked = picked[:page_size]
+    if backwards:
+        picked.reverse()
+
+    page = _page(
+        request, picked, page_size, cursor, backwards, has_more,
+        lambda position: keys[position],
+    )
+    page.items = [items[position] for position in picked]
+    return page
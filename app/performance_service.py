@@ -0,0 +1,153 @@
+"""
+Performance service for Citadel Markets Pro
+Stores trader performance charts as (trader, series, period, value) points and downsamples ranges for display
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TraderMonthlyStats, TraderPerformancePoint
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+SERIES = ('value', 'percentage')
+RESOLUTIONS = ('day', 'week', 'month')
+
+# Range read when the client gives no `from`, and the widest range allowed, per resolution (days)
+DEFAULT_SPAN_DAYS = {'day': 90, 'week': 365, 'month': 3 * 365}
+MAX_SPAN_DAYS = {'day': 366, 'week': 5 * 366, 'month': 20 * 366}
+
+# Months of each series embedded in the trader detail payload
+DETAIL_MONTHS = 12
+
+
+def bucket_of(day, resolution):
+    """Start of the day / week (Monday) / month a date falls in"""
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    if resolution == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _combine(series, values):
+    # Profit adds up; returns compound
+    if series == 'percentage':
+        growth = Decimal(1)
+        for value in values:
+            growth *= 1 + value / 100
+        return (growth - 1) * 100
+    return sum(values, Decimal(0))
+
+
+def default_range(resolution, today=None):
+    today = today or timezone.now().date()
+    return today - timedelta(days=DEFAULT_SPAN_DAYS[resolution]), today
+
+
+def chart(trader_id, resolution='month', start=None, end=None, series=SERIES):
+    """
+    The trader's series between start and end (inclusive dates), one point
+    per resolution bucket, from one query over the (trader, series, period)
+    index range.
+
+    A bucket is labelled with the period of its first point, so points
+    stored coarser than the resolution (e.g. monthly points read by week)
+    keep their own dates.
+
+    Returns: dict of series -> [{'period', 'value'}] in date order.
+    """
+    if start is None or end is None:
+        default_start, default_end = default_range(resolution)
+        start, end = start or default_start, end or default_end
+
+    rows = (
+        TraderPerformancePoint.objects.filter(
+            trader_id=trader_id,
+            series__in=series,
+            period__range=(start, end),
+        )
+        .order_by('series', 'period')
+        .values_list('series', 'period', 'value')
+    )
+
+    buckets = {}
+    for name, period, value in rows:
+        key = (name, bucket_of(period, resolution))
+        if key in buckets:
+            buckets[key][1].append(value)
+        else:
+            buckets[key] = (period, [value])
+
+    charts = {name: [] for name in series}
+    for (name, _), (label, values) in buckets.items():
+        charts[name].append({
+            'period': label.isoformat(),
+            'value': float(_combine(name, values).quantize(Decimal('0.0001'))),
+        })
+    return charts
+
+
+def detail_series(trader_id, today=None):
+    """
+    The last DETAIL_MONTHS months of both series in the shape of the former
+    performance_data / monthly_performance JSON fields, for the trader detail
+    payload (one range query).
+    """
+    today = today or timezone.now().date()
+    start = today.replace(day=1)
+    for _ in range(DETAIL_MONTHS - 1):
+        start = (start - timedelta(days=1)).replace(day=1)
+
+    charts = chart(trader_id, 'month', start, today)
+    return {
+        'performance_data': [
+            {'month': point['period'][:7], 'value': point['value']}
+            for point in charts['value']
+        ],
+        'monthly_performance': [
+            {'month': point['period'][:7], 'percentage': point['value']}
+            for point in charts['percentage']
+        ],
+    }
+
+
+def publish_history(trader_ids, months=None):
+    """
+    Rewrite the history points of the given traders from their
+    TraderMonthlyStats buckets: profit as `value`, profit over amount put in
+    as `percentage`. History points replace admin points of the same month;
+    the point of a month left without closed trades is removed.
+
+    Args:
+        months: limit to these month dates (default: every month)
+    """
+    buckets = TraderMonthlyStats.objects.filter(trader_id__in=trader_ids)
+    stale = TraderPerformancePoint.objects.filter(trader_id__in=trader_ids, source='history')
+    if months is not None:
+        buckets = buckets.filter(month__in=months)
+        stale = stale.filter(period__in=months)
+
+    points = []
+    for trader_id, month, profit, amount in buckets.values_list('trader_id', 'month', 'profit', 'amount'):
+        percentage = (profit / amount * 100).quantize(Decimal('0.0001')) if amount else Decimal(0)
+        points += [
+            TraderPerformancePoint(trader_id=trader_id, series='value', period=month, value=profit, source='history'),
+            TraderPerformancePoint(trader_id=trader_id, series='percentage', period=month, value=percentage, source='history'),
+        ]
+
+    with transaction.atomic():
+        stale.delete()
+        TraderPerformancePoint.objects.bulk_create(
+            points,
+            update_conflicts=True,
+            unique_fields=['trader', 'series', 'period'],
+            update_fields=['value', 'source'],
+            batch_size=2000,
+        )
+    return len(points)
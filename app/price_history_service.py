@@ -0,0 +1,228 @@
+"""
+Price history service for Citadel Markets Pro
+Records price ticks, rolls them into OHLCV candles and compacts old history
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import PriceCandle, PriceTick, Stock
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Interval -> bucket size in seconds, in roll-up order. Each interval is built
+# from the one before it; 1m is built from raw ticks.
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# How long each level is kept (days); None keeps it forever.
+# Override with PRICE_HISTORY_RETENTION_DAYS in settings.
+DEFAULT_RETENTION_DAYS = {
+    'tick': 2,
+    '1m': 7,
+    '5m': 30,
+    '1h': 365,
+    '1d': None,
+}
+
+CANDLE_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'tick_count']
+DELETE_CHUNK_SIZE = 5000
+
+
+def retention_days():
+    return {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'PRICE_HISTORY_RETENTION_DAYS', {})}
+
+
+def bucket_start(moment, interval):
+    """Floor a datetime to the start of its bucket (UTC aligned)"""
+    size = INTERVAL_SECONDS[interval]
+    seconds = int(moment.timestamp()) // size * size
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def record_ticks(ticks, recorded_at=None):
+    """
+    Store a batch of ticks with one INSERT.
+
+    Args:
+        ticks: iterable of (stock_id, price, volume)
+    """
+    recorded_at = recorded_at or timezone.now()
+    rows = [
+        PriceTick(stock_id=stock_id, price=price, volume=volume, recorded_at=recorded_at)
+        for stock_id, price, volume in ticks
+    ]
+    if rows:
+        PriceTick.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _fold(buckets, key, open_, high, low, close, volume, count):
+    """Merge one ordered observation into the running bucket"""
+    bar = buckets.get(key)
+    if bar is None:
+        buckets[key] = [open_, high, low, close, volume, count]
+        return
+    if high > bar[1]:
+        bar[1] = high
+    if low < bar[2]:
+        bar[2] = low
+    bar[3] = close
+    bar[4] += volume
+    bar[5] += count
+
+
+def _upsert(interval, buckets):
+    candles = [
+        PriceCandle(
+            stock_id=stock_id,
+            interval=interval,
+            bucket_start=start,
+            open=bar[0],
+            high=bar[1],
+            low=bar[2],
+            close=bar[3],
+            volume=bar[4],
+            tick_count=bar[5],
+        )
+        for (stock_id, start), bar in buckets.items()
+    ]
+    if candles:
+        PriceCandle.objects.bulk_create(
+            candles,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['stock', 'interval', 'bucket_start'],
+            update_fields=CANDLE_FIELDS,
+        )
+    return len(candles)
+
+
+def _rollup_from(interval, since):
+    """Aggregate the level below `interval` from `since` into its buckets"""
+    buckets = {}
+
+    if interval == '1m':
+        rows = (
+            PriceTick.objects.filter(recorded_at__gte=since)
+            .order_by('recorded_at', 'id')
+            .values_list('stock_id', 'recorded_at', 'price', 'volume')
+        )
+        for stock_id, at, price, volume in rows.iterator(chunk_size=5000):
+            _fold(buckets, (stock_id, bucket_start(at, interval)), price, price, price, price, volume, 1)
+    else:
+        intervals = list(INTERVAL_SECONDS)
+        source = intervals[intervals.index(interval) - 1]
+        rows = (
+            PriceCandle.objects.filter(interval=source, bucket_start__gte=since)
+            .order_by('bucket_start')
+            .values_list('stock_id', 'bucket_start', 'open', 'high', 'low', 'close', 'volume', 'tick_count')
+        )
+        for stock_id, at, *bar in rows.iterator(chunk_size=5000):
+            _fold(buckets, (stock_id, bucket_start(at, interval)), *bar)
+
+    return _upsert(interval, buckets)
+
+
+def rollup(now=None):
+    """
+    Bring every candle level up to date.
+
+    Each level restarts from its newest (possibly partial) bucket, so a run
+    only reads the source rows that arrived since the previous run.
+    Returns a dict of interval -> candles written.
+    """
+    now = now or timezone.now()
+    written = {}
+
+    for interval in INTERVAL_SECONDS:
+        latest = (
+            PriceCandle.objects.filter(interval=interval)
+            .order_by('-bucket_start')
+            .values_list('bucket_start', flat=True)
+            .first()
+        )
+        since = latest or datetime.fromtimestamp(0, tz=dt_timezone.utc)
+
+        with transaction.atomic():
+            written[interval] = _rollup_from(interval, since)
+
+    return written
+
+
+def _delete_in_chunks(queryset):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:DELETE_CHUNK_SIZE])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+
+
+def compact(now=None):
+    """
+    Delete ticks and candles past their retention window. Ticks are only
+    dropped once they are older than the newest 1m candle, so nothing is
+    lost before it has been rolled up.
+    Returns a dict of level -> rows deleted.
+    """
+    now = now or timezone.now()
+    deleted = {}
+
+    for level, days in retention_days().items():
+        if days is None:
+            continue
+        cutoff = now - timedelta(days=days)
+
+        if level == 'tick':
+            rolled_until = (
+                PriceCandle.objects.filter(interval='1m')
+                .order_by('-bucket_start')
+                .values_list('bucket_start', flat=True)
+                .first()
+            )
+            if rolled_until is None:
+                continue
+            cutoff = min(cutoff, rolled_until)
+            deleted[level] = _delete_in_chunks(PriceTick.objects.filter(recorded_at__lt=cutoff))
+        else:
+            deleted[level] = _delete_in_chunks(
+                PriceCandle.objects.filter(interval=level, bucket_start__lt=cutoff)
+            )
+
+    return deleted
+
+
+def get_candles(stock, interval, start=None, end=None, limit=500):
+    """Return the newest `limit` candles in [start, end], oldest first"""
+    candles = PriceCandle.objects.filter(stock=stock, interval=interval)
+    if start:
+        candles = candles.filter(bucket_start__gte=start)
+    if end:
+        candles = candles.filter(bucket_start__lte=end)
+
+    rows = list(
+        candles.order_by('-bucket_start')
+        .values_list('bucket_start', 'open', 'high', 'low', 'close', 'volume')[:limit]
+    )
+    rows.reverse()
+    return rows
+
+
+@receiver(post_save, sender=Stock)
+def record_tick_on_price_save(sender, instance, created, update_fields=None, **kwargs):
+    """Keep a tick for prices changed outside the bulk feed (admin edits)"""
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    record_ticks([(instance.pk, instance.price, 0)])
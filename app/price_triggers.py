@@ -0,0 +1,124 @@
+"""
+Price trigger index for Citadel Markets Pro
+Keeps per-symbol price levels sorted so a quote only visits the levels it crossed
+"""
+
+from bisect import bisect_left, bisect_right, insort
+import threading
+
+# A trigger either fires once the price falls to its level or once it rises to it
+BELOW = 'below'
+ABOVE = 'above'
+
+_INF = float('inf')
+
+
+class TriggerLadder:
+    """
+    Sorted (level, key) pairs for one symbol.
+
+    `below` fires when price <= level, so the crossed entries are the suffix
+    with level >= price. `above` fires when price >= level, so the crossed
+    entries are the prefix with level <= price. Both are found with one bisect
+    and removed with one slice deletion.
+    """
+
+    __slots__ = ('below', 'above')
+
+    def __init__(self):
+        self.below = []
+        self.above = []
+
+    def __len__(self):
+        return len(self.below) + len(self.above)
+
+    def _side(self, direction):
+        return self.below if direction == BELOW else self.above
+
+    def add(self, direction, level, key):
+        insort(self._side(direction), (level, key))
+
+    def remove(self, direction, level, key):
+        side = self._side(direction)
+        i = bisect_left(side, (level, key))
+        if i < len(side) and side[i] == (level, key):
+            del side[i]
+            return True
+        return False
+
+    def pop_crossed(self, price):
+        """Remove and return the keys whose level is crossed by price"""
+        return [key for _, _, key in self.pop_crossed_entries(price)]
+
+    def pop_crossed_entries(self, price):
+        """Remove and return (direction, level, key) for every entry crossed by price"""
+        i = bisect_left(self.below, (price,))
+        j = bisect_right(self.above, (price, _INF))
+
+        crossed = [(BELOW, level, key) for level, key in self.below[i:]]
+        crossed.extend((ABOVE, level, key) for level, key in self.above[:j])
+
+        del self.below[i:]
+        del self.above[:j]
+        return crossed
+
+
+class TriggerIndex:
+    """
+    Thread-safe map of symbol -> TriggerLadder.
+
+    Keys must be integers (usually row ids) so ties on level sort by key.
+    """
+
+    def __init__(self):
+        self._ladders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(ladder) for ladder in self._ladders.values())
+
+    def clear(self):
+        with self._lock:
+            self._ladders = {}
+
+    def add(self, symbol, direction, level, key):
+        with self._lock:
+            ladder = self._ladders.get(symbol)
+            if ladder is None:
+                ladder = self._ladders[symbol] = TriggerLadder()
+            ladder.add(direction, level, key)
+
+    def remove(self, symbol, direction, level, key):
+        with self._lock:
+            ladder = self._ladders.get(symbol)
+            return ladder.remove(direction, level, key) if ladder else False
+
+    def pop_crossed(self, prices):
+        """
+        Take every trigger crossed by a batch of quotes.
+
+        Args:
+            prices: dict of symbol -> price
+
+        Returns: dict of symbol -> list of keys (symbols with no hits omitted)
+        """
+        return {
+            symbol: [key for _, _, key in entries]
+            for symbol, entries in self.pop_crossed_entries(prices).items()
+        }
+
+    def pop_crossed_entries(self, prices):
+        """
+        Like pop_crossed, but with each hit as a (direction, level, key)
+        entry, so a caller whose batch fails can add() it back.
+        """
+        hits = {}
+        with self._lock:
+            for symbol, price in prices.items():
+                ladder = self._ladders.get(symbol)
+                if not ladder:
+                    continue
+                crossed = ladder.pop_crossed_entries(price)
+                if crossed:
+                    hits[symbol] = crossed
+        return hits
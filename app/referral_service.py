@@ -0,0 +1,431 @@
+"""
+Referral service for Citadel Markets Pro
+Records each user's first completed deposit and the referral tree so referral stats are read with set-based queries
+"""
+
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.constants import OnConflict
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import account_summary_service
+from .models import CustomUser, FirstDeposit, ReferralClosure, Transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Referrers earn this share of each referred user's first completed deposit
+BONUS_RATE = Decimal('0.10')
+
+REBUILD_CHUNK_SIZE = 2000
+
+
+def is_completed_deposit(transaction):
+    return transaction.transaction_type == 'deposit' and transaction.status == 'completed'
+
+
+def bonus(amount):
+    return amount * BONUS_RATE if amount is not None else Decimal('0.00')
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def _record_completed(transaction):
+    """Make a newly completed deposit the user's first one if nothing earlier is recorded"""
+    updated = FirstDeposit.objects.filter(user_id=transaction.user_id).filter(
+        Q(deposited_at__isnull=True)
+        | Q(deposited_at__gt=transaction.created_at)
+        | Q(deposited_at=transaction.created_at, transaction_id__gt=transaction.pk)
+    ).update(
+        transaction=transaction,
+        amount=transaction.amount,
+        deposited_at=transaction.created_at,
+    )
+    if not updated and not FirstDeposit.objects.filter(user_id=transaction.user_id).exists():
+        rebuild(user_ids=[transaction.user_id])
+
+
+def record_transactions(entries):
+    """Account for Transaction rows written with bulk_create (no signals fire)"""
+    earliest = {}
+    for entry in entries:
+        if not is_completed_deposit(entry):
+            continue
+        current = earliest.get(entry.user_id)
+        if current is None or (entry.created_at, entry.pk) < (current.created_at, current.pk):
+            earliest[entry.user_id] = entry
+    if not earliest:
+        return
+
+    recorded = dict(
+        FirstDeposit.objects.filter(user_id__in=earliest).values_list('user_id', 'deposited_at')
+    )
+    fill = [
+        FirstDeposit(
+            user_id=user_id,
+            transaction=entry,
+            amount=entry.amount,
+            deposited_at=entry.created_at,
+        )
+        for user_id, entry in earliest.items()
+        if user_id in recorded and (recorded[user_id] is None or recorded[user_id] > entry.created_at)
+    ]
+    if fill:
+        FirstDeposit.objects.bulk_create(
+            fill,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['transaction', 'amount', 'deposited_at', 'updated_at'],
+        )
+
+    # Users never built before: their earlier deposits are not known yet
+    missing = [user_id for user_id in earliest if user_id not in recorded]
+    if missing:
+        rebuild(user_ids=missing)
+
+
+@receiver(post_init, sender=Transaction)
+def remember_deposit_state(sender, instance, **kwargs):
+    values = instance.__dict__
+    if all(name in values for name in ('transaction_type', 'status', 'amount', 'created_at')):
+        instance._deposit_state = (
+            values['transaction_type'] == 'deposit' and values['status'] == 'completed',
+            values['amount'],
+            values['created_at'],
+        )
+    else:
+        instance._deposit_state = None
+
+
+@receiver(post_save, sender=Transaction)
+def update_first_deposit_on_save(sender, instance, created, **kwargs):
+    state = None if created else getattr(instance, '_deposit_state', None)
+    completed = is_completed_deposit(instance)
+    instance._deposit_state = (completed, instance.amount, instance.created_at)
+
+    if created or (state is not None and not state[0]):
+        # Was not a completed deposit before this save
+        if completed:
+            _record_completed(instance)
+        return
+
+    if state is not None and state == instance._deposit_state:
+        return
+
+    # A completed deposit was edited or stopped counting (or the old state is
+    # unknown): recount the user if it is the one on record
+    if FirstDeposit.objects.filter(user_id=instance.user_id, transaction_id=instance.pk).exists():
+        rebuild(user_ids=[instance.user_id])
+    elif completed:
+        _record_completed(instance)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_first_deposit_on_delete(sender, instance, origin=None, **kwargs):
+    # The user is being deleted with their transactions; their row goes with them
+    if isinstance(origin, CustomUser) or getattr(origin, 'model', None) is CustomUser:
+        return
+    if is_completed_deposit(instance):
+        rebuild(user_ids=[instance.user_id])
+
+
+# ---------------------------------------------------------------------------
+# Rebuild / verify
+# ---------------------------------------------------------------------------
+
+def compute(user_ids):
+    """First completed deposits for the given users, from the Transaction table (one query)"""
+    first = Transaction.objects.filter(
+        user_id=OuterRef('pk'),
+        transaction_type='deposit',
+        status='completed',
+    ).order_by('created_at', 'id')
+
+    rows = CustomUser.objects.filter(pk__in=user_ids).annotate(
+        first_id=Subquery(first.values('id')[:1]),
+        first_amount=Subquery(first.values('amount')[:1]),
+        first_at=Subquery(first.values('created_at')[:1]),
+    ).values_list('pk', 'first_id', 'first_amount', 'first_at')
+
+    return [
+        FirstDeposit(user_id=user_id, transaction_id=transaction_id, amount=amount, deposited_at=deposited_at)
+        for user_id, transaction_id, amount, deposited_at in rows
+    ]
+
+
+def _user_id_chunks(user_ids=None):
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        for i in range(0, len(user_ids), REBUILD_CHUNK_SIZE):
+            yield user_ids[i:i + REBUILD_CHUNK_SIZE]
+        return
+
+    last_id = 0
+    while True:
+        chunk = list(
+            CustomUser.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:REBUILD_CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def rebuild(user_ids=None):
+    """Recompute and upsert first deposits (all users when user_ids is None). Returns the row count."""
+    written = 0
+    for chunk in _user_id_chunks(user_ids):
+        rows = compute(chunk)
+        FirstDeposit.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['transaction', 'amount', 'deposited_at', 'updated_at'],
+        )
+        written += len(rows)
+    return written
+
+
+def verify(user_ids=None):
+    """
+    Compare stored first deposits with fresh ones.
+    Returns a list of (user_id, stored, expected) as (transaction_id, amount) pairs;
+    a missing row has stored None.
+    """
+    mismatches = []
+    for chunk in _user_id_chunks(user_ids):
+        stored = {
+            user_id: (transaction_id, amount)
+            for user_id, transaction_id, amount in FirstDeposit.objects.filter(
+                user_id__in=chunk
+            ).values_list('user_id', 'transaction_id', 'amount')
+        }
+        for row in compute(chunk):
+            expected = (row.transaction_id, row.amount)
+            if stored.get(row.user_id) != expected:
+                mismatches.append((row.user_id, stored.get(row.user_id), expected))
+    return mismatches
+
+
+def ensure(users):
+    """Build the rows missing for a user queryset (one query when none are missing)"""
+    missing = list(users.filter(first_deposit__isnull=True).values_list('pk', flat=True))
+    if missing:
+        rebuild(user_ids=missing)
+    return len(missing)
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def referrals(referrer):
+    """Users referred by referrer, each annotated with their first deposit (rows must exist, see ensure)"""
+    users = CustomUser.objects.filter(referred_by=referrer)
+    ensure(users)
+    return users.annotate(
+        first_deposit_amount=F('first_deposit__amount'),
+        first_deposit_at=F('first_deposit__deposited_at'),
+    )
+
+
+def referral_deposits(referrer):
+    """First deposits of the users referred by referrer, newest first"""
+    ensure(CustomUser.objects.filter(referred_by=referrer))
+    return FirstDeposit.objects.filter(
+        user__referred_by=referrer,
+        deposited_at__isnull=False,
+    ).order_by('-deposited_at')
+
+
+def totals(referrer):
+    """Referral count, referrals with a deposit and total bonus in one aggregate query"""
+    summary = FirstDeposit.objects.filter(user__referred_by=referrer).aggregate(
+        total_referrals=Count('user'),
+        deposited_referrals=Count('deposited_at'),
+        total_deposits=Sum('amount'),
+    )
+    total_deposits = summary.pop('total_deposits') or Decimal('0.00')
+    # Same precision as summing bonus() per referral
+    summary['total_bonus'] = bonus(total_deposits.quantize(Decimal('0.01')))
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Referral tree
+# ---------------------------------------------------------------------------
+#
+# ReferralClosure holds one row per (ancestor, descendant) pair, so a
+# downline is the range ancestor=user of the (ancestor, depth, descendant)
+# index. Registration adds the new user's rows explicitly (add_to_tree);
+# a later change of referred_by (admin) moves the user's subtree.
+
+class ReferralCycleError(ValueError):
+    pass
+
+
+def add_to_tree(user):
+    """Add the paths from every upline member to a newly registered user (two queries)"""
+    if not user.referred_by_id:
+        return 0
+    upline = ReferralClosure.objects.filter(descendant_id=user.referred_by_id).values_list('ancestor_id', 'depth')
+    paths = [ReferralClosure(ancestor_id=user.referred_by_id, descendant_id=user.pk, depth=1)]
+    paths += [
+        ReferralClosure(ancestor_id=ancestor_id, descendant_id=user.pk, depth=depth + 1)
+        for ancestor_id, depth in upline
+    ]
+    ReferralClosure.objects.bulk_create(paths, ignore_conflicts=True)
+    return len(paths)
+
+
+def move_in_tree(user):
+    """
+    Re-attach the user, with their whole downline, under their current referred_by.
+    Raises ReferralCycleError if the new referrer is in the user's own downline.
+    """
+    with transaction.atomic():
+        subtree = dict(
+            ReferralClosure.objects.filter(ancestor_id=user.pk).values_list('descendant_id', 'depth')
+        )
+        subtree[user.pk] = 0
+        if user.referred_by_id in subtree:
+            raise ReferralCycleError(f"User {user.referred_by_id} is in the downline of user {user.pk}")
+
+        # Paths from the old upline into the subtree
+        ReferralClosure.objects.filter(descendant_id__in=subtree).exclude(ancestor_id__in=subtree).delete()
+
+        if user.referred_by_id:
+            upline = [(user.referred_by_id, 0)] + list(
+                ReferralClosure.objects.filter(descendant_id=user.referred_by_id).values_list('ancestor_id', 'depth')
+            )
+            ReferralClosure.objects.bulk_create(
+                [
+                    ReferralClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + 1 + down)
+                    for ancestor_id, up in upline
+                    for descendant_id, down in subtree.items()
+                ],
+                batch_size=REBUILD_CHUNK_SIZE,
+            )
+    logger.info(f"Referral tree: user {user.pk} and {len(subtree) - 1} downline members moved under {user.referred_by_id}")
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_referrer(sender, instance, **kwargs):
+    instance._tree_referrer = instance.__dict__.get('referred_by_id', Ellipsis)
+
+
+@receiver(post_save, sender=CustomUser)
+def move_in_tree_on_save(sender, instance, created, update_fields=None, **kwargs):
+    # New users are added by the registration views
+    previous = getattr(instance, '_tree_referrer', Ellipsis)
+    instance._tree_referrer = instance.referred_by_id
+    if created or previous is Ellipsis or previous == instance.referred_by_id:
+        return
+    if update_fields is not None and 'referred_by' not in update_fields:
+        return
+    move_in_tree(instance)
+
+
+
+@receiver(pre_delete, sender=CustomUser)
+def detach_downline_on_delete(sender, instance, **kwargs):
+    # referred_by is SET_NULL: the user's referrals become roots, so their
+    # subtrees lose the paths from the user's upline (the user's own rows cascade)
+    upline = list(ReferralClosure.objects.filter(descendant_id=instance.pk).values_list('ancestor_id', flat=True))
+    if not upline:
+        return
+    ReferralClosure.objects.filter(
+        ancestor_id__in=upline,
+        descendant_id__in=ReferralClosure.objects.filter(ancestor_id=instance.pk).values('descendant_id'),
+    ).delete()
+
+def rebuild_tree():
+    """
+    Recompute the whole closure from referred_by, one INSERT ... SELECT per
+    level. Returns the number of paths written.
+    """
+    columns = [ReferralClosure._meta.get_field(field).column for field in ['ancestor', 'descendant', 'depth']]
+    written = depth = 0
+    with transaction.atomic():
+        ReferralClosure.objects.all()._raw_delete(ReferralClosure.objects.db)
+
+        level = CustomUser.objects.filter(referred_by__isnull=False).exclude(referred_by=F('pk')).annotate(
+            _t_depth=Value(1, output_field=IntegerField()),
+        ).values_list('referred_by_id', 'pk', '_t_depth')
+        while True:
+            connection = connections[level.db]
+            sql, params = level.query.sql_with_params()
+            with connection.cursor() as cursor:
+                # A pair can only come up twice through a referred_by cycle;
+                # skipping it ends the walk
+                cursor.execute(
+                    f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} "
+                    f"{connection.ops.quote_name(ReferralClosure._meta.db_table)} "
+                    f"({', '.join(connection.ops.quote_name(column) for column in columns)}) {sql} "
+                    + connection.ops.on_conflict_suffix_sql(None, OnConflict.IGNORE, None, None),
+                    params,
+                )
+                added = cursor.rowcount
+            if not added:
+                break
+            written += added
+            depth += 1
+
+            # Extend every path of the level just written by one referral
+            level = ReferralClosure.objects.filter(depth=depth).annotate(
+                _t_child=F('descendant__referrals'),
+                _t_depth=Value(depth + 1, output_field=IntegerField()),
+            ).filter(_t_child__isnull=False).exclude(
+                _t_child=F('ancestor_id'),
+            ).values_list('ancestor_id', '_t_child', '_t_depth')
+
+    logger.info(f"Referral tree rebuilt: {written} paths, {depth} levels")
+    return written
+
+
+def downline_levels(user, max_depth=None):
+    """
+    Members, depositing members and completed deposit volume per level of
+    the user's downline, in one grouped query.
+    Returns a list of {'level', 'members', 'depositors', 'deposit_volume'}.
+    """
+    paths = ReferralClosure.objects.filter(ancestor=user)
+    if max_depth is not None:
+        paths = paths.filter(depth__lte=max_depth)
+
+    missing = list(
+        paths.filter(descendant__account_summary__isnull=True).values_list('descendant_id', flat=True)
+    )
+    if missing:
+        account_summary_service.rebuild(user_ids=missing)
+
+    rows = paths.values('depth').annotate(
+        members=Count('descendant_id'),
+        depositors=Count('descendant_id', filter=Q(descendant__account_summary__deposits_count__gt=0)),
+        deposit_volume=Sum('descendant__account_summary__total_deposits'),
+    ).order_by('depth')
+    return [
+        {
+            'level': row['depth'],
+            'members': row['members'],
+            'depositors': row['depositors'],
+            'deposit_volume': (row['deposit_volume'] or Decimal('0.00')).quantize(Decimal('0.01')),
+        }
+        for row in rows
+    ]
+
+
+def downline_members(user, level=None):
+    """Paths from the user to their downline members (or to one level of it)"""
+    paths = ReferralClosure.objects.filter(ancestor=user)
+    if level is not None:
+        paths = paths.filter(depth=level)
+    return paths
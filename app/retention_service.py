@@ -0,0 +1,153 @@
+"""
+Retention service for Citadel Markets Pro
+Purges read notifications past their per-type retention in small chunks, optionally archiving them first
+"""
+
+from datetime import timedelta
+import gzip
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from . import sync_service
+from .models import Notification
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# How long read notifications of each type are kept (days); None keeps them
+# forever. Unread notifications are never purged.
+# Override with NOTIFICATION_RETENTION_DAYS in settings.
+DEFAULT_RETENTION_DAYS = {
+    'news': 30,
+    'system': 90,
+    'alert': 90,
+    'trade': 365,
+    'deposit': 365,
+    'withdrawal': 365,
+}
+
+# Rows deleted per statement. Each chunk is its own short transaction, so
+# locks are held on at most this many rows at a time.
+CHUNK_SIZE = 2000
+
+ARCHIVE_FIELDS = [
+    'id', 'user_id', 'type', 'title', 'message', 'full_details',
+    'metadata', 'read', 'created_at', 'updated_at',
+]
+
+
+def retention_days():
+    return {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {})}
+
+
+def expired(type, days, now=None):
+    """Read notifications of one type older than days, as a queryset"""
+    now = now or timezone.now()
+    return Notification.objects.filter(
+        type=type,
+        read=True,
+        created_at__lt=now - timedelta(days=days),
+    )
+
+
+class Archive:
+    """Appends notification rows as gzipped NDJSON, one file per purge run"""
+
+    def __init__(self, directory, now=None):
+        os.makedirs(directory, exist_ok=True)
+        stamp = (now or timezone.now()).strftime('%Y%m%dT%H%M%SZ')
+        self.path = os.path.join(directory, f"notifications-{stamp}.ndjson.gz")
+        self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        self.rows = 0
+
+    def write(self, rows):
+        """Write rows and flush them to disk, so nothing is deleted before it is archived"""
+        self._file.writelines(
+            json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for row in rows
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.rows += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+def _purge_type(queryset, chunk_size, archive, pause, dry_run):
+    """Walk one type's expired rows in primary key order. Returns the rows deleted (or due)."""
+    deleted = 0
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        last_id = ids[-1]
+
+        if dry_run:
+            deleted += len(ids)
+            continue
+
+        with transaction.atomic():
+            # Re-check read under the delete so a row marked unread meanwhile
+            # survives; read rows never count towards NotificationCounter
+            chunk = Notification.objects.filter(pk__in=ids, read=True)
+            if archive is not None:
+                archive.write(list(chunk.values(*ARCHIVE_FIELDS)))
+            sync_service.record_queryset(chunk, deleted=True)
+            # No signals or cascade collection: nothing references a
+            # Notification, deleting read rows leaves counters unchanged
+            # and the sync deletion markers are recorded just above
+            deleted += chunk._raw_delete(chunk.db)
+
+        if pause:
+            time.sleep(pause)
+
+
+def purge(types=None, chunk_size=CHUNK_SIZE, archive_dir=None, pause=0, dry_run=False, now=None):
+    """
+    Delete read notifications past their type's retention.
+
+    Args:
+        types: limit to these notification types (default: every type with a retention)
+        chunk_size: rows deleted per transaction
+        archive_dir: if set, rows are written to a gzipped NDJSON file there before deletion
+        pause: seconds to sleep between chunks, to leave room for other writers
+        dry_run: only count the rows that would be deleted
+
+    Returns: dict of type -> {'deleted', 'seconds', 'per_second'} and the
+    archive path (or None).
+    """
+    now = now or timezone.now()
+    archive = Archive(archive_dir, now) if archive_dir and not dry_run else None
+    report = {}
+
+    try:
+        for type, days in retention_days().items():
+            if days is None or (types and type not in types):
+                continue
+
+            started = time.perf_counter()
+            deleted = _purge_type(expired(type, days, now), chunk_size, archive, pause, dry_run)
+            seconds = time.perf_counter() - started
+            report[type] = {
+                'deleted': deleted,
+                'seconds': seconds,
+                'per_second': deleted / seconds if seconds else 0.0,
+            }
+    finally:
+        if archive is not None:
+            archive.close()
+
+    total = sum(row['deleted'] for row in report.values())
+    if not dry_run:
+        logger.info(f"Notification purge: {total} read notifications deleted")
+    return report, archive.path if archive is not None else None
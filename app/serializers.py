@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from . import valuation_service
 from .models import (
     Ticket, 
     Transaction, 
@@ -11,6 +12,8 @@ from .models import (
     WalletConnection,
     Signal, UserSignalPurchase,
     TradeHistory,
+    StockOrder,
+    PriceAlert,
     UserTraderCopy,
     UserCopyTraderHistory,
 )
@@ -261,7 +264,7 @@ class TraderDetailSerializer(serializers.ModelSerializer):
             # Wins and Losses
             'total_wins', 'total_losses',
             # Complex data
-            'performance_data', 'monthly_performance', 'frequently_traded',
+            'frequently_traded',
             # Related
             'portfolios',
             # Metadata
@@ -402,26 +405,34 @@ class UserStockPositionSerializer(serializers.ModelSerializer):
             'profit_loss_percent',
             'use_admin_profit',  # Add this
             'admin_profit_loss',  # Add this
+            'stop_loss',
+            'take_profit',
             'opened_at',
             'is_active'
         ]
     
+    def _valuation(self, obj):
+        """
+        Valuation from the vectorized engine. List views pass the whole page's
+        valuations in context['valuations']; single objects are valued on demand.
+        """
+        valuations = self.context.get('valuations')
+        if valuations is None or obj.id not in valuations:
+            valuations = valuation_service.value_positions([obj])
+            self.context['valuations'] = {**self.context.get('valuations', {}), **valuations}
+        return valuations[obj.id]
+    
     def get_current_value(self, obj):
         """Return current value - either based on admin P/L or calculated"""
-        if obj.use_admin_profit:
-            # Use admin-set profit to calculate current value
-            return str(obj.total_invested + obj.admin_profit_loss)
-        else:
-            # Calculate based on current stock price
-            return str(obj.current_value)
+        return f"{self._valuation(obj).value:.2f}"
     
     def get_profit_loss(self, obj):
         """Return profit/loss - either admin-set or calculated"""
-        return str(obj.profit_loss)  # This property already handles the logic
+        return f"{self._valuation(obj).profit_loss:.2f}"
     
     def get_profit_loss_percent(self, obj):
         """Return profit/loss percentage - either admin-set or calculated"""
-        return str(obj.profit_loss_percent)  # This property already handles the logic
+        return f"{self._valuation(obj).profit_loss_percent:.2f}"
 
 
 class TradeHistorySerializer(serializers.ModelSerializer):
@@ -456,6 +467,56 @@ class TradeHistorySerializer(serializers.ModelSerializer):
         return None
 
 
+class StockOrderSerializer(serializers.ModelSerializer):
+    stock = StockBasicSerializer(read_only=True)
+    side_display = serializers.CharField(source='get_side_display', read_only=True)
+    order_type_display = serializers.CharField(source='get_order_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = StockOrder
+        fields = [
+            'id',
+            'stock',
+            'side',
+            'side_display',
+            'order_type',
+            'order_type_display',
+            'shares',
+            'trigger_price',
+            'status',
+            'status_display',
+            'status_reason',
+            'fill_price',
+            'trade_reference',
+            'reference',
+            'created_at',
+            'filled_at',
+        ]
+
+
+class PriceAlertSerializer(serializers.ModelSerializer):
+    stock = StockBasicSerializer(read_only=True)
+    direction_display = serializers.CharField(source='get_direction_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = PriceAlert
+        fields = [
+            'id',
+            'stock',
+            'direction',
+            'direction_display',
+            'target_price',
+            'note',
+            'status',
+            'status_display',
+            'triggered_price',
+            'triggered_at',
+            'created_at',
+        ]
+
+
 
 class WalletConnectionSerializer(serializers.ModelSerializer):
     """Serializer for WalletConnection model"""
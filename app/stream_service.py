@@ -0,0 +1,311 @@
+"""
+Stream service for Citadel Markets Pro
+In-process pub/sub hub that fans quote and notification events out to streaming clients
+"""
+
+import asyncio
+from collections import OrderedDict, defaultdict, deque
+from datetime import timedelta
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Notification, Stock
+from .serializers import NotificationSerializer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+QUOTES = 'quotes'
+NOTIFICATIONS = 'notifications'
+TOPICS = (QUOTES, NOTIFICATIONS)
+
+# Notification frames a client may have queued before it is told to resync
+EVENT_BACKLOG = getattr(settings, 'STREAM_EVENT_BACKLOG', 100)
+
+# How often the hub polls the DB for rows written by other processes
+# (management commands, other workers); in-process writes publish directly
+POLL_SECONDS = getattr(settings, 'STREAM_POLL_SECONDS', 2.0)
+POLL_LOOKBACK = timedelta(seconds=10)
+
+HEARTBEAT_SECONDS = 15
+HEARTBEAT = b": keepalive\n\n"
+
+# Notification ids already published, so direct publishes and the poller
+# never deliver the same row twice
+_RECENT_IDS_LIMIT = 10000
+
+
+def sse_frame(event, data, event_id=None):
+    """Encode one server-sent event. Done once per event, not per client."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class Subscriber:
+    """
+    One connected client.
+
+    Quotes are conflated per symbol, so a slow reader only ever holds the
+    latest quote of each symbol however fast prices move. Notifications sit
+    in a bounded backlog; a client that lets it overflow gets a "resync"
+    event and should refetch notification_list.
+    """
+
+    def __init__(self, loop, user_id, topics=TOPICS, symbols=None, backlog=EVENT_BACKLOG):
+        self.loop = loop
+        self.user_id = user_id
+        self.topics = frozenset(topics)
+        self.symbols = frozenset(symbols) if symbols else None
+        self._backlog = backlog
+        self._quotes = {}
+        self._events = deque()
+        self._overflowed = False
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def wants_quote(self, symbol):
+        return QUOTES in self.topics and (self.symbols is None or symbol in self.symbols)
+
+    def push_quote(self, key, frame):
+        with self._lock:
+            self._quotes[key] = frame
+        self._wake()
+
+    def push_event(self, frame):
+        with self._lock:
+            if len(self._events) >= self._backlog:
+                self._events.clear()
+                self._overflowed = True
+            else:
+                self._events.append(frame)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # Event loop already closed: the client is gone
+            pass
+
+    async def next_frames(self, timeout):
+        """
+        Wait for pending frames. Returns None when nothing arrived within
+        timeout, otherwise the frames (possibly empty after a spurious wake).
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+
+        with self._lock:
+            frames = list(self._events)
+            frames.extend(self._quotes.values())
+            overflowed = self._overflowed
+            self._events.clear()
+            self._quotes.clear()
+            self._overflowed = False
+
+        if overflowed:
+            frames.insert(0, sse_frame('resync', {'topic': NOTIFICATIONS}))
+        return frames
+
+
+class Hub:
+    """Routes published frames to subscribers; safe to publish from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quote_subscribers = set()
+        self._user_subscribers = defaultdict(set)
+        self._recent_ids = OrderedDict()
+        self._poller = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._quote_subscribers.union(*self._user_subscribers.values()))
+
+    def has_subscribers(self, topic=None):
+        if topic == QUOTES:
+            return bool(self._quote_subscribers)
+        if topic == NOTIFICATIONS:
+            return bool(self._user_subscribers)
+        return bool(self._quote_subscribers or self._user_subscribers)
+
+    def subscribed_user_ids(self):
+        """Users with at least one notification stream open in this process"""
+        with self._lock:
+            return set(self._user_subscribers)
+
+    def subscribe(self, subscriber):
+        with self._lock:
+            if QUOTES in subscriber.topics:
+                self._quote_subscribers.add(subscriber)
+            if NOTIFICATIONS in subscriber.topics:
+                self._user_subscribers[subscriber.user_id].add(subscriber)
+            if self._poller is None or self._poller.done():
+                self._poller = subscriber.loop.create_task(self._poll())
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._quote_subscribers.discard(subscriber)
+            subscribers = self._user_subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._user_subscribers[subscriber.user_id]
+
+    def publish_quotes(self, kind, quotes):
+        """
+        Args:
+            kind: "stock" or "asset"
+            quotes: list of payload dicts, each with a "symbol"
+        """
+        with self._lock:
+            subscribers = list(self._quote_subscribers)
+        if not subscribers:
+            return
+
+        for quote in quotes:
+            key = f"{kind}:{quote['symbol']}"
+            frame = sse_frame('quote', {'kind': kind, **quote})
+            for subscriber in subscribers:
+                if subscriber.wants_quote(quote['symbol']):
+                    subscriber.push_quote(key, frame)
+
+    def publish_notifications(self, payloads):
+        """
+        Args:
+            payloads: list of (user_id, serialized notification) pairs
+        """
+        for user_id, payload in payloads:
+            with self._lock:
+                if payload['id'] in self._recent_ids:
+                    continue
+                self._recent_ids[payload['id']] = None
+                if len(self._recent_ids) > _RECENT_IDS_LIMIT:
+                    self._recent_ids.popitem(last=False)
+                subscribers = list(self._user_subscribers.get(user_id, ()))
+
+            if subscribers:
+                frame = sse_frame('notification', payload, event_id=payload['id'])
+                for subscriber in subscribers:
+                    subscriber.push_event(frame)
+
+    async def _poll(self):
+        """
+        Pick up Stock and Notification rows written by other processes. One
+        query per table per interval for the whole worker, however many
+        clients are connected; stops when the last client leaves.
+        """
+        since = timezone.now()
+        while True:
+            await asyncio.sleep(POLL_SECONDS)
+            with self._lock:
+                if not (self._quote_subscribers or self._user_subscribers):
+                    self._poller = None
+                    return
+            try:
+                since = await sync_to_async(self._poll_once)(since)
+            except Exception as e:
+                logger.error(f"Stream poll failed: {e}")
+
+    def _poll_once(self, since):
+        now = timezone.now()
+        window_start = since - POLL_LOOKBACK
+
+        if self.has_subscribers(QUOTES):
+            stocks = Stock.objects.filter(updated_at__gt=window_start, is_active=True)
+            self.publish_quotes('stock', [stock_quote(stock) for stock in stocks])
+
+        if self.has_subscribers(NOTIFICATIONS):
+            with self._lock:
+                user_ids = list(self._user_subscribers)
+            notifications = Notification.objects.filter(
+                created_at__gt=window_start,
+                user_id__in=user_ids,
+            ).order_by('id')
+            self.publish_notifications(_notification_payloads(notifications))
+
+        return now
+
+
+hub = Hub()
+
+
+# ---------------------------------------------------------------------------
+# Publishing from the write paths
+# ---------------------------------------------------------------------------
+
+def stock_quote(stock):
+    return {
+        'symbol': stock.symbol,
+        'price': str(stock.price),
+        'change': str(stock.change),
+        'change_percent': str(stock.change_percent),
+        'volume': stock.volume,
+    }
+
+
+def asset_quote(asset):
+    return {
+        'symbol': asset.symbol,
+        'bid': str(asset.bid),
+        'ask': str(asset.ask),
+        'low': str(asset.low),
+        'high': str(asset.high),
+        'change': asset.change,
+    }
+
+
+def _notification_payloads(notifications):
+    return [
+        (notification.user_id, NotificationSerializer(notification).data)
+        for notification in notifications
+    ]
+
+
+def publish_stocks(stocks):
+    if hub.has_subscribers(QUOTES):
+        hub.publish_quotes('stock', [stock_quote(stock) for stock in stocks])
+
+
+def publish_assets(assets):
+    if hub.has_subscribers(QUOTES):
+        hub.publish_quotes('asset', [asset_quote(asset) for asset in assets])
+
+
+def publish_notifications(notifications):
+    """
+    Publish Notification rows once their transaction commits. Called for
+    rows written with bulk_create, where post_save does not fire.
+    """
+    if not hub.has_subscribers(NOTIFICATIONS):
+        return
+    notifications = [n for n in notifications if n.pk is not None]
+    transaction.on_commit(lambda: hub.publish_notifications(_notification_payloads(notifications)))
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification_on_create(sender, instance, created, **kwargs):
+    if created:
+        publish_notifications([instance])
+
+
+@receiver(post_save, sender=Stock)
+def publish_stock_on_save(sender, instance, **kwargs):
+    if instance.is_active and hub.has_subscribers(QUOTES):
+        quote = stock_quote(instance)
+        transaction.on_commit(lambda: hub.publish_quotes('stock', [quote]))
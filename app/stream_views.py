@@ -0,0 +1,108 @@
+"""
+Streaming Views (server-sent events)
+Async views served by the ASGI application (citadel/asgi.py)
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.authtoken.models import Token
+
+from . import notification_service, stream_service
+from .auth_credentials import authenticate_cached, remember
+from .stream_service import HEARTBEAT, HEARTBEAT_SECONDS, NOTIFICATIONS, QUOTES, TOPICS
+
+
+async def _authenticate(request):
+    """
+    Resolve the user from the same token the REST API uses. EventSource
+    cannot set headers, so the token may also come from ?token= or the
+    authToken cookie.
+    """
+    header = request.headers.get("Authorization", "")
+    key = None
+    if header.startswith("Token "):
+        key = header[len("Token "):].strip()
+    key = key or request.GET.get("token") or request.COOKIES.get("authToken")
+    if not key:
+        return None
+
+    cached = authenticate_cached(key)
+    if cached is not None:
+        return cached[0]
+
+    token = await Token.objects.select_related("user").filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    remember(token)
+    return token.user
+
+
+async def _event_stream(subscriber, hello):
+    # Subscribe only once the response is being sent, so the finally below
+    # always runs for a registered subscriber
+    stream_service.hub.subscribe(subscriber)
+    try:
+        yield hello
+        while True:
+            frames = await subscriber.next_frames(HEARTBEAT_SECONDS)
+            if frames is None:
+                yield HEARTBEAT
+            elif frames:
+                yield b"".join(frames)
+    finally:
+        stream_service.hub.unsubscribe(subscriber)
+
+
+@require_GET
+async def event_stream(request):
+    """
+    GET: Server-sent event stream of quotes and notifications
+    Query params:
+    - topics: comma separated, quotes and/or notifications (default: both)
+    - symbols: comma separated symbols to limit quote events to (optional)
+    - token: auth token, when the client cannot send an Authorization header
+
+    Events:
+    - hello: sent on connect, with the topics and current unread_count
+    - quote: {kind: stock|asset, symbol, ...} latest quote, conflated per symbol
+    - notification: a new Notification, serialized as in notification_list
+    - resync: the client fell too far behind; refetch notification_list
+    """
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse(
+            {"success": False, "error": "Authentication credentials were not provided or are invalid"},
+            status=401,
+        )
+
+    topics = [t for t in request.GET.get("topics", ",".join(TOPICS)).split(",") if t in TOPICS]
+    if not topics:
+        return JsonResponse(
+            {"success": False, "error": f"topics must include one of {', '.join(TOPICS)}"},
+            status=400,
+        )
+    symbols = [s.strip().upper() for s in request.GET.get("symbols", "").split(",") if s.strip()]
+
+    hello = {"topics": topics}
+    if NOTIFICATIONS in topics:
+        hello["unread_count"] = await sync_to_async(notification_service.unread_count)(user)
+    if QUOTES in topics and symbols:
+        hello["symbols"] = symbols
+
+    subscriber = stream_service.Subscriber(
+        asyncio.get_running_loop(),
+        user.pk,
+        topics=topics,
+        symbols=symbols,
+    )
+
+    response = StreamingHttpResponse(
+        _event_stream(subscriber, stream_service.sse_frame("hello", hello)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,356 @@
+"""
+Sync service for Citadel Markets Pro
+Versions every change to a user's synced records so the client app can fetch only what changed
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import BooleanField, CharField, DateTimeField, F, Max, OuterRef, Subquery, Value
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import valuation_service
+from .models import (
+    CustomUser,
+    Notification,
+    SyncChange,
+    SyncState,
+    TradeHistory,
+    Transaction,
+    UserCopyTraderHistory,
+    UserStockPosition,
+)
+from .serializers import (
+    NotificationSerializer,
+    TradeHistorySerializer,
+    TransactionSerializer,
+    UserCopyTraderHistorySerializer,
+    UserStockPositionSerializer,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Name in the sync payload -> model. Every synced model has a `user` FK.
+SYNCED = {
+    'transactions': Transaction,
+    'positions': UserStockPosition,
+    'trades': TradeHistory,
+    'notifications': Notification,
+    'copy_trades': UserCopyTraderHistory,
+}
+MODEL_NAMES = {model: name for name, model in SYNCED.items()}
+
+# The user's own balance fields sync as one record, keyed by the user id
+BALANCE = 'balance'
+BALANCE_FIELDS = ['balance', 'profit']
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+
+# Deleted-record markers are kept this long; a client that has not synced
+# for longer gets a full snapshot instead of a delta
+TOMBSTONE_DAYS = getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30)
+PRUNE_CHUNK_SIZE = 5000
+
+_UNIQUE = ['user_id', 'model', 'object_id']
+_UPDATE = ['version', 'deleted', 'changed_at']
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+#
+# A user is tracked once their first sync creates their SyncState. Each
+# recording call bumps the version of every tracked user it touches by one
+# and upserts one SyncChange per record at that version. The bump holds the
+# SyncState row lock until the caller's transaction commits, so a user's
+# versions become visible in order. Untracked users cost one UPDATE that
+# matches nothing.
+
+def record_rows(name, rows, deleted=False):
+    """
+    Record changes to synced records.
+
+    Args:
+        name: key of SYNCED, or BALANCE
+        rows: iterable of (user_id, object_id)
+
+    Returns: the number of changes recorded (untracked users are skipped)
+    """
+    return _record({(user_id, name, object_id) for user_id, object_id in rows}, deleted)
+
+
+def record(instances, deleted=False):
+    """Record changes to instances of synced models, of any mix of models"""
+    return _record({
+        (instance.user_id, MODEL_NAMES[type(instance)], instance.pk)
+        for instance in instances
+        if instance.pk is not None
+    }, deleted)
+
+
+def record_balance(user_ids):
+    return record_rows(BALANCE, ((user_id, user_id) for user_id in user_ids))
+
+
+def _record(keys, deleted):
+    if not keys:
+        return 0
+
+    with transaction.atomic():
+        states = SyncState.objects.filter(user_id__in={user_id for user_id, _, _ in keys})
+        if not states.update(version=F('version') + 1):
+            return 0
+        versions = dict(states.values_list('user_id', 'version'))
+
+        now = timezone.now()
+        changes = [
+            SyncChange(
+                user_id=user_id,
+                model=name,
+                object_id=object_id,
+                version=versions[user_id],
+                deleted=deleted,
+                changed_at=now,
+            )
+            for user_id, name, object_id in keys
+            if user_id in versions
+        ]
+        SyncChange.objects.bulk_create(
+            changes,
+            update_conflicts=True,
+            unique_fields=['user', 'model', 'object_id'],
+            update_fields=_UPDATE,
+        )
+    return len(changes)
+
+
+def record_queryset(queryset, deleted=False):
+    """
+    Record a change to every row of a synced model's queryset with one
+    UPDATE of the tracked users' versions and one INSERT ... SELECT of the
+    change rows, for writes that fan out to many users. Returns the number
+    of changes recorded.
+    """
+    name = MODEL_NAMES[queryset.model]
+    with transaction.atomic():
+        bumped = SyncState.objects.filter(user_id__in=queryset.order_by().values('user_id')).update(
+            version=F('version') + 1
+        )
+        if not bumped:
+            return 0
+
+        rows = queryset.filter(user__sync_state__isnull=False).order_by().annotate(
+            _s_model=Value(name, output_field=CharField()),
+            _s_version=F('user__sync_state__version'),
+            _s_deleted=Value(deleted, output_field=BooleanField()),
+            _s_changed_at=Value(timezone.now(), output_field=DateTimeField()),
+        ).values_list('user_id', '_s_model', 'id', '_s_version', '_s_deleted', '_s_changed_at')
+
+        connection = connections[rows.db]
+        columns = [
+            SyncChange._meta.get_field(field).column
+            for field in ['user', 'model', 'object_id', 'version', 'deleted', 'changed_at']
+        ]
+        sql, params = rows.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {connection.ops.quote_name(SyncChange._meta.db_table)} "
+                f"({', '.join(connection.ops.quote_name(column) for column in columns)}) {sql} "
+                + connection.ops.on_conflict_suffix_sql(None, OnConflict.UPDATE, _UPDATE, _UNIQUE),
+                params,
+            )
+            return cursor.rowcount
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=UserStockPosition)
+@receiver(post_save, sender=TradeHistory)
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=UserCopyTraderHistory)
+def record_on_save(sender, instance, **kwargs):
+    record([instance])
+
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=UserStockPosition)
+@receiver(post_delete, sender=TradeHistory)
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=UserCopyTraderHistory)
+def record_on_delete(sender, instance, **kwargs):
+    record([instance], deleted=True)
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_balance(sender, instance, **kwargs):
+    values = instance.__dict__
+    if all(field in values for field in BALANCE_FIELDS):
+        instance._sync_balance = tuple(values[field] for field in BALANCE_FIELDS)
+    else:
+        instance._sync_balance = None
+
+
+@receiver(post_save, sender=CustomUser)
+def record_balance_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(BALANCE_FIELDS):
+        return
+    balance = tuple(getattr(instance, field) for field in BALANCE_FIELDS)
+    if balance != getattr(instance, '_sync_balance', None):
+        record_balance([instance.pk])
+        instance._sync_balance = balance
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _serialize(name, queryset):
+    """Serialize rows of the synced model called name"""
+    if name == 'transactions':
+        return TransactionSerializer(queryset.select_related('user'), many=True).data
+    if name == 'positions':
+        positions = list(queryset.select_related('stock'))
+        valuations = valuation_service.value_positions(positions)
+        return UserStockPositionSerializer(positions, many=True, context={'valuations': valuations}).data
+    if name == 'trades':
+        return TradeHistorySerializer(queryset.select_related('stock'), many=True).data
+    if name == 'notifications':
+        return NotificationSerializer(queryset, many=True).data
+    if name == 'copy_trades':
+        return UserCopyTraderHistorySerializer(queryset.select_related('trader'), many=True).data
+    raise KeyError(name)
+
+
+def _balance(user):
+    # Strings, as the serializers render decimals
+    values = CustomUser.objects.filter(pk=user.pk).values_list(*BALANCE_FIELDS).first()
+    return {field: str(value) for field, value in zip(BALANCE_FIELDS, values)}
+
+
+def snapshot(user):
+    """
+    Every synced record of the user, and the version it reflects. Starts
+    tracking the user if this is their first sync.
+    """
+    with transaction.atomic():
+        state, created = SyncState.objects.select_for_update().get_or_create(user_id=user.pk)
+        changes = {
+            name: {
+                'upserted': _serialize(name, model.objects.filter(user_id=user.pk).order_by('id')),
+                'deleted': [],
+            }
+            for name, model in SYNCED.items()
+        }
+        changes[BALANCE] = _balance(user)
+
+    if created:
+        logger.info(f"Sync tracking started for user {user.pk}")
+    return {
+        'version': state.version,
+        'full': True,
+        'has_more': False,
+        'changes': changes,
+    }
+
+
+def changes_since(user, since, limit=PAGE_SIZE):
+    """
+    What changed for the user after version `since`, as
+    {version, full, has_more, changes}. Pass `version` back as `since` on the
+    next call; while has_more is true, call again straight away.
+
+    Falls back to a full snapshot (full=True) when the user is not tracked
+    yet, since is 0, or since is unknown or older than pruned deletions.
+    Returns at most `limit` changes plus the rest of the last version, so a
+    version is never split across pages.
+    """
+    state = SyncState.objects.filter(user_id=user.pk).values_list('version', 'pruned_version').first()
+    if state is None or not since or since > state[0] or since < state[1]:
+        return snapshot(user)
+
+    rows = (
+        SyncChange.objects.filter(user_id=user.pk, version__gt=since)
+        .order_by('version', 'id')
+        .values_list('id', 'model', 'object_id', 'version', 'deleted')
+    )
+    page = list(rows[:limit + 1])
+    has_more = len(page) > limit
+    if has_more:
+        page = page[:limit]
+        last_id, _, _, last_version, _ = page[-1]
+        page += rows.filter(version=last_version, id__gt=last_id)
+        has_more = rows.filter(version__gt=last_version).exists()
+        version = last_version
+    else:
+        # Everything up to the version read first was committed before the
+        # changes were read, including markers that have since been pruned
+        version = max(state[0], page[-1][3]) if page else state[0]
+
+    upserted, deleted = defaultdict(list), defaultdict(list)
+    for _, name, object_id, _, is_deleted in page:
+        (deleted if is_deleted else upserted)[name].append(object_id)
+
+    changes = {}
+    for name in SYNCED:
+        if upserted[name] or deleted[name]:
+            changes[name] = {
+                'upserted': _serialize(name, SYNCED[name].objects.filter(
+                    user_id=user.pk, id__in=upserted[name]
+                ).order_by('id')) if upserted[name] else [],
+                'deleted': deleted[name],
+            }
+    if upserted[BALANCE]:
+        changes[BALANCE] = _balance(user)
+
+    return {
+        'version': version,
+        'full': False,
+        'has_more': has_more,
+        'changes': changes,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Pruning
+# ---------------------------------------------------------------------------
+
+def prune(days=TOMBSTONE_DAYS, now=None):
+    """
+    Delete deletion markers older than `days`. Each affected user's
+    pruned_version is raised first, so their older cursors take a full
+    snapshot rather than miss a deletion. Returns the number of markers deleted.
+    """
+    now = now or timezone.now()
+    expired = SyncChange.objects.filter(deleted=True, changed_at__lt=now - timedelta(days=days))
+
+    newest = (
+        expired.filter(user_id=OuterRef('user_id'))
+        .order_by()
+        .values('user_id')
+        .annotate(newest=Max('version'))
+        .values('newest')
+    )
+    SyncState.objects.filter(user_id__in=expired.values('user_id')).update(
+        pruned_version=Greatest(F('pruned_version'), Subquery(newest))
+    )
+
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('id').values_list('id', flat=True)[:PRUNE_CHUNK_SIZE])
+        if not ids:
+            break
+        chunk = SyncChange.objects.filter(pk__in=ids)
+        deleted += chunk._raw_delete(chunk.db)
+
+    logger.info(f"Sync prune: {deleted} deletion markers older than {days}d removed")
+    return deleted
@@ -0,0 +1,324 @@
+"""
+Trader stats service for Citadel Markets Pro
+Keeps each trader's win/loss totals and monthly buckets in step with closed copy trades
+"""
+
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import leaderboard_service, performance_service
+from .models import Trader, TraderMonthlyStats, TraderStats, UserCopyTraderHistory
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+STATS_FIELDS = [
+    'closed_trades',
+    'wins',
+    'losses',
+    'win_profit',
+    'win_amount',
+    'loss_profit',
+    'loss_amount',
+]
+MONTH_FIELDS = ['closed_trades', 'wins', 'losses', 'profit', 'amount']
+
+# History rows read per query by rebuild/verify
+REBUILD_CHUNK_SIZE = 5000
+
+_TRACKED_FIELDS = ('trader_id', 'status', 'profit_loss', 'amount', 'closed_at')
+
+
+# ---------------------------------------------------------------------------
+# Contributions: what one copy trade adds to its trader's stats
+# ---------------------------------------------------------------------------
+
+def month_of(moment):
+    """First day of the (UTC) month a trade closed in"""
+    return moment.astimezone(dt_timezone.utc).date().replace(day=1)
+
+
+def _contribution(state):
+    """(totals delta, month, month delta) of one trade; closed trades only"""
+    if state is None or state['status'] != 'closed':
+        return {}, None, {}
+
+    profit, amount = state['profit_loss'], state['amount']
+    totals = {'closed_trades': 1}
+    month = {'closed_trades': 1, 'profit': profit, 'amount': amount}
+    if profit > 0:
+        totals.update(wins=1, win_profit=profit, win_amount=amount)
+        month['wins'] = 1
+    elif profit < 0:
+        totals.update(losses=1, loss_profit=profit, loss_amount=amount)
+        month['losses'] = 1
+
+    closed_at = state['closed_at']
+    return totals, month_of(closed_at) if closed_at else None, month if closed_at else {}
+
+
+def _snapshot(instance):
+    """Current tracked values, or None if any of them is deferred"""
+    values = instance.__dict__
+    if any(name not in values for name in _TRACKED_FIELDS):
+        return None
+    return {name: values[name] for name in _TRACKED_FIELDS}
+
+
+def _add(deltas, state, sign=1):
+    totals, month, month_delta = _contribution(state)
+    if not totals:
+        return
+    trader_id = state['trader_id']
+    for key, delta in (((trader_id, None), totals), ((trader_id, month), month_delta)):
+        for name, value in delta.items():
+            deltas[key][name] = deltas[key].get(name, 0) + sign * value
+
+
+# ---------------------------------------------------------------------------
+# Applying deltas
+# ---------------------------------------------------------------------------
+
+def apply_deltas(deltas):
+    """
+    Add deltas to the stored stats with one UPDATE per trader and month.
+    A trader without a stats row is built from the history instead, which
+    already includes the write being applied.
+
+    Args:
+        deltas: dict of (trader_id, month) -> {field: amount}; month None
+            holds the trader's totals
+    """
+    now = timezone.now()
+    rebuilt = set()
+    months = defaultdict(set)
+    changed = False
+    # Totals first, so a trader rebuilt from history skips its month deltas
+    for (trader_id, month), delta in sorted(deltas.items(), key=lambda item: item[0][1] is not None):
+        changes = {name: F(name) + value for name, value in delta.items() if value}
+        if not changes or trader_id in rebuilt:
+            continue
+        changed = True
+
+        if month is None:
+            if not TraderStats.objects.filter(trader_id=trader_id).update(updated_at=now, **changes):
+                rebuild(trader_ids=[trader_id])
+                rebuilt.add(trader_id)
+            continue
+
+        bucket, _ = TraderMonthlyStats.objects.get_or_create(trader_id=trader_id, month=month)
+        TraderMonthlyStats.objects.filter(pk=bucket.pk).update(**changes)
+        if delta.get('closed_trades', 0) < 0:
+            # Last trade of the month gone: drop the bucket, as a rebuild would
+            TraderMonthlyStats.objects.filter(pk=bucket.pk, closed_trades=0).delete()
+        months[trader_id].add(month)
+
+    for trader_id, changed_months in months.items():
+        performance_service.publish_history([trader_id], changed_months)
+
+    if changed:
+        transaction.on_commit(leaderboard_service.invalidate)
+
+
+@receiver(post_init, sender=UserCopyTraderHistory)
+def remember_stats_state(sender, instance, **kwargs):
+    instance._stats_state = _snapshot(instance)
+
+
+@receiver(post_save, sender=UserCopyTraderHistory)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    old_state = None if created else getattr(instance, '_stats_state', None)
+    new_state = _snapshot(instance)
+
+    if new_state is None or (old_state is None and not created):
+        # Partial instance: the delta cannot be trusted, rebuild this trader
+        transaction.on_commit(lambda: rebuild(trader_ids=[instance.trader_id]))
+        return
+
+    deltas = defaultdict(dict)
+    if old_state is not None:
+        _add(deltas, old_state, sign=-1)
+    _add(deltas, new_state)
+    apply_deltas(deltas)
+
+    instance._stats_state = new_state
+
+
+@receiver(post_delete, sender=UserCopyTraderHistory)
+def update_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # The trader is being deleted with their history; their stats go with them
+    if isinstance(origin, Trader) or getattr(origin, 'model', None) is Trader:
+        return
+    state = getattr(instance, '_stats_state', None)
+    if state is None:
+        return
+
+    deltas = defaultdict(dict)
+    _add(deltas, state, sign=-1)
+    apply_deltas(deltas)
+
+
+# ---------------------------------------------------------------------------
+# Rebuild / verify / read
+# ---------------------------------------------------------------------------
+
+def _history_chunks(trader_ids=None):
+    """Closed copy trades in primary key order, REBUILD_CHUNK_SIZE rows per query"""
+    history = UserCopyTraderHistory.objects.filter(status='closed')
+    if trader_ids is not None:
+        history = history.filter(trader_id__in=trader_ids)
+
+    last_id = 0
+    while True:
+        chunk = list(
+            history.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', *_TRACKED_FIELDS)[:REBUILD_CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        yield [dict(zip(_TRACKED_FIELDS, row[1:])) for row in chunk]
+        last_id = chunk[-1][0]
+
+
+def compute(trader_ids=None):
+    """
+    Stats from the history table, streamed in chunks so memory stays
+    bounded by traders x months rather than by history size.
+    Returns (totals, months): {trader_id: {field: value}} and
+    {(trader_id, month): {field: value}}.
+    """
+    everyone = trader_ids is None
+    if everyone:
+        trader_ids = Trader.objects.values_list('pk', flat=True)
+    totals = {trader_id: dict.fromkeys(STATS_FIELDS, 0) for trader_id in trader_ids}
+    months = defaultdict(lambda: dict.fromkeys(MONTH_FIELDS, 0))
+
+    sums = defaultdict(dict)
+    for chunk in _history_chunks(None if everyone else list(totals)):
+        for state in chunk:
+            _add(sums, state)
+
+    for (trader_id, month), row in sums.items():
+        if trader_id not in totals:
+            continue  # trader created after the id list was read
+        target = totals[trader_id] if month is None else months[trader_id, month]
+        target.update(row)
+
+    return totals, dict(months)
+
+
+def _quantize(row):
+    return {
+        name: Decimal(value).quantize(Decimal('0.01')) if name.endswith('profit')
+        else Decimal(value).quantize(Decimal('0.00000001')) if name.endswith('amount')
+        else int(value)
+        for name, value in row.items()
+    }
+
+
+def rebuild(trader_ids=None):
+    """Recompute stats and monthly buckets (all traders when trader_ids is None). Returns the trader count."""
+    totals, months = compute(trader_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        TraderStats.objects.bulk_create(
+            [
+                TraderStats(trader_id=trader_id, updated_at=now, **_quantize(row))
+                for trader_id, row in totals.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['trader'],
+            update_fields=STATS_FIELDS + ['updated_at'],
+            batch_size=REBUILD_CHUNK_SIZE,
+        )
+        TraderMonthlyStats.objects.filter(trader_id__in=list(totals)).delete()
+        TraderMonthlyStats.objects.bulk_create(
+            [
+                TraderMonthlyStats(trader_id=trader_id, month=month, **_quantize(row))
+                for (trader_id, month), row in months.items()
+            ],
+            batch_size=REBUILD_CHUNK_SIZE,
+        )
+        performance_service.publish_history(list(totals))
+    transaction.on_commit(leaderboard_service.invalidate)
+    return len(totals)
+
+
+def verify(trader_ids=None):
+    """
+    Compare stored stats with freshly computed ones.
+    Returns a list of (trader_id, month, field, stored, expected) mismatches;
+    month is None for the totals and field None for a missing row.
+    """
+    totals, months = compute(trader_ids)
+
+    stored = {
+        row['trader_id']: row
+        for row in TraderStats.objects.filter(trader_id__in=list(totals)).values('trader_id', *STATS_FIELDS)
+    }
+    stored_months = {
+        (row['trader_id'], row['month']): row
+        for row in TraderMonthlyStats.objects.filter(trader_id__in=list(totals)).values(
+            'trader_id', 'month', *MONTH_FIELDS
+        )
+    }
+
+    mismatches = []
+    for trader_id, row in totals.items():
+        current = stored.get(trader_id)
+        if current is None:
+            mismatches.append((trader_id, None, None, None, None))
+            continue
+        for name, expected in _quantize(row).items():
+            if current[name] != expected:
+                mismatches.append((trader_id, None, name, current[name], expected))
+
+    for (trader_id, month), row in months.items():
+        current = stored_months.pop((trader_id, month), None)
+        if current is None:
+            mismatches.append((trader_id, month, None, None, None))
+            continue
+        for name, expected in _quantize(row).items():
+            if current[name] != expected:
+                mismatches.append((trader_id, month, name, current[name], expected))
+    # Buckets for months without closed trades
+    for trader_id, month in stored_months:
+        mismatches.append((trader_id, month, 'closed_trades', stored_months[trader_id, month]['closed_trades'], 0))
+    return mismatches
+
+
+def get_stats(trader):
+    """Return the trader's TraderStats, building it on first access"""
+    try:
+        return trader.stats
+    except TraderStats.DoesNotExist:
+        rebuild(trader_ids=[trader.pk])
+        return TraderStats.objects.get(trader=trader)
+
+
+def detail_fields(trader):
+    """
+    Trader detail fields derived from the copy trade history (one stats
+    row). A trader with no closed copy trades keeps the values entered in
+    the admin (returns {}).
+    """
+    stats = get_stats(trader)
+    if not stats.closed_trades:
+        return {}
+
+    return {
+        'total_wins': stats.wins,
+        'total_losses': stats.losses,
+        'win_rate': round(stats.win_rate, 2),
+        'avg_profit_percent': str(stats.avg_profit_percent),
+        'avg_loss_percent': str(stats.avg_loss_percent),
+    }
@@ -4,12 +4,14 @@ from .views import(
     validate_token,
     register_user, 
     login_user, 
+    logout_user,
     change_password, 
     ticket_list_create,
     # transactions_view, 
 
     # Dashboard
     dashboard_data,
+    bootstrap,
     user_transactions,
     user_portfolios,
     user_stats,
@@ -31,6 +33,7 @@ from .views import(
     trader_list, 
     trader_detail, 
     trader_portfolios,
+    trader_performance,
 
     # Notification
     notification_list, 
@@ -39,6 +42,7 @@ from .views import(
     mark_all_notifications_read,
     unread_notification_count,
     delete_notification,
+    sync_changes,
 
     # Settings views
     get_user_settings,
@@ -61,10 +65,17 @@ from .views import(
     # Stocks
      stock_list,
     stock_detail,
+    stock_candles,
     stock_sectors,
     user_stock_positions,
     buy_stock,
     sell_stock,
+    stock_orders,
+    cancel_stock_order,
+    price_alerts,
+    cancel_price_alert,
+    set_position_exits,
+    ingest_market_data,
     get_trade_history,
 
 
@@ -99,11 +110,14 @@ from .views import(
     get_referral_list,
     validate_referral_code,
     get_referral_earnings_history,
+    get_referral_downline,
+    get_referral_downline_members,
     generate_referral_code,
 
 
     # Admin implemented copy trader history
     get_copy_trade_history,
+    get_copy_trade_valuation,
     get_copy_trade_detail,
     close_copy_trade,
 
@@ -122,6 +136,8 @@ from .auth_views import (
     get_2fa_status,
 )
 
+from .stream_views import event_stream
+
 urlpatterns = [
 
     # Authentication with Email Verification & 2FA
@@ -137,6 +153,7 @@ urlpatterns = [
     path("enable-2fa/", enable_2fa, name="enable-2fa"),
     path("disable-2fa/", disable_2fa, name="disable-2fa"),
     path("2fa-status/", get_2fa_status, name="2fa-status"),
+    path("logout/", logout_user, name="logout"),
 
      path("api/validate-token/", validate_token, name="validate-token"),
     path("register/", register_user, name="register"),
@@ -147,6 +164,7 @@ urlpatterns = [
 
 
     path('dashboard/', dashboard_data, name='dashboard-data'),
+    path('bootstrap/', bootstrap, name='bootstrap'),
     
     # Transactions endpoint
     path('transactions/', user_transactions, name='user-transactions'),
@@ -187,6 +205,7 @@ urlpatterns = [
 
     path("traders/", trader_list, name="trader-list"),
     path("traders/<int:pk>/", trader_detail, name="trader-detail"),
+    path("traders/<int:trader_id>/performance/", trader_performance, name="trader-performance"),
     path("traders/<int:trader_id>/portfolios/", trader_portfolios, name="trader-portfolios"),
      
      # Notifications
@@ -196,6 +215,7 @@ urlpatterns = [
     path("notifications/mark-all-read/", mark_all_notifications_read, name="notification-mark-all-read"),
     path("notifications/unread-count/", unread_notification_count, name="notification-unread-count"),
     path("notifications/<int:pk>/delete/", delete_notification, name="notification-delete"),
+    path("sync/", sync_changes, name="sync-changes"),
 
     # Settings endpoints
     path("settings/", get_user_settings, name="user-settings"),
@@ -220,11 +240,19 @@ urlpatterns = [
     # These specific routes MUST be before stocks/<str:symbol>/
     path("stocks/buy/", buy_stock, name="buy-stock"),
     path("stocks/sell/", sell_stock, name="sell-stock"),
+    path("stocks/orders/", stock_orders, name="stock-orders"),
+    path("stocks/orders/<int:order_id>/cancel/", cancel_stock_order, name="cancel-stock-order"),
+    path("market-data/ingest/", ingest_market_data, name="ingest-market-data"),
+    path("alerts/", price_alerts, name="price-alerts"),
+    path("alerts/<int:alert_id>/cancel/", cancel_price_alert, name="cancel-price-alert"),
+    path("stocks/positions/<int:position_id>/exits/", set_position_exits, name="set-position-exits"),
+    path("stream/", event_stream, name="event-stream"),
     path("stocks/positions/list/", user_stock_positions, name="user-stock-positions"),
     path("stocks/meta/sectors/", stock_sectors, name="stock-sectors"),
     
     # This generic route MUST be LAST among stock routes
     path("stocks/<str:symbol>/", stock_detail, name="stock-detail"),
+    path("stocks/<str:symbol>/candles/", stock_candles, name="stock-candles"),
 
     path("trades/history/", get_trade_history, name="trade-history"),
 
@@ -253,10 +281,13 @@ urlpatterns = [
     path('referral/list/', get_referral_list, name='get_referral_list'),
     path('referral/validate/', validate_referral_code, name='validate_referral_code'),
     path('referral/earnings/', get_referral_earnings_history, name='get_referral_earnings_history'),
+    path('referral/downline/', get_referral_downline, name='get_referral_downline'),
+    path('referral/downline/members/', get_referral_downline_members, name='get_referral_downline_members'),
     path('referral/generate/', generate_referral_code, name='generate_referral_code'),
 
     # Admin implemented copy trading history
     path("copy-trade-history/", get_copy_trade_history, name="copy-trade-history"),
+    path("copy-trade-history/valuation/", get_copy_trade_valuation, name="copy-trade-valuation"),
     path("copy-trade-history/<int:trade_id>/", get_copy_trade_detail, name="copy-trade-detail"),
     path("copy-trade-history/<int:trade_id>/close/", close_copy_trade, name="close-copy-trade"),
 
@@ -0,0 +1,304 @@
+"""
+Valuation service for Citadel Markets Pro
+Marks stock positions and open copy trades to market in vectorized passes over columnar arrays
+"""
+
+from collections import namedtuple
+import re
+import time
+
+import numpy as np
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .models import Asset, UserCopyTraderHistory, UserStockPosition
+
+
+# Per-position result. value/profit_loss/profit_loss_percent honour the admin
+# override (use_admin_profit); the market_* fields are always price based.
+Valuation = namedtuple('Valuation', [
+    'value',
+    'profit_loss',
+    'profit_loss_percent',
+    'market_value',
+    'market_profit_loss',
+    'market_profit_loss_percent',
+])
+
+_NUMERIC_COLUMNS = (
+    'shares',
+    'total_invested',
+    'stock__price',
+    'admin_profit_loss',
+    'admin_profit_loss_percent',
+)
+
+
+class PositionBook:
+    """Column arrays for a set of positions plus their computed valuations"""
+
+    def __init__(self, rows):
+        """
+        rows: sequence of (id, user_id, use_admin_profit, shares, total_invested,
+        price, admin_profit_loss, admin_profit_loss_percent)
+        """
+        table = np.array(rows, dtype=np.float64).reshape(-1, 8)
+
+        self.ids = table[:, 0].astype(np.int64)
+        self.user_ids = table[:, 1].astype(np.int64)
+        self.use_admin = table[:, 2].astype(bool)
+        self.shares = table[:, 3]
+        self.invested = table[:, 4]
+        self.price = table[:, 5]
+        self.admin_pl = table[:, 6]
+        self.admin_pl_percent = table[:, 7]
+
+        self._compute()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _compute(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.market_value = self.shares * self.price
+            self.market_pl = self.market_value - self.invested
+            self.market_pl_percent = np.where(
+                self.invested > 0, self.market_pl / self.invested * 100, 0.0
+            )
+
+        self.value = np.where(self.use_admin, self.invested + self.admin_pl, self.market_value)
+        self.pl = np.where(self.use_admin, self.admin_pl, self.market_pl)
+        self.pl_percent = np.where(self.use_admin, self.admin_pl_percent, self.market_pl_percent)
+
+    def by_id(self):
+        """Return {position_id: Valuation}"""
+        columns = zip(
+            self.ids.tolist(),
+            self.value.tolist(),
+            self.pl.tolist(),
+            self.pl_percent.tolist(),
+            self.market_value.tolist(),
+            self.market_pl.tolist(),
+            self.market_pl_percent.tolist(),
+        )
+        return {pk: Valuation(*values) for pk, *values in columns}
+
+    def totals(self):
+        """Aggregate market totals for every position in the book"""
+        invested = float(self.invested.sum())
+        market_value = float(self.market_value.sum())
+        profit_loss = market_value - invested
+        return {
+            'total_invested': invested,
+            'total_current_value': market_value,
+            'total_profit_loss': profit_loss,
+            'total_profit_loss_percent': profit_loss / invested * 100 if invested > 0 else 0.0,
+        }
+
+    def totals_by_user(self):
+        """
+        Per-user totals: returns (user_ids, invested, value, market_value, profit_loss).
+        value honours the admin override, market_value does not.
+        """
+        users, index = np.unique(self.user_ids, return_inverse=True)
+        size = len(users)
+        invested = np.bincount(index, weights=self.invested, minlength=size)
+        value = np.bincount(index, weights=self.value, minlength=size)
+        market_value = np.bincount(index, weights=self.market_value, minlength=size)
+        return users, invested, value, market_value, value - invested
+
+
+def load(queryset):
+    """
+    Load a UserStockPosition queryset into a PositionBook with one query.
+    Numeric columns are cast to float in the database so no Decimal objects
+    are built on the way in.
+    """
+    casts = {f"_num{i}": Cast(name, FloatField()) for i, name in enumerate(_NUMERIC_COLUMNS)}
+    rows = queryset.annotate(**casts).values_list(
+        'id', 'user_id', 'use_admin_profit', *casts
+    )
+
+    # Run the ORM-built SQL on a plain cursor: the rows are already plain
+    # numbers, so Django's per-row converters only cost time here
+    sql, params = rows.query.sql_with_params()
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return PositionBook(cursor.fetchall())
+
+
+def from_instances(positions):
+    """Build a PositionBook from fetched instances (stock should be select_related)"""
+    rows = [
+        (
+            p.id,
+            p.user_id,
+            p.use_admin_profit,
+            p.shares,
+            p.total_invested,
+            p.stock.price,
+            p.admin_profit_loss,
+            p.admin_profit_loss_percent,
+        )
+        for p in positions
+    ]
+    return PositionBook(rows)
+
+
+def value_positions(positions):
+    """Value fetched position instances. Returns {position_id: Valuation}."""
+    return from_instances(positions).by_id()
+
+
+def value_user_positions(user, active_only=True):
+    """Load and value one user's positions"""
+    positions = UserStockPosition.objects.filter(user=user)
+    if active_only:
+        positions = positions.filter(is_active=True)
+    return load(positions)
+
+
+def revalue_open_positions():
+    """
+    Mark every open position to market in one pass.
+
+    Returns (book, per_user_totals, seconds); per_user_totals is the tuple
+    from PositionBook.totals_by_user().
+    """
+    started = time.perf_counter()
+    book = load(UserStockPosition.objects.filter(is_active=True))
+    per_user = book.totals_by_user()
+    return book, per_user, time.perf_counter() - started
+
+
+# ---------------------------------------------------------------------------
+# Copy trades
+# ---------------------------------------------------------------------------
+
+_COPY_TRADE_NUMERIC_COLUMNS = ('amount', 'entry_price', 'profit_loss')
+
+_LEVERAGE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*$')
+
+
+def market_symbol(market):
+    """Asset symbol of a copy trade market: 'BTC/USD' -> 'BTCUSD'"""
+    return re.sub(r'[\s/_-]', '', market).upper()
+
+
+def parse_leverage(text):
+    """Leverage multiple from '5x', 'x50', '1:100' or '20'; 1 when unreadable"""
+    match = _LEVERAGE_RE.search(text.lower().replace('x', ''))
+    if match is None:
+        return 1.0
+    return max(float(match.group(1)), 1.0)
+
+
+def _per_value(values, parse, width=1):
+    """parse() each distinct string once and spread the results over values"""
+    distinct, index = np.unique(np.array(values, dtype=str), return_inverse=True)
+    parsed = np.array([parse(value) for value in distinct.tolist()], dtype=np.float64)
+    return parsed.reshape(len(distinct), width)[index.reshape(-1)]
+
+
+class CopyTradeBook:
+    """
+    Column arrays for a set of copy trades joined to current asset quotes,
+    plus their unrealized P/L.
+
+    A buy closes at the bid and a sell at the ask; P/L is amount x leverage
+    x the signed price move since entry, and a trade cannot lose more than
+    its amount. Trades whose market has no quote keep their stored
+    profit_loss (priced is False).
+    """
+
+    def __init__(self, rows, quotes):
+        """
+        rows: sequence of (id, user_id, direction, leverage, market, amount,
+        entry_price, profit_loss); quotes: {symbol: (bid, ask)}
+        """
+        columns = list(zip(*rows)) or [()] * 8
+        ids, user_ids, directions, leverages, markets, amount, entry, stored_pl = columns
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.user_ids = np.array(user_ids, dtype=np.int64)
+        self.amount = np.array(amount, dtype=np.float64)
+        self.entry = np.array(entry, dtype=np.float64)
+        self.stored_pl = np.array(stored_pl, dtype=np.float64)
+
+        # The join: each distinct market / leverage / direction is read once
+        self.sign = _per_value(directions, lambda d: -1.0 if d.lower() == 'sell' else 1.0)[:, 0]
+        self.leverage = _per_value(leverages, parse_leverage)[:, 0]
+        no_quote = (np.nan, np.nan)
+        quote = _per_value(markets, lambda m: quotes.get(market_symbol(m), no_quote), width=2)
+        self.bid, self.ask = quote[:, 0], quote[:, 1]
+
+        self._compute()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _compute(self):
+        self.price = np.where(self.sign > 0, self.bid, self.ask)
+        self.priced = np.isfinite(self.price) & (self.entry > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            move = self.sign * (self.price - self.entry) / self.entry
+            market_pl = np.maximum(self.amount * self.leverage * move, -self.amount)
+            self.pl = np.where(self.priced, market_pl, self.stored_pl)
+            self.pl_percent = np.where(self.amount > 0, self.pl / self.amount * 100, 0.0)
+
+    def totals(self, positions=None):
+        """Totals over the given book positions (default: every trade)"""
+        if positions is None:
+            positions = slice(None)
+        amount = float(self.amount[positions].sum())
+        profit_loss = float(self.pl[positions].sum())
+        return {
+            'open_trades': int(self.ids[positions].size),
+            'open_amount': amount,
+            'profit_loss': profit_loss,
+            'profit_loss_percent': profit_loss / amount * 100 if amount > 0 else 0.0,
+            'unpriced_trades': int((~self.priced[positions]).sum()),
+        }
+
+    def by_user(self):
+        """Yield (user_id, positions): the book positions of each user's trades"""
+        order = np.argsort(self.user_ids, kind='stable')
+        users, starts = np.unique(self.user_ids[order], return_index=True)
+        for user_id, positions in zip(users.tolist(), np.split(order, starts[1:])):
+            yield user_id, positions
+
+
+def load_copy_trades(queryset):
+    """
+    Load a UserCopyTraderHistory queryset and the quotes of its markets into
+    a CopyTradeBook with two queries.
+    """
+    casts = {f"_num{i}": Cast(name, FloatField()) for i, name in enumerate(_COPY_TRADE_NUMERIC_COLUMNS)}
+    rows = queryset.annotate(**casts).values_list(
+        'id', 'user_id', 'direction', 'leverage', 'market', *casts
+    )
+    sql, params = rows.query.sql_with_params()
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    symbols = {market_symbol(market) for market in {row[4] for row in rows}}
+    quotes = Asset.objects.filter(symbol__in=symbols).annotate(
+        _bid=Cast('bid', FloatField()),
+        _ask=Cast('ask', FloatField()),
+    ).values_list('symbol', '_bid', '_ask')
+    return CopyTradeBook(rows, {symbol: (bid, ask) for symbol, bid, ask in quotes})
+
+
+def revalue_open_copy_trades(user_ids=None):
+    """
+    Mark every open copy trade (of the given users) to market in one pass.
+    Returns (book, seconds).
+    """
+    started = time.perf_counter()
+    trades = UserCopyTraderHistory.objects.filter(status='open').order_by()
+    if user_ids is not None:
+        trades = trades.filter(user_id__in=user_ids)
+    book = load_copy_trades(trades)
+    return book, time.perf_counter() - started
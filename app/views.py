@@ -8,13 +8,18 @@ from rest_framework.decorators import (
     authentication_classes,
 )
 from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+import codecs
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags
 from .serializers import AdminWalletSerializer
 from decimal import Decimal, InvalidOperation
-from rest_framework.authentication import TokenAuthentication
+from .auth_credentials import CachedTokenAuthentication, authenticate_cached, remember
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import api_view, permission_classes, parser_classes, authentication_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -36,13 +41,14 @@ from .serializers import (
     NotificationSerializer,
     AdminWalletSerializer, 
     TransactionSerializer,
-    TraderListSerializer, 
     TraderDetailSerializer, 
     TraderPortfolioSerializer,
     StockSerializer,
     StockListSerializer,
     UserStockPositionSerializer,
     TradeHistorySerializer,
+    StockOrderSerializer,
+    PriceAlertSerializer,
 
     UserTraderCopySerializer, 
     UserTraderCopyCreateSerializer,
@@ -77,6 +83,8 @@ from .models import (
     Stock, 
     UserStockPosition,
     TradeHistory,
+    StockOrder,
+    PriceAlert,
     WalletConnection,
 
     Signal, 
@@ -88,6 +96,24 @@ from .models import (
 )
 
 from .permissions import IsEmailVerified
+from . import (
+    account_summary_service,
+    alert_service,
+    balance_service,
+    bootstrap_service,
+    copy_trading_service,
+    leaderboard_service,
+    order_service,
+    market_data_service,
+    notification_service,
+    pagination,
+    performance_service,
+    price_history_service,
+    referral_service,
+    sync_service,
+    trader_stats_service,
+    valuation_service,
+)
 
 # Logger makes error show in vercel
 import logging
@@ -105,23 +131,12 @@ def dashboard_data(request):
     """
     Get all dashboard data for the authenticated user
     """
-    user = request.user
-    
-    # Get all transactions
-    from .models import Transaction
-    transactions = user.transactions.all()
-    
-    # Calculate total deposits (completed only)
-    total_deposits = transactions.filter(
-        transaction_type='deposit',
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Calculate total withdrawals (completed only)
-    total_withdrawals = transactions.filter(
-        transaction_type='withdrawal',
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    return Response(_dashboard_payload(request.user), status=status.HTTP_200_OK)
+
+
+def _dashboard_payload(user):
+    # Deposit/withdrawal totals come from the materialized summary row
+    summary = account_summary_service.get_summary(user)
     
     # Get active portfolios
     from .models import Portfolio
@@ -145,19 +160,22 @@ def dashboard_data(request):
         'has_submitted_kyc': user.has_submitted_kyc,
         'is_verified': user.is_verified,
         'date_joined': user.date_joined.isoformat(),
-        'total_deposits': float(total_deposits),
-        'total_withdrawals': float(total_withdrawals),
+        'total_deposits': float(summary.total_deposits),
+        'total_withdrawals': float(summary.total_withdrawals),
         'portfolios': list(portfolios)
     }
     
-    return Response(data, status=status.HTTP_200_OK)
+    return data
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_transactions(request):
     """
-    Get all transactions for the authenticated user
+    Get transactions for the authenticated user, newest first
+    Query params:
+    - type: deposit or withdrawal (optional)
+    - cursor / page_size: keyset pagination, next/prev links in the Link header
     """
     user = request.user
     transaction_type = request.query_params.get('type', None)
@@ -173,8 +191,9 @@ def user_transactions(request):
         'id', 'transaction_type', 'amount', 'status', 
         'reference', 'description', 'created_at', 'updated_at'
     )
+    page = pagination.paginate(request, data, ('-created_at',))
     
-    return Response(list(data), status=status.HTTP_200_OK)
+    return page.apply_headers(Response(page.items, status=status.HTTP_200_OK))
 
 
 @api_view(['GET'])
@@ -206,37 +225,79 @@ def user_stats(request):
     """
     Get user statistics summary
     """
-    user = request.user
-    
-    from .models import Transaction, Portfolio
-    
-    # Transaction stats
-    completed_deposits = user.transactions.filter(
-        transaction_type='deposit',
-        status='completed'
-    ).count()
-    
-    completed_withdrawals = user.transactions.filter(
-        transaction_type='withdrawal',
-        status='completed'
-    ).count()
-    
-    # Portfolio stats
-    active_portfolios = user.portfolios.filter(is_active=True).count()
-    total_invested = user.portfolios.filter(is_active=True).aggregate(
-        total=Sum('invested')
-    )['total'] or 0
+    return Response(_user_stats_payload(request.user), status=status.HTTP_200_OK)
+
+
+def _user_stats_payload(user):
+    # All counts and totals come from the materialized summary row
+    summary = account_summary_service.get_summary(user)
     
     data = {
-        'total_deposits_count': completed_deposits,
-        'total_withdrawals_count': completed_withdrawals,
-        'active_portfolios_count': active_portfolios,
-        'total_invested': float(total_invested),
+        'total_deposits_count': summary.deposits_count,
+        'total_withdrawals_count': summary.withdrawals_count,
+        'active_portfolios_count': summary.active_portfolios_count,
+        'total_invested': float(summary.active_portfolios_invested),
+        'open_positions_count': summary.open_positions_count,
+        'open_positions_value': float(summary.open_positions_value),
         'balance': float(user.balance),
         'profit': float(user.profit),
     }
     
-    return Response(data, status=status.HTTP_200_OK)
+    return data
+
+
+# Sections of the bootstrap endpoint: name -> builder(request), each returning
+# the body of the standalone endpoint it replaces
+BOOTSTRAP_SECTIONS = {
+    'dashboard': lambda request: _dashboard_payload(request.user),
+    'stats': lambda request: _user_stats_payload(request.user),
+    'positions': lambda request: _stock_positions_payload(request.user),
+    'unread_count': lambda request: {"unread_count": notification_service.unread_count(request.user)},
+    'transactions': lambda request: _transaction_history_payload(request.user),
+    'copy_trades': lambda request: _copy_trade_history_payload(request.user),
+    'referral': lambda request: _referral_info_payload(request.user, request.headers.get('X-Frontend-URL')),
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def bootstrap(request):
+    """
+    GET: Everything the dashboard needs for first paint in one request, with
+    the sections built concurrently
+    Query params:
+    - include: comma-separated sections (default: all) - dashboard, stats,
+      positions, unread_count, transactions, copy_trades, referral
+    Each section has the body of its standalone endpoint with default
+    parameters. A failing section is reported under errors and the others
+    are still returned. Per-section build times are in the Server-Timing header.
+    """
+    include = request.query_params.get('include')
+    if include:
+        names = list(dict.fromkeys(name.strip() for name in include.split(',') if name.strip()))
+    else:
+        names = list(BOOTSTRAP_SECTIONS)
+    
+    unknown = [name for name in names if name not in BOOTSTRAP_SECTIONS]
+    if unknown:
+        return Response({
+            "success": False,
+            "error": f"Unknown sections: {', '.join(unknown)}. Available: {', '.join(BOOTSTRAP_SECTIONS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    results, errors, timings = bootstrap_service.build({
+        name: partial(BOOTSTRAP_SECTIONS[name], request) for name in names
+    })
+    
+    response = Response({
+        "success": not errors,
+        "sections": results,
+        "errors": errors,
+    }, status=status.HTTP_200_OK)
+    response["Server-Timing"] = ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()
+    )
+    return response
 
 
 
@@ -274,8 +335,13 @@ def validate_token(request):
     token_key = auth_header.split(" ")[1]
 
     try:
-        token = Token.objects.get(key=token_key)
-        user = token.user
+        cached = authenticate_cached(token_key)
+        if cached is not None:
+            user = cached[0]
+        else:
+            token = Token.objects.select_related("user").get(key=token_key)
+            remember(token)
+            user = token.user
         
         return Response(
             {
@@ -575,15 +641,16 @@ def register_user(request):
             email_verified=True,
             is_active=True,
         )
+        referral_service.add_to_tree(user)
 
-        # ✅ Send welcome email synchronously (same as 2FA email)
+        # ✅ Queue welcome email (delivered by the send_outbox worker)
         try:
             email_sent = send_welcome_email(user)
             
             if email_sent:
-                logger.info(f"✅ Welcome email sent to {user.email}")
+                logger.info(f"✅ Welcome email queued for {user.email}")
             else:
-                logger.warning(f"⚠️ Failed to send welcome email to {user.email}")
+                logger.warning(f"⚠️ Failed to queue welcome email for {user.email}")
         except Exception as e:
             logger.error(f"❌ Welcome email error for {user.email}: {str(e)}")
             # Don't fail registration if email fails
@@ -663,10 +730,26 @@ def login_user(request):
     )
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def logout_user(request):
+    """
+    POST: Log out by revoking the current token. Every session using this
+    token is signed out; logging in again issues a new one.
+    """
+    Token.objects.filter(key=request.auth.key).delete()
+    
+    return Response(
+        {"success": True, "message": "Logged out successfully"},
+        status=status.HTTP_200_OK,
+    )
+
+
 # Tickets
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def ticket_list_create(request):
     if request.method == "GET":
         # Only show tickets belonging to logged-in user
@@ -686,7 +769,7 @@ def ticket_list_create(request):
 
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_user_profile(request):
     user = request.user
 
@@ -703,7 +786,7 @@ def get_user_profile(request):
         user.city = data.get("city", user.city)
         user.region = data.get("region", user.region)
 
-        user.save()
+        user.save(update_fields=["first_name", "last_name", "dob", "address", "postal_code", "country", "city", "region"])
 
         return Response(
             {"message": "Profile updated successfully"},
@@ -786,7 +869,7 @@ def change_password(request):
 
     # Save new password
     user.set_password(new_password)
-    user.save()
+    user.save(update_fields=["password"])
 
     return Response(
         {"success": "Password changed successfully"},
@@ -818,7 +901,7 @@ def upload_kyc(request):
     user.id_front = id_front
     user.id_back = id_back
     user.has_submitted_kyc = True
-    user.save()
+    user.save(update_fields=["id_type", "id_front", "id_back", "has_submitted_kyc"])
 
     return Response({
         "success": "KYC details uploaded successfully",
@@ -834,7 +917,7 @@ def upload_kyc(request):
 
 
 @api_view(["POST"])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def withdrawal_view(request):
     """
@@ -881,22 +964,20 @@ def withdrawal_view(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Create a unique reference
-    reference = get_random_string(12)
-
-    # Create withdrawal transaction (status pending by default)
-    transaction = Transaction.objects.create(
-        user=user,
-        transaction_type="withdrawal",
-        amount=amount,
-        description=f"Withdrawal from {asset.replace('_', ' ')}",
-        reference=reference,
-        status="pending",
-    )
-
-    # ✅ If you want to immediately deduct from user balance:
-    setattr(user, asset, available_balance - amount)
-    user.save()
+    # Hold the amount and create the pending withdrawal atomically
+    try:
+        transaction = balance_service.request_withdrawal(
+            user,
+            amount,
+            balance_field=asset,
+            description=f"Withdrawal from {asset.replace('_', ' ')}",
+            reference=get_random_string(12),
+        )
+    except balance_service.InsufficientFundsError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
     return Response(
         {
@@ -920,23 +1001,25 @@ def withdrawal_view(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def transaction_history(request):
     """
-    Return all transactions belonging to the logged-in user.
+    Return the logged-in user's transactions, newest first.
+    Query params:
+    - cursor / page_size: keyset pagination (default: 50, max: 200)
     """
     user = request.user
-    transactions = Transaction.objects.filter(user=user).order_by("-created_at")
-    serializer = TransactionSerializer(transactions, many=True)
+    page = pagination.paginate(request, Transaction.objects.filter(user=user), ("-created_at",))
+    serializer = TransactionSerializer(page.items, many=True)
 
-    return Response({"transactions": serializer.data}, status=status.HTTP_200_OK)
+    return Response({"transactions": serializer.data, **page.links()}, status=status.HTTP_200_OK)
 
 
 
 
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def payment_methods(request):
     if request.method == "POST":
         try:
@@ -1131,7 +1214,7 @@ def trader_detail(request, pk):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def copy_trader_action(request):
     """
     POST: Copy or cancel copying a trader
@@ -1255,7 +1338,7 @@ def copy_trader_action(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_user_copy_status(request, trader_id):
     """
     GET: Check if user is currently copying a specific trader
@@ -1282,7 +1365,7 @@ def get_user_copy_status(request, trader_id):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_all_user_copies(request):
     """
     GET: Get all traders the user is currently copying or has copied
@@ -1353,6 +1436,7 @@ def news_list(request):
     Query params:
     - category: Filter by category (optional)
     - search: Search in title and summary (optional)
+    - cursor / page_size: keyset pagination, next/prev links in the Link header
     """
     news_queryset = News.objects.all()
 
@@ -1371,8 +1455,9 @@ def news_list(request):
             Q(content__icontains=search)
         )
 
-    serializer = NewsSerializer(news_queryset, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    page = pagination.paginate(request, news_queryset, ("-published_at",))
+    serializer = NewsSerializer(page.items, many=True)
+    return page.apply_headers(Response(serializer.data, status=status.HTTP_200_OK))
 
 
 @api_view(["GET"])
@@ -1448,32 +1533,43 @@ def news_detail(request, pk):
 @permission_classes([AllowAny])
 def trader_list(request):
     """
-    GET: List all traders with optional filtering
-    """
-    traders = Trader.objects.filter(is_active=True)
+    GET: List active traders, ranked, from the in-memory leaderboard
+    Query params:
+    - sort: gain (default), copiers, return_ytd, win_rate or score (gain per point of risk)
+    - search: Search in name and username (optional)
+    - badge: gold, silver or bronze (optional)
+    - min_gain / max_risk: numeric bounds (optional)
+    - country: exact country name (optional)
+    - cursor / page_size: keyset pagination, next/prev links in the Link header
+    """
+    ranking = request.GET.get("sort") or leaderboard_service.DEFAULT_RANKING
+    if ranking not in leaderboard_service.RANKINGS:
+        return Response(
+            {"error": f"sort must be one of {', '.join(leaderboard_service.RANKINGS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-    # Search functionality
-    search = request.GET.get("search")
-    if search:
-        from django.db.models import Q
-        traders = traders.filter(
-            Q(name__icontains=search) | 
-            Q(username__icontains=search)
+    try:
+        min_gain = request.GET.get("min_gain")
+        min_gain = float(min_gain) if min_gain else None
+        max_risk = request.GET.get("max_risk")
+        max_risk = int(max_risk) if max_risk else None
+    except ValueError:
+        return Response(
+            {"error": "min_gain and max_risk must be numbers"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-    serializer = TraderListSerializer(traders, many=True)
-    
-    # ✅ Ensure images have full URLs
-    data = serializer.data
-    for trader in data:
-        # Make sure avatar URL is complete
-        if trader.get('avatar') and not trader['avatar'].startswith('http'):
-            trader['avatar'] = None
-        # Make sure country_flag URL is complete  
-        if trader.get('country_flag') and not trader['country_flag'].startswith('http'):
-            trader['country_flag'] = None
-    
-    return Response(data, status=status.HTTP_200_OK)
+    page = leaderboard_service.page(
+        request,
+        ranking,
+        search=request.GET.get("search"),
+        badge=request.GET.get("badge"),
+        min_gain=min_gain,
+        max_risk=max_risk,
+        country=request.GET.get("country"),
+    )
+    return page.apply_headers(Response(page.items, status=status.HTTP_200_OK))
 
 
 
@@ -1484,7 +1580,7 @@ def trader_detail(request, pk):
     GET: Retrieve a single trader by ID with full details
     """
     try:
-        trader = Trader.objects.get(pk=pk, is_active=True)
+        trader = Trader.objects.select_related('stats').get(pk=pk, is_active=True)
     except Trader.DoesNotExist:
         return Response(
             {"error": "Trader not found"}, 
@@ -1492,7 +1588,81 @@ def trader_detail(request, pk):
         )
 
     serializer = TraderDetailSerializer(trader)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    # Win/loss figures from the copy trade history, when it has any, and the
+    # last months of the performance charts (full ranges: trader_performance)
+    data = {
+        **serializer.data,
+        **trader_stats_service.detail_fields(trader),
+        **performance_service.detail_series(trader.pk),
+    }
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def trader_performance(request, trader_id):
+    """
+    GET: Performance chart points of a trader over a date range
+    Query params:
+    - resolution: month (default), week or day; profit is summed and returns
+      compounded per bucket
+    - from / to: YYYY-MM-DD, inclusive (default: a recent range for the resolution)
+    - series: value or percentage (default: both)
+    """
+    if not Trader.objects.filter(pk=trader_id, is_active=True).exists():
+        return Response(
+            {"error": "Trader not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    resolution = request.GET.get("resolution") or "month"
+    if resolution not in performance_service.RESOLUTIONS:
+        return Response(
+            {"error": f"resolution must be one of {', '.join(performance_service.RESOLUTIONS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    series = request.GET.get("series")
+    if series and series not in performance_service.SERIES:
+        return Response(
+            {"error": f"series must be one of {', '.join(performance_service.SERIES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    start, end = performance_service.default_range(resolution)
+    try:
+        if request.GET.get("to"):
+            end = parse_date(request.GET["to"])
+            if end is not None:
+                start = end - timedelta(days=performance_service.DEFAULT_SPAN_DAYS[resolution])
+        if request.GET.get("from"):
+            start = parse_date(request.GET["from"])
+        if start is None or end is None:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {"error": "from and to must be dates (YYYY-MM-DD)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if start > end or (end - start).days > performance_service.MAX_SPAN_DAYS[resolution]:
+        return Response(
+            {"error": f"from must be before to, at most {performance_service.MAX_SPAN_DAYS[resolution]} days apart at this resolution"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    charts = performance_service.chart(
+        trader_id,
+        resolution,
+        start,
+        end,
+        series=(series,) if series else performance_service.SERIES,
+    )
+    return Response({
+        "trader_id": trader_id,
+        "resolution": resolution,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "series": charts,
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
@@ -1523,6 +1693,7 @@ def notification_list(request):
     - type: Filter by notification type (trade, deposit, withdrawal, alert, system, news)
     - read: Filter by read status (true/false)
     - priority: Filter by priority (low, medium, high)
+    - cursor / page_size: keyset pagination, next/prev links in the Link header
     """
     notifications = Notification.objects.filter(user=request.user)
     
@@ -1542,8 +1713,9 @@ def notification_list(request):
     # if priority:
     #     notifications = notifications.filter(priority=priority)
     
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    page = pagination.paginate(request, notifications, ("-created_at",))
+    serializer = NotificationSerializer(page.items, many=True)
+    return page.apply_headers(Response(serializer.data, status=status.HTTP_200_OK))
 
 
 @api_view(["GET"])
@@ -1578,8 +1750,7 @@ def mark_notification_read(request, pk):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    notification.read = True
-    notification.save()
+    notification_service.mark_read(notification)
     
     serializer = NotificationSerializer(notification)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1591,10 +1762,7 @@ def mark_all_notifications_read(request):
     """
     POST: Mark all notifications as read for the authenticated user
     """
-    updated_count = Notification.objects.filter(
-        user=request.user, 
-        read=False
-    ).update(read=True)
+    updated_count = notification_service.mark_all_read(request.user)
     
     return Response(
         {
@@ -1610,13 +1778,24 @@ def mark_all_notifications_read(request):
 def unread_notification_count(request):
     """
     GET: Get count of unread notifications for the authenticated user
+    Headers:
+    - If-None-Match: ETag from a previous response; 304 while the count is unchanged
     """
-    count = Notification.objects.filter(user=request.user, read=False).count()
-    
-    return Response(
-        {"unread_count": count}, 
-        status=status.HTTP_200_OK
-    )
+    count = notification_service.unread_count(request.user)
+    etag = f'"unread-{count}"'
+
+    # Weak comparison, as If-None-Match requires
+    client_etags = {tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))}
+    if etag in client_etags or "*" in client_etags:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(
+            {"unread_count": count}, 
+            status=status.HTTP_200_OK
+        )
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @api_view(["DELETE"])
@@ -1639,11 +1818,40 @@ def delete_notification(request, pk):
         status=status.HTTP_200_OK
     )
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    GET: Transactions, positions, trades, notifications, copy trades and balance
+    changed since the client's last sync
+    Query params:
+    - since: version returned by the previous call (omit or 0 for a full snapshot)
+    - limit: maximum changes per response (default 500, max 2000)
+    Response: version to send as `since` next time, full (replace the local copy),
+    has_more (call again straight away) and changes, with upserted records and
+    deleted ids per model
+    """
+    try:
+        since = int(request.GET.get("since") or 0)
+        limit = int(request.GET.get("limit") or sync_service.PAGE_SIZE)
+    except ValueError:
+        return Response(
+            {"success": False, "error": "since and limit must be integers"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = max(1, min(limit, sync_service.MAX_PAGE_SIZE))
+
+    result = sync_service.changes_since(request.user, since, limit)
+    response = Response({"success": True, **result}, status=status.HTTP_200_OK)
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
 # UPDATED SETTINGS VIEWS - Replace the previous versions in your views.py
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_user_settings(request):
     """
     GET: Retrieve complete user settings including profile, security, and payment info
@@ -1694,7 +1902,7 @@ def get_user_settings(request):
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def update_profile(request):
     """
     PATCH: Update user profile information (name, phone, country)
@@ -1718,7 +1926,7 @@ def update_profile(request):
     if country is not None:
         user.country = country
     
-    user.save()
+    user.save(update_fields=["first_name", "last_name", "phone", "country"])
     
     return Response({
         "message": "Profile updated successfully",
@@ -1733,7 +1941,7 @@ def update_profile(request):
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def update_payment_method(request):
     """
     PATCH: Update or create a payment method
@@ -1790,7 +1998,7 @@ def update_payment_method(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def change_user_password(request):
     """
     POST: Change user password
@@ -1834,7 +2042,7 @@ def change_user_password(request):
     
     # Update password
     user.set_password(new_password)
-    user.save()
+    user.save(update_fields=["password"])
     
     return Response(
         {"message": "Password changed successfully"},
@@ -2019,7 +2227,7 @@ def get_user_deposit_history(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_user_profile_for_withdrawal(request):
     """
     GET: Retrieve authenticated user's profile with balance and other info
@@ -2048,7 +2256,7 @@ def get_user_profile_for_withdrawal(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_withdrawal_methods(request):
     """
     GET: Retrieve all available withdrawal methods for the user
@@ -2090,7 +2298,7 @@ def get_withdrawal_methods(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def create_withdrawal_request(request):
     """
     POST: Create a new withdrawal request
@@ -2185,28 +2393,16 @@ def create_withdrawal_request(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
     
-    # Generate unique reference
-    reference = f"WTH-{get_random_string(12).upper()}"
-    
-    # Create transaction
+    # Hold the amount and create the pending withdrawal atomically
     try:
-        transaction = Transaction.objects.create(
-            user=user,
-            transaction_type="withdrawal",
+        transaction = balance_service.request_withdrawal(
+            user,
+            amount,
             currency=method_type.replace("_ERC20", "").replace("_TRC20", ""),  # Simplify currency name
             unit=amount,  # For withdrawals, unit can be same as amount
-            amount=amount,
-            reference=reference,
             description=f"Withdrawal of ${amount} via {method_type} to {withdrawal_address[:20]}...",
-            status="pending",
-            created_at=timezone.now(),
         )
         
-        # Deduct from user balance immediately (pending admin approval)
-        # NOTE: In production, you might want to hold this in a separate field until admin approval
-        user.balance -= amount
-        user.save()
-        
         return Response(
             {
                 "success": True,
@@ -2226,6 +2422,14 @@ def create_withdrawal_request(request):
             },
             status=status.HTTP_201_CREATED,
         )
+    except balance_service.InsufficientFundsError:
+        return Response(
+            {
+                "success": False,
+                "error": f"Insufficient balance. Your balance is ${user.balance:,.2f}"
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
     except Exception as e:
         return Response(
             {
@@ -2238,7 +2442,7 @@ def create_withdrawal_request(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_withdrawal_history(request):
     """
     GET: Retrieve withdrawal transaction history for authenticated user
@@ -2278,7 +2482,7 @@ def get_withdrawal_history(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_all_transaction_history(request):
     """
     GET: Retrieve all transaction history (deposits + withdrawals) for authenticated user
@@ -2286,7 +2490,6 @@ def get_all_transaction_history(request):
     - limit: Number of transactions to return (default: 10)
     - type: Filter by transaction type (deposit/withdrawal) - optional
     """
-    user = request.user
     limit = request.GET.get("limit", 10)
     transaction_type = request.GET.get("type", None)
     
@@ -2296,23 +2499,10 @@ def get_all_transaction_history(request):
         limit = 10
 
     try:
-        # Get all transactions for user
-        transactions = Transaction.objects.filter(user=user)
-        
-        # Filter by type if provided
-        if transaction_type and transaction_type in ['deposit', 'withdrawal']:
-            transactions = transactions.filter(transaction_type=transaction_type)
-        
-        # Order by most recent and limit
-        transactions = transactions.order_by("-created_at")[:limit]
-        
-        serializer = TransactionSerializer(transactions, many=True)
-        
-        return Response({
-            "success": True,
-            "transactions": serializer.data,
-            "count": len(serializer.data)
-        }, status=status.HTTP_200_OK)
+        return Response(
+            _transaction_history_payload(request.user, limit, transaction_type),
+            status=status.HTTP_200_OK
+        )
     except Exception as e:
         return Response({
             "success": False,
@@ -2320,6 +2510,26 @@ def get_all_transaction_history(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _transaction_history_payload(user, limit=10, transaction_type=None):
+    # Get all transactions for user
+    transactions = Transaction.objects.filter(user=user)
+    
+    # Filter by type if provided
+    if transaction_type and transaction_type in ['deposit', 'withdrawal']:
+        transactions = transactions.filter(transaction_type=transaction_type)
+    
+    # Order by most recent and limit
+    transactions = transactions.order_by("-created_at")[:limit]
+    
+    serializer = TransactionSerializer(transactions, many=True)
+    
+    return {
+        "success": True,
+        "transactions": serializer.data,
+        "count": len(serializer.data)
+    }
+
+
 # Stocks
 @api_view(["GET"])
 @permission_classes([AllowAny])
@@ -2330,7 +2540,8 @@ def stock_list(request):
     - search: Search in symbol and name
     - sector: Filter by sector
     - featured: Show only featured stocks (true/false)
-    - limit: Limit number of results
+    - page_size (or limit): Number of results per page (default: 50, max: 200)
+    - cursor: Opaque cursor from the next/prev links
     """
     stocks = Stock.objects.filter(is_active=True)
     
@@ -2353,20 +2564,14 @@ def stock_list(request):
     if featured and featured.lower() == "true":
         stocks = stocks.filter(is_featured=True)
     
-    # Limit results
-    limit = request.GET.get("limit")
-    if limit:
-        try:
-            stocks = stocks[:int(limit)]
-        except ValueError:
-            pass
-    
-    serializer = StockListSerializer(stocks, many=True)
+    page = pagination.paginate(request, stocks, ("-is_featured", "symbol"))
+    serializer = StockListSerializer(page.items, many=True)
     
     return Response({
         "success": True,
         "count": len(serializer.data),
-        "stocks": serializer.data
+        "stocks": serializer.data,
+        **page.links(),
     }, status=status.HTTP_200_OK)
 
 
@@ -2409,6 +2614,72 @@ def stock_detail(request, symbol):
     }, status=status.HTTP_200_OK)
 
 
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def stock_candles(request, symbol):
+    """
+    GET: OHLCV candles for a stock, read from the pre-aggregated candle table
+    Query params:
+    - interval: 1m, 5m, 1h or 1d (default: 1h)
+    - from / to: ISO datetimes bounding bucket start (optional)
+    - limit: number of candles, newest last (default: 500, max: 1000)
+    """
+    interval = request.query_params.get("interval", "1h")
+    if interval not in price_history_service.INTERVAL_SECONDS:
+        return Response(
+            {
+                "success": False,
+                "error": f"interval must be one of {', '.join(price_history_service.INTERVAL_SECONDS)}"
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    start = request.query_params.get("from")
+    end = request.query_params.get("to")
+    try:
+        start = parse_datetime(start) if start else None
+        end = parse_datetime(end) if end else None
+        limit = min(int(request.query_params.get("limit", 500)), 1000)
+    except ValueError:
+        return Response(
+            {
+                "success": False,
+                "error": "Invalid from, to or limit value"
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        stock = Stock.objects.only("id", "symbol").get(symbol=symbol.upper(), is_active=True)
+    except Stock.DoesNotExist:
+        return Response(
+            {
+                "success": False,
+                "error": "Stock not found"
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    candles = price_history_service.get_candles(stock, interval, start, end, max(limit, 1))
+    
+    return Response({
+        "success": True,
+        "symbol": stock.symbol,
+        "interval": interval,
+        "candles": [
+            {
+                "time": bucket_start.isoformat(),
+                "open": str(open_),
+                "high": str(high),
+                "low": str(low),
+                "close": str(close),
+                "volume": volume,
+            }
+            for bucket_start, open_, high, low, close, volume in candles
+        ]
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def stock_sectors(request):
@@ -2427,7 +2698,7 @@ def stock_sectors(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def user_stock_positions(request):
     """
     GET: Get all stock positions for authenticated user
@@ -2435,29 +2706,33 @@ def user_stock_positions(request):
     - active_only: Show only active positions (default: true)
     """
     active_only = request.GET.get("active_only", "true").lower() == "true"
-    
-    positions = UserStockPosition.objects.filter(user=request.user)
+    return Response(_stock_positions_payload(request.user, active_only), status=status.HTTP_200_OK)
+
+
+def _stock_positions_payload(user, active_only=True):
+    positions = UserStockPosition.objects.filter(user=user).select_related('stock')
     
     if active_only:
         positions = positions.filter(is_active=True)
     
-    serializer = UserStockPositionSerializer(positions, many=True)
+    positions = list(positions)
     
-    # Calculate totals - FIX: Ensure all values are Decimal
-    total_invested = Decimal('0.00')
-    total_current_value = Decimal('0.00')
-    
-    for p in positions:
-        if p.is_active:
-            total_invested += Decimal(str(p.total_invested))
-            total_current_value += Decimal(str(p.current_value))
+    # Value every position in one vectorized pass
+    valuations = valuation_service.value_positions(positions)
+    serializer = UserStockPositionSerializer(
+        positions, many=True, context={'valuations': valuations}
+    )
     
+    # Totals are market based and cover open positions only
+    totals = valuation_service.from_instances(
+        [p for p in positions if p.is_active]
+    ).totals()
+    total_invested = Decimal(f"{totals['total_invested']:.2f}")
+    total_current_value = Decimal(f"{totals['total_current_value']:.2f}")
     total_profit_loss = total_current_value - total_invested
-    total_profit_loss_percent = (
-        (total_profit_loss / total_invested * 100) if total_invested > 0 else Decimal('0.00')
-    )
+    total_profit_loss_percent = Decimal(f"{totals['total_profit_loss_percent']:.2f}")
     
-    return Response({
+    return {
         "success": True,
         "positions": serializer.data,
         "summary": {
@@ -2466,127 +2741,139 @@ def user_stock_positions(request):
             "total_profit_loss": str(total_profit_loss),
             "total_profit_loss_percent": str(total_profit_loss_percent)
         }
-    }, status=status.HTTP_200_OK)
+    }
 
 
     
-@api_view(["POST"])
-@permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
-def buy_stock(request):
+def _place_resting_order(request, stock, side, shares):
     """
-    POST: Buy stock shares
-    Expects: symbol, shares, order_type
+    Place a limit/stop order for buy_stock/sell_stock.
+    Expects trigger price in limit_price/stop_price (or price).
     """
-    user = request.user
-    symbol = request.data.get("symbol")
-    shares_str = request.data.get("shares")
-    order_type = request.data.get("order_type", "Market Buy")
+    order_type = order_service.parse_order_type(request.data.get("order_type"))
+    trigger_str = (
+        request.data.get(f"{order_type}_price")
+        or request.data.get("price")
+    )
     
-    # Validation
-    if not symbol or not shares_str:
+    try:
+        trigger_price = Decimal(str(trigger_str))
+    except (ValueError, TypeError, InvalidOperation):
         return Response(
             {
                 "success": False,
-                "error": "Symbol and shares are required"
+                "error": f"A valid {order_type}_price is required for {order_type} orders"
             },
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        shares = Decimal(str(shares_str))
-    except (ValueError, TypeError, InvalidOperation):
+    if trigger_price <= 0:
         return Response(
             {
                 "success": False,
-                "error": "Invalid shares value"
+                "error": f"{order_type.capitalize()} price must be greater than zero"
             },
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    if shares <= 0:
+    try:
+        order = order_service.place_order(request.user, stock, side, order_type, shares, trigger_price)
+    except balance_service.BalanceError as e:
         return Response(
             {
                 "success": False,
-                "error": "Shares must be greater than zero"
+                "error": str(e)
             },
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Get stock
-    try:
-        stock = Stock.objects.get(symbol=symbol.upper(), is_active=True)
-    except Stock.DoesNotExist:
+    if order.status == 'open':
+        message = f"{order.get_order_type_display()} {side} order placed for {shares} shares of {stock.symbol} @ ${trigger_price}"
+    elif order.status == 'filled':
+        message = f"{order.get_order_type_display()} {side} order filled at ${order.fill_price}"
+    else:
+        message = f"{order.get_order_type_display()} {side} order rejected: {order.status_reason}"
+    
+    request.user.refresh_from_db(fields=['balance'])
+    return Response({
+        "success": order.status != 'rejected',
+        "message": message,
+        "order": StockOrderSerializer(order).data,
+        "new_balance": str(request.user.balance)
+    }, status=status.HTTP_201_CREATED if order.status != 'rejected' else status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def buy_stock(request):
+    """
+    POST: Buy stock shares
+    Expects: symbol, shares, order_type
+    For "Limit Buy"/"Stop Buy" order types also expects limit_price/stop_price;
+    the order rests in the order book until the price crosses it.
+    """
+    user = request.user
+    symbol = request.data.get("symbol")
+    shares_str = request.data.get("shares")
+    order_type = request.data.get("order_type", "Market Buy")
+    
+    # Validation
+    if not symbol or not shares_str:
         return Response(
             {
                 "success": False,
-                "error": "Stock not found"
+                "error": "Symbol and shares are required"
             },
-            status=status.HTTP_404_NOT_FOUND
+            status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Calculate cost
-    total_cost = shares * stock.price
+    try:
+        shares = Decimal(str(shares_str))
+    except (ValueError, TypeError, InvalidOperation):
+        return Response(
+            {
+                "success": False,
+                "error": "Invalid shares value"
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Check balance
-    if user.balance < total_cost:
+    if shares <= 0:
         return Response(
             {
                 "success": False,
-                "error": f"Insufficient balance. Required: ${total_cost:.2f}, Available: ${user.balance:.2f}"
+                "error": "Shares must be greater than zero"
             },
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Get or create position
-    position, created = UserStockPosition.objects.get_or_create(
-        user=user,
-        stock=stock,
-        is_active=True,
-        defaults={
-            'shares': shares,
-            'average_buy_price': stock.price,
-            'total_invested': total_cost
-        }
-    )
+    # Get stock
+    try:
+        stock = Stock.objects.get(symbol=symbol.upper(), is_active=True)
+    except Stock.DoesNotExist:
+        return Response(
+            {
+                "success": False,
+                "error": "Stock not found"
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
     
-    if not created:
-        # Update existing position
-        old_total = position.total_invested
-        old_shares = position.shares
-        new_total = old_total + total_cost
-        new_shares = old_shares + shares
-        position.average_buy_price = new_total / new_shares
-        position.shares = new_shares
-        position.total_invested = new_total
-        position.save()
-    
-    # Deduct from balance
-    user.balance -= total_cost
-    user.save()
-    
-    # Create transaction record
-    reference = f"BUY-{get_random_string(12).upper()}"
-    Transaction.objects.create(
-        user=user,
-        transaction_type="withdrawal",  # Buying is a withdrawal from balance
-        amount=total_cost,
-        reference=reference,
-        description=f"Bought {shares} shares of {stock.symbol} @ ${stock.price}",
-        status="completed"
-    )
-
-    # After successful buy
-    TradeHistory.objects.create(
-        user=user,
-        stock=stock,
-        trade_type='buy',
-        shares=shares,
-        price_per_share=stock.price,
-        total_amount=total_cost,
-        reference=reference,
-        notes=f"Market buy order"
-    )
+    if order_service.parse_order_type(order_type) != "market":
+        return _place_resting_order(request, stock, "buy", shares)
+    
+    # Debit balance, update position and write the ledger rows atomically
+    try:
+        position, total_cost, reference = balance_service.buy_stock(user, stock, shares)
+    except balance_service.BalanceError as e:
+        return Response(
+            {
+                "success": False,
+                "error": str(e)
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     return Response({
         "success": True,
@@ -2598,11 +2885,12 @@ def buy_stock(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def sell_stock(request):
     """
     POST: Sell stock shares
     Expects: symbol, shares
+    Optional: order_type ("Limit Sell"/"Stop Sell") with limit_price/stop_price
     """
     user = request.user
     symbol = request.data.get("symbol")
@@ -2650,123 +2938,300 @@ def sell_stock(request):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Get user's position
+    if order_service.parse_order_type(request.data.get("order_type")) != "market":
+        return _place_resting_order(request, stock, "sell", shares)
+    
+    # Close/reduce the position and credit the proceeds atomically
     try:
-        position = UserStockPosition.objects.get(
-            user=user,
-            stock=stock,
-            is_active=True
-        )
-    except UserStockPosition.DoesNotExist:
+        sale = balance_service.sell_stock(user, stock, shares)
+    except balance_service.BalanceError as e:
         return Response(
             {
                 "success": False,
-                "error": "You don't own any shares of this stock"
+                "error": str(e)
             },
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Check if user has enough shares
-    if position.shares < shares:
+    position = sale['position']
+    sale_value = sale['sale_value']
+    actual_profit_loss = sale['profit_loss']
+    
+    return Response({
+        "success": True,
+        "message": f"Successfully sold {shares} shares of {stock.symbol}",
+        "sale_value": str(sale_value),
+        "profit_loss": f"{float(actual_profit_loss):.2f}",
+        "new_balance": str(user.balance),
+        "admin_profit_used": position.use_admin_profit
+    }, status=status.HTTP_200_OK)
+
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def stock_orders(request):
+    """
+    GET: List the authenticated user's limit/stop orders
+    Query params:
+    - status: open, filled, cancelled, rejected (optional)
+    - symbol: filter by stock symbol (optional)
+    """
+    orders = StockOrder.objects.filter(user=request.user).select_related('stock')
+    
+    order_status = request.query_params.get("status")
+    if order_status:
+        orders = orders.filter(status=order_status)
+    
+    symbol = request.query_params.get("symbol")
+    if symbol:
+        orders = orders.filter(stock__symbol=symbol.upper())
+    
+    serializer = StockOrderSerializer(orders[:100], many=True)
+    
+    return Response({
+        "success": True,
+        "orders": serializer.data
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def cancel_stock_order(request, order_id):
+    """
+    POST: Cancel an open limit/stop order
+    """
+    if not order_service.cancel_order(request.user, order_id):
         return Response(
             {
                 "success": False,
-                "error": f"Insufficient shares. You own {position.shares} shares"
+                "error": "Open order not found"
             },
-            status=status.HTTP_400_BAD_REQUEST
+            status=status.HTTP_404_NOT_FOUND
         )
     
-    # Calculate sale value and profit/loss
-    if position.use_admin_profit:
-        # Use admin-set profit/loss
-        total_admin_pl = position.admin_profit_loss
+    return Response({
+        "success": True,
+        "message": "Order cancelled successfully"
+    }, status=status.HTTP_200_OK)
+
+
+def _optional_price(value, name):
+    """Parse an optional positive price from request data; None/"" clears it"""
+    if value in (None, ""):
+        return None
+    try:
+        price = Decimal(str(value))
+    except (ValueError, TypeError, InvalidOperation):
+        raise alert_service.AlertError(f"{name} must be a number")
+    if price <= 0:
+        raise alert_service.AlertError(f"{name} must be greater than zero")
+    return price
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def price_alerts(request):
+    """
+    GET: List the authenticated user's price alerts, newest first
+    Query params:
+    - status: active, triggered, cancelled (optional)
+    - symbol: filter by stock symbol (optional)
+    - cursor / page_size: keyset pagination (default: 50, max: 200)
+
+    POST: Create a price alert
+    Body:
+    - symbol: stock symbol
+    - target_price: price level
+    - direction: above or below (optional, inferred from the current price)
+    - note: shown in the notification when the alert fires (optional)
+    """
+    if request.method == "GET":
+        alerts = PriceAlert.objects.filter(user=request.user).select_related('stock')
         
-        if position.shares == shares:
-            # Selling all shares - use full admin P/L
-            actual_profit_loss = total_admin_pl
-            sale_value = position.total_invested + actual_profit_loss
-        else:
-            # Partial sale - proportional admin P/L
-            proportion = shares / position.shares
-            actual_profit_loss = total_admin_pl * proportion
-            cost_basis = position.total_invested * proportion
-            sale_value = cost_basis + actual_profit_loss
-    else:
-        # Calculate based on current market price
-        sale_value = shares * stock.price
-        cost_basis = shares * position.average_buy_price
-        actual_profit_loss = sale_value - cost_basis
-    
-    # Update position
-    if position.shares == shares:
-        # Selling all shares - close position
-        position.is_active = False
-        position.closed_at = timezone.now()
-        position.save()
-    else:
-        # Partial sale
-        remaining_shares = position.shares - shares
-        proportion = remaining_shares / position.shares
+        alert_status = request.query_params.get("status")
+        if alert_status:
+            alerts = alerts.filter(status=alert_status)
         
-        # Update shares and invested amount proportionally
-        position.shares = remaining_shares
-        position.total_invested = position.total_invested * proportion
+        symbol = request.query_params.get("symbol")
+        if symbol:
+            alerts = alerts.filter(stock__symbol=symbol.upper())
         
-        # If using admin profit, also update admin profit proportionally
-        if position.use_admin_profit:
-            position.admin_profit_loss = position.admin_profit_loss * proportion
+        page = pagination.paginate(request, alerts, ("-created_at",))
+        serializer = PriceAlertSerializer(page.items, many=True)
         
-        position.save()
+        return Response({
+            "success": True,
+            "alerts": serializer.data,
+            **page.links(),
+        }, status=status.HTTP_200_OK)
     
-    # Add to balance
-    user.balance += sale_value
-    user.save()
+    symbol = (request.data.get("symbol") or "").upper()
+    direction = request.data.get("direction") or None
     
-    # Create transaction record
-    reference = f"SELL-{get_random_string(12).upper()}"
-    Transaction.objects.create(
-        user=user,
-        transaction_type="deposit",  # Selling is a deposit to balance
-        amount=sale_value,
-        reference=reference,
-        description=f"Sold {shares} shares of {stock.symbol} @ ${stock.price} (P/L: ${float(actual_profit_loss):.2f})",
-        status="completed"
-    )
+    try:
+        stock = Stock.objects.get(symbol=symbol, is_active=True)
+    except Stock.DoesNotExist:
+        return Response(
+            {
+                "success": False,
+                "error": "Stock not found"
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        if direction not in (None, "above", "below"):
+            raise alert_service.AlertError("direction must be above or below")
+        target_price = _optional_price(request.data.get("target_price"), "target_price")
+        if target_price is None:
+            raise alert_service.AlertError("target_price is required")
+        alert = alert_service.create_alert(
+            request.user,
+            stock,
+            target_price,
+            direction=direction,
+            note=(request.data.get("note") or "")[:255],
+        )
+    except alert_service.AlertError as e:
+        return Response(
+            {
+                "success": False,
+                "error": str(e)
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        "success": True,
+        "message": f"Alert set for {stock.symbol} {alert.get_direction_display().lower()} ${target_price}",
+        "alert": PriceAlertSerializer(alert).data
+    }, status=status.HTTP_201_CREATED)
 
-    # After successful sell
-    TradeHistory.objects.create(
-        user=user,
-        stock=stock,
-        trade_type='sell',
-        shares=shares,
-        price_per_share=stock.price,
-        total_amount=sale_value,
-        profit_loss=actual_profit_loss,
-        reference=reference,
-        notes=f"Market sell order"
-    )
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def cancel_price_alert(request, alert_id):
+    """
+    POST: Cancel an active price alert
+    """
+    if not alert_service.cancel_alert(request.user, alert_id):
+        return Response(
+            {
+                "success": False,
+                "error": "Active alert not found"
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
     
     return Response({
         "success": True,
-        "message": f"Successfully sold {shares} shares of {stock.symbol}",
-        "sale_value": str(sale_value),
-        "profit_loss": f"{float(actual_profit_loss):.2f}",
-        "new_balance": str(user.balance),
-        "admin_profit_used": position.use_admin_profit
+        "message": "Alert cancelled successfully"
     }, status=status.HTTP_200_OK)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def set_position_exits(request, position_id):
+    """
+    POST: Set or clear the stop-loss / take-profit of an open stock position.
+    The whole position is sold when the price crosses either level.
+    Body:
+    - stop_loss: level below the current price, null/empty to clear
+    - take_profit: level above the current price, null/empty to clear
+    """
+    try:
+        stop_loss = _optional_price(request.data.get("stop_loss"), "stop_loss")
+        take_profit = _optional_price(request.data.get("take_profit"), "take_profit")
+        position = alert_service.set_position_exits(
+            request.user, position_id, stop_loss=stop_loss, take_profit=take_profit
+        )
+    except alert_service.AlertError as e:
+        return Response(
+            {
+                "success": False,
+                "error": str(e)
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if position is None:
+        return Response(
+            {
+                "success": False,
+                "error": "Open position not found"
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response({
+        "success": True,
+        "message": "Position exits updated",
+        "position_id": position.id,
+        "stop_loss": str(position.stop_loss) if position.stop_loss is not None else None,
+        "take_profit": str(position.take_profit) if position.take_profit is not None else None,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+@authentication_classes([CachedTokenAuthentication])
+def ingest_market_data(request):
+    """
+    POST: Internal quote feed. The raw body is CSV or NDJSON and is streamed
+    line by line into Stock/Asset, never loaded into memory as a whole.
+    Query params:
+    - kind: stocks (default) or assets
+    - format: csv or ndjson (detected when omitted)
+    """
+    kind = request.query_params.get("kind", "stocks")
+    fmt = request.query_params.get("format")
+    
+    if kind not in ("stocks", "assets") or fmt not in (None, "csv", "ndjson"):
+        return Response(
+            {
+                "success": False,
+                "error": "kind must be stocks or assets and format csv or ndjson"
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Iterate the underlying HttpRequest so DRF never parses the body
+    lines = codecs.iterdecode(request._request, "utf-8")
+    
+    try:
+        report = market_data_service.ingest(lines, kind=kind, fmt=fmt)
+    except (ValueError, KeyError) as e:
+        return Response(
+            {
+                "success": False,
+                "error": f"Invalid quote data: {str(e)}"
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        "success": True,
+        "report": report.as_dict()
+    }, status=status.HTTP_200_OK)
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_trade_history(request):
     """
     GET: Get trading history for authenticated user
     Query params:
     - trade_type: Filter by buy/sell (optional)
     - stock_symbol: Filter by stock symbol (optional)
-    - limit: Number of trades to return (default: 50)
+    - page_size (or limit): Number of trades per page (default: 50, max: 200)
+    - cursor: Opaque cursor from the next/prev links
     """
     # Start with base queryset
     trades = TradeHistory.objects.filter(user=request.user)
@@ -2781,34 +3246,25 @@ def get_trade_history(request):
     if stock_symbol:
         trades = trades.filter(stock__symbol=stock_symbol.upper())
     
-    # IMPORTANT: Calculate summary stats BEFORE slicing
-    total_trades = trades.count()
-    buy_trades = trades.filter(trade_type='buy').count()
-    sell_trades = trades.filter(trade_type='sell').count()
-    
-    total_profit_loss = trades.filter(
-        trade_type='sell',
-        profit_loss__isnull=False
-    ).aggregate(
-        total=Sum('profit_loss')
-    )['total'] or Decimal('0.00')
-    
-    # NOW apply limit and serialize
-    limit = request.GET.get('limit', 50)
-    try:
-        limit = int(limit)
-    except ValueError:
-        limit = 50
-    
-    # Slice the queryset for pagination
-    trades_limited = trades[:limit]
+    # Summary covers every matching trade, in one aggregate query
+    summary = trades.aggregate(
+        total_trades=Count('id'),
+        buy_trades=Count('id', filter=Q(trade_type='buy')),
+        sell_trades=Count('id', filter=Q(trade_type='sell')),
+        total_profit_loss=Sum('profit_loss', filter=Q(trade_type='sell')),
+    )
+    total_trades = summary['total_trades']
+    buy_trades = summary['buy_trades']
+    sell_trades = summary['sell_trades']
+    total_profit_loss = summary['total_profit_loss'] or Decimal('0.00')
     
-    # Serialize the limited trades
-    serializer = TradeHistorySerializer(trades_limited, many=True)
+    page = pagination.paginate(request, trades.select_related('stock'), ('-executed_at',))
+    serializer = TradeHistorySerializer(page.items, many=True)
     
     return Response({
         "success": True,
         "trades": serializer.data,
+        **page.links(),
         "summary": {
             "total_trades": total_trades,
             "buy_orders": buy_trades,
@@ -2825,7 +3281,7 @@ def get_trade_history(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_connected_wallets(request):
     """
     GET: Retrieve all wallet connections for authenticated user
@@ -2850,7 +3306,7 @@ def get_connected_wallets(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def connect_wallet(request):
     """
     POST: Connect a new wallet
@@ -2918,7 +3374,7 @@ def connect_wallet(request):
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def disconnect_wallet(request, wallet_type):
     """
     DELETE: Disconnect a wallet
@@ -2957,7 +3413,7 @@ def disconnect_wallet(request, wallet_type):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_wallet_detail(request, wallet_type):
     """
     GET: Get details of a specific wallet connection
@@ -3016,7 +3472,7 @@ import re
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def submit_kyc(request):
     """
     POST: Submit KYC information with Cloudinary URLs
@@ -3257,7 +3713,10 @@ def submit_kyc(request):
         user.id_back = id_back_public_id
         
         user.has_submitted_kyc = True
-        user.save()
+        user.save(update_fields=[
+            "dob", "phone", "address", "postal_code", "city", "region",
+            "id_type", "id_front", "id_back", "has_submitted_kyc",
+        ])
         
         logger.info(f"Saved id_front: {user.id_front}")
         logger.info(f"Saved id_back: {user.id_back}")
@@ -3324,7 +3783,7 @@ def submit_kyc(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_kyc_status(request):
     """
     GET: Check KYC status for authenticated user
@@ -3349,7 +3808,7 @@ def get_kyc_status(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_kyc_details(request):
     """
     GET: Get KYC details for authenticated user
@@ -3408,6 +3867,7 @@ def signal_list(request):
     - signal_type: Filter by signal type (stock, crypto, forex, commodity)
     - featured: Show only featured signals (true/false)
     - search: Search in signal name
+    - cursor / page_size: keyset pagination (default: 50, max: 200)
     """
     signals = Signal.objects.filter(is_active=True)
     
@@ -3429,8 +3889,9 @@ def signal_list(request):
             Q(name__icontains=search)
         )
     
+    page = pagination.paginate(request, signals, ("-created_at",))
     serializer = SignalListSerializer(
-        signals, 
+        page.items, 
         many=True, 
         context={'request': request}
     )
@@ -3438,7 +3899,8 @@ def signal_list(request):
     return Response({
         "success": True,
         "signals": serializer.data,
-        "count": len(serializer.data)
+        "count": len(serializer.data),
+        **page.links(),
     }, status=status.HTTP_200_OK)
 
 
@@ -3469,7 +3931,7 @@ def signal_detail(request, signal_id):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def purchase_signal(request):
     """
     POST: Purchase a trading signal
@@ -3575,43 +4037,9 @@ def purchase_signal(request):
         'fundamental_analysis': signal.fundamental_analysis,
     }
     
-    # Generate unique reference
-    reference = f"SIG-{get_random_string(12).upper()}"
-    
-    # Create purchase record
+    # Charge the user and record the purchase in one transaction
     try:
-        purchase = UserSignalPurchase.objects.create(
-            user=user,
-            signal=signal,
-            amount_paid=signal.price,
-            purchase_reference=reference,
-            signal_data=signal_snapshot
-        )
-        
-        # Deduct from user balance
-        user.balance -= signal.price
-        user.save()
-        
-        # Create transaction record
-        Transaction.objects.create(
-            user=user,
-            transaction_type="withdrawal",
-            amount=signal.price,
-            reference=reference,
-            description=f"Purchased signal: {signal.name}",
-            status="completed"
-        )
-        
-        # Create notification
-        from .models import Notification
-        Notification.objects.create(
-            user=user,
-            type="system",
-            title="Signal Purchased Successfully",
-            message=f"You have successfully purchased the {signal.name} trading signal.",
-            full_details=f"Signal: {signal.name}\nAmount Paid: ${signal.price}\nReference: {reference}",
-            # priority="medium"
-        )
+        purchase = balance_service.purchase_signal(user, signal, signal_snapshot)
         
         return Response({
             "success": True,
@@ -3626,6 +4054,16 @@ def purchase_signal(request):
             "new_balance": str(user.balance)
         }, status=status.HTTP_201_CREATED)
         
+    except balance_service.BalanceError as e:
+        return Response(
+            {
+                "success": False,
+                "error": str(e),
+                "required_amount": str(signal.price),
+                "user_balance": str(user.balance)
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {
@@ -3638,27 +4076,28 @@ def purchase_signal(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def user_purchased_signals(request):
     """
-    GET: Get all signals purchased by the authenticated user
+    GET: Get signals purchased by the authenticated user, newest first
+    Query params:
+    - cursor / page_size: keyset pagination (default: 50, max: 200)
     """
-    purchases = UserSignalPurchase.objects.filter(
-        user=request.user
-    ).order_by('-purchased_at')
+    purchases = UserSignalPurchase.objects.filter(user=request.user)
     
-    serializer = UserSignalPurchaseSerializer(purchases, many=True)
+    page = pagination.paginate(request, purchases.select_related('signal'), ('-purchased_at',))
+    serializer = UserSignalPurchaseSerializer(page.items, many=True)
     
-    # Calculate total spent
-    total_spent = sum(
-        float(purchase.amount_paid) for purchase in purchases
-    )
+    # Totals cover every purchase, not just this page
+    totals = purchases.aggregate(count=Count('id'), spent=Sum('amount_paid'))
+    total_spent = float(totals['spent'] or 0)
     
     return Response({
         "success": True,
         "purchases": serializer.data,
+        **page.links(),
         "summary": {
-            "total_signals": len(serializer.data),
+            "total_signals": totals['count'],
             "total_spent": f"{total_spent:.2f}"
         }
     }, status=status.HTTP_200_OK)
@@ -3666,7 +4105,7 @@ def user_purchased_signals(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def user_signal_balance(request):
     """
     GET: Get user's signal wallet balance
@@ -3694,21 +4133,25 @@ def user_signal_balance(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_referral_info(request):
     """
     GET: Get referral information for authenticated user
     Auto-generates referral code if missing
     """
-    user = request.user
-    
+    return Response(
+        _referral_info_payload(request.user, request.headers.get('X-Frontend-URL')),
+        status=status.HTTP_200_OK
+    )
+
+
+def _referral_info_payload(user, frontend_url=None):
     # AUTO-GENERATE referral code if missing
     if not user.referral_code:
         user.referral_code = generate_unique_referral_code()
         user.save(update_fields=['referral_code'])
     
     # Get frontend URL from request header or settings
-    frontend_url = request.headers.get('X-Frontend-URL')
     if not frontend_url:
         from django.conf import settings
         frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
@@ -3725,7 +4168,7 @@ def get_referral_info(request):
     # Calculate total earnings from referrals
     total_earnings = user.referral_bonus_earned or Decimal('0.00')
     
-    return Response({
+    return {
         "success": True,
         "referral_data": {
             "referral_code": user.referral_code,
@@ -3734,63 +4177,53 @@ def get_referral_info(request):
             "total_earnings": str(total_earnings),
             "referral_bonus_rate": 10,
         }
-    }, status=status.HTTP_200_OK)
+    }
 
 
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_referral_list(request):
     """
-    GET: Get list of users referred by authenticated user
-    Returns: List of referred users with their status
+    GET: Get list of users referred by authenticated user, newest first
+    Query params:
+    - cursor / page_size: keyset pagination, next/prev links in the body
+    Returns: List of referred users with their status; count is the page size,
+    total covers every referral
     """
     user = request.user
     
-    # Get all users referred by this user
-    referrals = User.objects.filter(referred_by=user).order_by('-date_joined')
-    
-    referral_list = []
-    for referral in referrals:
-        # Check if user has made a deposit
-        has_deposited = Transaction.objects.filter(
-            user=referral,
-            transaction_type='deposit',
-            status='completed'
-        ).exists()
-        
-        # Calculate bonus earned from this referral
-        if has_deposited:
-            # Get first deposit amount
-            first_deposit = Transaction.objects.filter(
-                user=referral,
-                transaction_type='deposit',
-                status='completed'
-            ).order_by('created_at').first()
-            
-            if first_deposit:
-                bonus_earned = first_deposit.amount * Decimal('0.10')  # 10% bonus
-            else:
-                bonus_earned = Decimal('0.00')
-        else:
-            bonus_earned = Decimal('0.00')
-        
-        referral_list.append({
-            "id": referral.id,
-            "email": referral.email,
-            "first_name": referral.first_name or "",
-            "last_name": referral.last_name or "",
-            "date_joined": referral.date_joined.isoformat(),
-            "has_deposited": has_deposited,
-            "bonus_earned": str(bonus_earned),
-        })
+    # First deposits come from FirstDeposit in the same query, not one
+    # Transaction query per referral
+    referrals = referral_service.referrals(user).values(
+        'id', 'email', 'first_name', 'last_name', 'date_joined',
+        'first_deposit_amount',
+    )
+    page = pagination.paginate(request, referrals, ('-date_joined',))
+    
+    referral_list = [
+        {
+            "id": referral['id'],
+            "email": referral['email'],
+            "first_name": referral['first_name'] or "",
+            "last_name": referral['last_name'] or "",
+            "date_joined": referral['date_joined'].isoformat(),
+            "has_deposited": referral['first_deposit_amount'] is not None,
+            "bonus_earned": str(referral_service.bonus(referral['first_deposit_amount'])),
+        }
+        for referral in page.items
+    ]
+    totals = referral_service.totals(user)
     
     return Response({
         "success": True,
         "referrals": referral_list,
-        "count": len(referral_list)
+        "count": len(referral_list),
+        "total": totals['total_referrals'],
+        "deposited": totals['deposited_referrals'],
+        **page.links(),
     }, status=status.HTTP_200_OK)
 
 
@@ -3832,54 +4265,128 @@ def validate_referral_code(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_referral_earnings_history(request):
     """
-    GET: Get detailed referral earnings history
-    Returns: Breakdown of earnings from each referral
+    GET: Get detailed referral earnings history, newest deposit first
+    Query params:
+    - cursor / page_size: keyset pagination, next/prev links in the body
+    Returns: Breakdown of earnings from each referral; total_earnings covers
+    every referral, count is the page size
     """
     user = request.user
     
-    earnings_history = []
-    
-    # Get all referred users who have deposited
-    referrals = User.objects.filter(referred_by=user)
-    
-    for referral in referrals:
-        # Get first completed deposit
-        first_deposit = Transaction.objects.filter(
-            user=referral,
-            transaction_type='deposit',
-            status='completed'
-        ).order_by('created_at').first()
-        
-        if first_deposit:
-            bonus_amount = first_deposit.amount * Decimal('0.10')
-            earnings_history.append({
-                "referral_name": f"{referral.first_name} {referral.last_name}".strip() or referral.email,
-                "referral_email": referral.email,
-                "deposit_amount": str(first_deposit.amount),
-                "bonus_earned": str(bonus_amount),
-                "deposit_date": first_deposit.created_at.isoformat(),
-                "status": "completed"
-            })
-    
-    total_earnings = sum(
-        Decimal(item['bonus_earned']) for item in earnings_history
+    deposits = referral_service.referral_deposits(user).values(
+        'user', 'amount', 'deposited_at',
+        'user__email', 'user__first_name', 'user__last_name',
     )
+    page = pagination.paginate(request, deposits, ('-deposited_at',))
+    
+    earnings_history = [
+        {
+            "referral_name": f"{deposit['user__first_name']} {deposit['user__last_name']}".strip() or deposit['user__email'],
+            "referral_email": deposit['user__email'],
+            "deposit_amount": str(deposit['amount']),
+            "bonus_earned": str(referral_service.bonus(deposit['amount'])),
+            "deposit_date": deposit['deposited_at'].isoformat(),
+            "status": "completed"
+        }
+        for deposit in page.items
+    ]
+    totals = referral_service.totals(user)
     
     return Response({
         "success": True,
         "earnings_history": earnings_history,
-        "total_earnings": str(total_earnings),
-        "count": len(earnings_history)
+        "total_earnings": str(totals['total_bonus']),
+        "count": len(earnings_history),
+        **page.links(),
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def get_referral_downline(request):
+    """
+    GET: Size of the authenticated user's whole referral downline, with member
+    count, depositing members and completed deposit volume per level
+    Query params:
+    - max_depth: only count this many levels down (optional)
+    """
+    try:
+        max_depth = request.GET.get("max_depth")
+        max_depth = int(max_depth) if max_depth else None
+    except ValueError:
+        return Response(
+            {"success": False, "error": "max_depth must be an integer"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    levels = referral_service.downline_levels(request.user, max_depth)
+
+    return Response({
+        "success": True,
+        "downline_size": sum(level['members'] for level in levels),
+        "depositors": sum(level['depositors'] for level in levels),
+        "deposit_volume": str(sum((level['deposit_volume'] for level in levels), Decimal('0.00'))),
+        "levels": [
+            {**level, "deposit_volume": str(level['deposit_volume'])}
+            for level in levels
+        ],
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def get_referral_downline_members(request):
+    """
+    GET: Members of the authenticated user's referral downline, nearest level first
+    Query params:
+    - level: only members this many referrals down (1 = direct referrals)
+    - cursor / page_size: keyset pagination, next/prev links in the body
+    """
+    try:
+        level = request.GET.get("level")
+        level = int(level) if level else None
+    except ValueError:
+        return Response(
+            {"success": False, "error": "level must be an integer"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    paths = referral_service.downline_members(request.user, level).values(
+        'id', 'depth', 'descendant_id', 'descendant__email', 'descendant__first_name',
+        'descendant__last_name', 'descendant__date_joined', 'descendant__referred_by_id',
+    )
+    page = pagination.paginate(request, paths, ('depth',))
+
+    members = [
+        {
+            "id": path['descendant_id'],
+            "email": path['descendant__email'],
+            "first_name": path['descendant__first_name'] or "",
+            "last_name": path['descendant__last_name'] or "",
+            "date_joined": path['descendant__date_joined'].isoformat(),
+            "level": path['depth'],
+            "referred_by": path['descendant__referred_by_id'],
+        }
+        for path in page.items
+    ]
+
+    return Response({
+        "success": True,
+        "members": members,
+        "count": len(members),
+        **page.links(),
     }, status=status.HTTP_200_OK)
 
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def generate_referral_code(request):
     """
     POST: Generate or regenerate a referral code for user
@@ -3916,73 +4423,78 @@ def generate_referral_code(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_copy_trade_history(request):
     """
-    GET: Get copy trading history for authenticated user
+    GET: Get copy trading history for authenticated user, newest first
     Query params:
     - status: Filter by status (open/closed) - optional
     - trader_id: Filter by specific trader - optional
-    - limit: Number of trades to return (default: 50)
+    - cursor / limit (or page_size): keyset pagination (default 50), next/prev links in the body
+    Returns: the page of trades and a summary of all the user's trades,
+    overall and per trader (two queries)
     """
-    user = request.user
-    
-    # Base queryset
-    history = UserCopyTraderHistory.objects.filter(user=user)
+    return Response(
+        _copy_trade_history_payload(
+            request.user,
+            request.GET.get('status'),
+            request.GET.get('trader_id'),
+            request=request,
+        ),
+        status=status.HTTP_200_OK
+    )
+
+
+def _copy_trade_history_payload(user, status_filter=None, trader_id=None, limit=50, request=None):
+    # Traders come with the rows, for trader_name / trader_username
+    history = UserCopyTraderHistory.objects.filter(user=user).select_related('trader')
     
     # Filter by status
-    status_filter = request.GET.get('status')
     if status_filter and status_filter in ['open', 'closed']:
         history = history.filter(status=status_filter)
     
     # Filter by trader
-    trader_id = request.GET.get('trader_id')
     if trader_id:
         history = history.filter(trader_id=trader_id)
     
-    # Calculate summary BEFORE slicing
-    open_trades = UserCopyTraderHistory.objects.filter(
-        user=user, 
-        status='open'
-    ).count()
-    
-    closed_trades = UserCopyTraderHistory.objects.filter(
-        user=user, 
-        status='closed'
-    ).count()
-    
-    total_profit_loss = UserCopyTraderHistory.objects.filter(
-        user=user,
-        status='closed'
-    ).aggregate(
-        total=Sum('profit_loss')
-    )['total'] or Decimal('0.00')
-    
-    # NOW apply limit and slice
-    limit = request.GET.get('limit', 50)
-    try:
-        limit = int(limit)
-    except ValueError:
-        limit = 50
-    
-    history_limited = history[:limit]
+    if request is not None:
+        page = pagination.paginate(request, history, ('-opened_at',), default_page_size=limit)
+        trades, links = page.items, page.links()
+    else:
+        # First page only (bootstrap); later pages come from get_copy_trade_history
+        trades, links = history.order_by('-opened_at', '-id')[:limit], {"next": None, "prev": None}
     
-    serializer = UserCopyTraderHistorySerializer(history_limited, many=True)
+    serializer = UserCopyTraderHistorySerializer(trades, many=True)
     
-    return Response({
+    return {
         "success": True,
         "history": serializer.data,
-        "summary": {
-            "open_trades": open_trades,
-            "closed_trades": closed_trades,
-            "total_profit_loss": str(total_profit_loss)
-        }
+        "summary": copy_trading_service.history_summary(user),
+        **links,
+    }
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CachedTokenAuthentication])
+def get_copy_trade_valuation(request):
+    """
+    GET: Live unrealized P/L of the user's open copy trades, marked to the
+    current Asset bid (buys) / ask (sells) with each trade's leverage
+    Returns: per-trade current_price / profit_loss / profit_loss_percent
+    and their totals. Trades whose market has no quote keep their stored
+    profit_loss (priced: false). Served from a per-user cache refreshed by
+    the revalue_copy_trades job.
+    """
+    return Response({
+        "success": True,
+        **copy_trading_service.live_valuation(request.user),
     }, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def get_copy_trade_detail(request, trade_id):
     """
     GET: Get details of a specific copy trade
@@ -4007,7 +4519,7 @@ def get_copy_trade_detail(request, trade_id):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 def close_copy_trade(request, trade_id):
     """
     POST: Close an open copy trade
@@ -72,7 +72,7 @@ cloudinary.config(
 # ----------------------------
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "app.auth_credentials.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -178,7 +178,10 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'x-frontend-url',  # Add custom header
+    'if-none-match',
 ]
+# Response headers the frontend reads: pagination links and ETags for polling
+CORS_EXPOSE_HEADERS = ['link', 'etag']
 # ----------------------------
 # OTHER SETTINGS
 # ----------------------------
@@ -1,6 +1,7 @@
 # dashboard/forms.py
 from django import forms
-from app.models import CustomUser, Stock, Transaction, AdminWallet, Trader, UserCopyTraderHistory
+from app import broadcast_service
+from app.models import CustomUser, Stock, Transaction, AdminWallet, Trader, UserCopyTraderHistory, Notification
 from decimal import Decimal
 
 class AddTradeForm(forms.Form):
@@ -1058,4 +1059,90 @@ class EditDepositForm(forms.Form):
             'accept': 'image/*'
         }),
         help_text="Leave blank to keep existing receipt"
-    )
\ No newline at end of file
+    )
+
+
+class BroadcastForm(forms.Form):
+    """Form for sending one notification to a segment of users"""
+
+    segment = forms.ChoiceField(
+        choices=list(broadcast_service.SEGMENTS.items()),
+        label="Recipients",
+        widget=forms.Select(attrs={
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+        })
+    )
+
+    trader = forms.ModelChoiceField(
+        queryset=Trader.objects.filter(is_active=True).order_by('name'),
+        label="Trader",
+        required=False,
+        widget=forms.Select(attrs={
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+        }),
+        help_text="Required when sending to a trader's copiers"
+    )
+
+    stock = forms.ModelChoiceField(
+        queryset=Stock.objects.filter(is_active=True).order_by('symbol'),
+        label="Stock",
+        required=False,
+        widget=forms.Select(attrs={
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+        }),
+        help_text="Required when sending to a stock's holders"
+    )
+
+    type = forms.ChoiceField(
+        choices=Notification.TYPE_CHOICES,
+        initial='system',
+        label="Notification Type",
+        widget=forms.Select(attrs={
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+        })
+    )
+
+    title = forms.CharField(
+        label="Title",
+        max_length=255,
+        widget=forms.TextInput(attrs={
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+            'placeholder': 'Scheduled maintenance'
+        })
+    )
+
+    message = forms.CharField(
+        label="Message",
+        widget=forms.Textarea(attrs={
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+            'rows': 3,
+            'placeholder': 'Short message shown in the notification list...'
+        })
+    )
+
+    full_details = forms.CharField(
+        label="Full Details",
+        required=False,
+        widget=forms.Textarea(attrs={
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500',
+            'rows': 5,
+            'placeholder': 'Defaults to the message'
+        })
+    )
+
+    send_email = forms.BooleanField(
+        label="Also send as email",
+        required=False,
+        widget=forms.CheckboxInput(attrs={
+            'class': 'h-4 w-4 text-blue-600 border-gray-300 rounded',
+        })
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        segment = cleaned_data.get('segment')
+        if segment == 'trader_copiers' and not cleaned_data.get('trader'):
+            self.add_error('trader', 'Select the trader whose copiers should receive this')
+        if segment == 'stock_holders' and not cleaned_data.get('stock'):
+            self.add_error('stock', 'Select the stock whose holders should receive this')
+        return cleaned_data
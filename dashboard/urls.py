@@ -35,6 +35,9 @@ urlpatterns = [
     # Trading
     path('add-trade/', views.add_trade, name='add_trade'),
     path('add-earnings/', views.add_earnings, name='add_earnings'),
+
+    # Broadcasts
+    path('broadcast/', views.broadcast, name='broadcast'),
     
     # Copy Trading
     path('copy-trades/', views.copy_trades_list, name='copy_trades_list'),
@@ -10,14 +10,15 @@ from decimal import Decimal
 
 from app.models import (
     CustomUser, Transaction, Stock, AdminWallet,
-    Portfolio, Notification, UserStockPosition, Trader, UserCopyTraderHistory
+    Portfolio, Notification, UserStockPosition, Trader, UserCopyTraderHistory, Broadcast
 )
 from .forms import (
     AddTradeForm, AddEarningsForm, ApproveDepositForm,
     ApproveWithdrawalForm, ApproveKYCForm, AddCopyTradeForm,
-    AddTraderForm, EditTraderForm, EditDepositForm,
+    AddTraderForm, EditTraderForm, EditDepositForm, BroadcastForm,
 )
 from .decorators import admin_required
+from app import balance_service, broadcast_service
 
 
 def admin_login(request):
@@ -345,14 +346,10 @@ def deposit_detail(request, transaction_id):
             status = form.cleaned_data['status']
             admin_notes = form.cleaned_data['admin_notes']
             
-            deposit.status = status
-            deposit.save()
+            # Update status and credit the balance under a row lock
+            deposit, _ = balance_service.set_deposit_status(deposit.id, status)
             
             if status == 'completed':
-                # Credit user balance
-                deposit.user.balance += deposit.amount
-                deposit.user.save()
-                
                 # Create notification
                 Notification.objects.create(
                     user=deposit.user,
@@ -400,14 +397,9 @@ def edit_deposit(request, transaction_id):
     if request.method == 'POST':
         form = EditDepositForm(request.POST, request.FILES)
         if form.is_valid():
-            old_amount = deposit.amount
-            old_status = deposit.status
-            
             # Update deposit fields
-            deposit.amount = form.cleaned_data['amount']
             deposit.currency = form.cleaned_data['currency']
             deposit.unit = form.cleaned_data['unit']
-            deposit.status = form.cleaned_data['status']
             deposit.description = form.cleaned_data['description']
             deposit.reference = form.cleaned_data['reference']
             
@@ -417,31 +409,17 @@ def edit_deposit(request, transaction_id):
             
             deposit.save()
             
-            # Handle balance adjustments if status changed
-            if old_status != deposit.status:
-                if old_status == 'completed' and deposit.status != 'completed':
-                    # Was completed, now not completed - deduct from balance
-                    deposit.user.balance -= old_amount
-                    deposit.user.save()
-                    messages.warning(request, f'${old_amount} deducted from {deposit.user.email} balance due to status change')
-                
-                elif old_status != 'completed' and deposit.status == 'completed':
-                    # Wasn't completed, now completed - add to balance
-                    deposit.user.balance += deposit.amount
-                    deposit.user.save()
-                    messages.success(request, f'${deposit.amount} credited to {deposit.user.email} balance')
+            # Apply status/amount change and the matching balance adjustment atomically
+            deposit, difference = balance_service.set_deposit_status(
+                deposit.id,
+                form.cleaned_data['status'],
+                amount=form.cleaned_data['amount'],
+            )
             
-            # Handle amount changes for completed deposits
-            elif deposit.status == 'completed' and old_amount != deposit.amount:
-                # Adjust balance by difference
-                difference = deposit.amount - old_amount
-                deposit.user.balance += difference
-                deposit.user.save()
-                
-                if difference > 0:
-                    messages.success(request, f'Additional ${difference} credited to {deposit.user.email} balance')
-                else:
-                    messages.warning(request, f'${abs(difference)} deducted from {deposit.user.email} balance')
+            if difference > 0:
+                messages.success(request, f'${difference} credited to {deposit.user.email} balance')
+            elif difference < 0:
+                messages.warning(request, f'${abs(difference)} deducted from {deposit.user.email} balance')
             
             # Create notification
             Notification.objects.create(
@@ -524,10 +502,10 @@ def withdrawal_detail(request, transaction_id):
             status = form.cleaned_data['status']
             admin_notes = form.cleaned_data['admin_notes']
             
-            withdrawal.status = status
-            withdrawal.save()
-            
             if status == 'completed':
+                withdrawal.status = status
+                withdrawal.save()
+                
                 # Create notification
                 Notification.objects.create(
                     user=withdrawal.user,
@@ -539,9 +517,8 @@ def withdrawal_detail(request, transaction_id):
                 
                 messages.success(request, f'Withdrawal approved for {withdrawal.user.email}')
             else:  # failed
-                # Refund the amount back to user balance
-                withdrawal.user.balance += withdrawal.amount
-                withdrawal.user.save()
+                # Mark failed and refund the held amount back to user balance
+                withdrawal, _ = balance_service.reject_withdrawal(withdrawal.id, status)
                 
                 # Create notification
                 Notification.objects.create(
@@ -659,31 +636,8 @@ def add_earnings(request):
             amount = form.cleaned_data['amount']
             description = form.cleaned_data['description'] or 'Admin added earnings'
             
-            # Add to user balance
-            user_email.balance += amount
-            user_email.save()
-            
-            # Create transaction record
-            from django.utils.crypto import get_random_string
-            reference = f"EARN-{get_random_string(12).upper()}"
-            
-            Transaction.objects.create(
-                user=user_email,
-                transaction_type='deposit',
-                amount=amount,
-                status='completed',
-                reference=reference,
-                description=description
-            )
-            
-            # Create notification
-            Notification.objects.create(
-                user=user_email,
-                type='system',
-                title='Earnings Added',
-                message=f'${amount} has been added to your account',
-                full_details=description
-            )
+            # Credit balance with its transaction and notification atomically
+            balance_service.credit_earnings(user_email, amount, description)
             
             messages.success(request, f'${amount} added to {user_email.email}')
             return redirect('dashboard:add_earnings')
@@ -705,6 +659,45 @@ def add_earnings(request):
     return render(request, 'dashboard/add_earnings.html', context)
 
 
+@admin_required
+def broadcast(request):
+    """Queue one notification (and optionally an email) for a segment of users"""
+    if request.method == 'POST':
+        form = BroadcastForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            # The fan-out runs in the outbox worker, not in this request
+            record = broadcast_service.queue_broadcast(
+                data['segment'],
+                title=data['title'],
+                message=data['message'],
+                full_details=data['full_details'],
+                type=data['type'],
+                send_email=data['send_email'],
+                trader=data['trader'],
+                stock=data['stock'],
+                sent_by=request.user,
+            )
+
+            messages.success(
+                request,
+                f'Broadcast #{record.id} queued; it is delivered in the background '
+                f'and its progress shows below.'
+            )
+            return redirect('dashboard:broadcast')
+    else:
+        form = BroadcastForm()
+
+    recent_broadcasts = Broadcast.objects.select_related('sent_by')[:10]
+
+    context = {
+        'form': form,
+        'recent_broadcasts': recent_broadcasts,
+    }
+
+    return render(request, 'dashboard/broadcast.html', context)
+
+
 @admin_required
 def get_assets_by_type(request):
     """API endpoint to get assets filtered by type"""
@@ -822,13 +815,7 @@ def add_copy_trade(request):
             
             # Update user profit AND balance with profit/loss
             if profit_loss:
-                # Update profit field (cumulative profit tracking)
-                user.profit = (user.profit or Decimal('0.00')) + profit_loss
-                
-                # Update balance (add profit or subtract loss)
-                user.balance = (user.balance or Decimal('0.00')) + profit_loss
-                
-                user.save(update_fields=['profit', 'balance'])
+                balance_service.adjust(user, profit_loss, profit_delta=profit_loss)
             
             # Create detailed notification
             if profit_loss >= 0: